@@ -0,0 +1,115 @@
+from datetime import date
+from typing import Iterable
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+# The ROLLUP_ROW_FIELDS columns read here
+DATE, RESTAURANT, RANK, POINTS, VOTE_COUNT = 0, 1, 3, 4, 5
+
+
+def restaurant_series(rows: Iterable[tuple], window: int) -> dict:
+    """
+    Per-restaurant series over the voting days of rollup rows: points per day, their trailing moving average over
+    `window` voting days (fewer at the start), wins and win streaks. Days without votes do not break a streak.
+    Vectorized with NumPy when it is installed.
+    """
+    rows = list(rows)
+    dates = sorted({row[DATE] for row in rows})
+    restaurant_ids = sorted({row[RESTAURANT] for row in rows})
+    if np is not None:
+        columns = _numpy_columns(rows, dates, restaurant_ids, window)
+    else:
+        columns = _python_columns(rows, dates, restaurant_ids, window)
+    return {
+        'dates': dates,
+        'restaurants': {
+            restaurant_id: {name: values[index] for name, values in columns.items()}
+            for index, restaurant_id in enumerate(restaurant_ids)
+        },
+    }
+
+
+def _numpy_columns(rows: list[tuple], dates: list[date], restaurant_ids: list[int], window: int) -> dict[str, list]:
+    date_index = {day: index for index, day in enumerate(dates)}
+    restaurant_index = {restaurant_id: index for index, restaurant_id in enumerate(restaurant_ids)}
+    shape = (len(restaurant_ids), len(dates))
+    cells = (
+        np.fromiter((restaurant_index[row[RESTAURANT]] for row in rows), dtype=np.intp, count=len(rows)),
+        np.fromiter((date_index[row[DATE]] for row in rows), dtype=np.intp, count=len(rows)),
+    )
+    points = np.zeros(shape, dtype=np.int64)
+    points[cells] = [row[POINTS] for row in rows]
+    vote_counts = np.zeros(shape, dtype=np.int64)
+    vote_counts[cells] = [row[VOTE_COUNT] for row in rows]
+    wins = np.zeros(shape, dtype=bool)
+    wins[cells] = [row[RANK] == 1 for row in rows]
+
+    # Trailing sums as differences of the running sums, exact in integers
+    running = np.zeros((shape[0], shape[1] + 1), dtype=np.int64)
+    np.cumsum(points, axis=1, out=running[:, 1:])
+    ends = np.arange(1, shape[1] + 1)
+    starts = np.maximum(ends - window, 0)
+    moving_averages = (running[:, ends] - running[:, starts]) / (ends - starts)
+
+    # Runs of wins: +1 where one starts, -1 past where it ends. Row-major, so the starts and ends pair up in order
+    edges = np.diff(np.pad(wins.astype(np.int8), ((0, 0), (1, 1))), axis=1)
+    run_rows, run_starts = np.nonzero(edges == 1)
+    _, run_ends = np.nonzero(edges == -1)
+    lengths = run_ends - run_starts
+    longest = np.zeros(shape[0], dtype=np.int64)
+    np.maximum.at(longest, run_rows, lengths)
+    current = np.zeros(shape[0], dtype=np.int64)
+    ongoing = run_ends == shape[1]
+    current[run_rows[ongoing]] = lengths[ongoing]
+
+    return {
+        'points': points.tolist(),
+        # Rounded like the fallback, np.round() rounds some halves the other way
+        'moving_average': [[round(value, 2) for value in series] for series in moving_averages.tolist()],
+        'total_points': points.sum(axis=1).tolist(),
+        'vote_count': vote_counts.sum(axis=1).tolist(),
+        'wins': wins.sum(axis=1).tolist(),
+        'longest_win_streak': longest.tolist(),
+        'current_win_streak': current.tolist(),
+    }
+
+
+def _python_columns(rows: list[tuple], dates: list[date], restaurant_ids: list[int], window: int) -> dict[str, list]:
+    date_index = {day: index for index, day in enumerate(dates)}
+    restaurant_index = {restaurant_id: index for index, restaurant_id in enumerate(restaurant_ids)}
+    points = [[0] * len(dates) for _ in restaurant_ids]
+    wins = [[False] * len(dates) for _ in restaurant_ids]
+    vote_counts = [0] * len(restaurant_ids)
+    for row in rows:
+        restaurant, day = restaurant_index[row[RESTAURANT]], date_index[row[DATE]]
+        points[restaurant][day] = row[POINTS]
+        wins[restaurant][day] = row[RANK] == 1
+        vote_counts[restaurant] += row[VOTE_COUNT]
+
+    moving_averages, longest, current = [], [], []
+    for series, won in zip(points, wins):
+        averages, total = [], 0
+        for day, value in enumerate(series):
+            total += value - (series[day - window] if day >= window else 0)
+            averages.append(round(total / min(day + 1, window), 2))
+        moving_averages.append(averages)
+
+        best = streak = 0
+        for day_won in won:
+            streak = streak + 1 if day_won else 0
+            best = max(best, streak)
+        longest.append(best)
+        current.append(streak)
+
+    return {
+        'points': points,
+        'moving_average': moving_averages,
+        'total_points': [sum(series) for series in points],
+        'vote_count': vote_counts,
+        'wins': [sum(won) for won in wins],
+        'longest_win_streak': longest,
+        'current_win_streak': current,
+    }
@@ -4,3 +4,17 @@ from django.apps import AppConfig
 class ApiConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'api'
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+
+        from . import signals  # noqa: F401
+        from .metrics import instrument_serializers, metrics_settings
+        from .middleware import install_query_recorder
+        from .permission_cache import check_permission_cache
+
+        check_permission_cache()
+
+        if metrics_settings()['ENABLED']:
+            instrument_serializers()
+            connection_created.connect(install_query_recorder, dispatch_uid='api.install_query_recorder')
@@ -0,0 +1,111 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .models import Employee, Restaurant
+from .permission_cache import permission_version
+
+PERMISSIONS_CLAIM = 'perms'
+PERMISSION_VERSION_CLAIM = 'perm_version'
+
+
+def permission_claims(user) -> dict:
+    """Claims that let ClaimsJWTAuthentication authorize the user without loading it from the database."""
+    return {
+        'employee_id': Employee.objects.filter(user_id=user.id).values_list('id', flat=True).first(),
+        'restaurant_id': Restaurant.objects.filter(owner_id=user.id).values_list('id', flat=True).first(),
+        'is_superuser': user.is_superuser,
+        # Superusers are granted every permission anyway
+        PERMISSIONS_CLAIM: [] if user.is_superuser else sorted(user.get_all_permissions()),
+        PERMISSION_VERSION_CLAIM: permission_version(user.id),
+    }
+
+
+def access_token_with_claims(refresh: str, user) -> str:
+    access = RefreshToken(refresh).access_token
+    access.payload.update(permission_claims(user))
+    return str(access)
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        data['access'] = access_token_with_claims(data['refresh'], self.user)
+        return data
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    def validate(self, attrs):
+        data = super().validate(attrs)
+        # Refreshing picks up the current grants of the user
+        user_id = RefreshToken(attrs['refresh'])[api_settings.USER_ID_CLAIM]
+        user = User.objects.filter(id=user_id, is_active=True).first()
+        if user is None:
+            raise AuthenticationFailed(_('User not found'), code='user_not_found')
+        data['access'] = access_token_with_claims(data.get('refresh', attrs['refresh']), user)
+        return data
+
+
+class ClaimsTokenUser(TokenUser):
+    """User backed by the claims of an access token, answering permission checks without the database."""
+
+    @cached_property
+    def permissions(self) -> frozenset:
+        return frozenset(self.token.get(PERMISSIONS_CLAIM, []))
+
+    @cached_property
+    def restaurant_id(self):
+        return self.token.get('restaurant_id')
+
+    @cached_property
+    def employee(self) -> Employee:
+        employee_id = self.token.get('employee_id')
+        if employee_id is None:
+            raise User.employee.RelatedObjectDoesNotExist('User has no employee.')
+        # Only the keys are known, other fields are loaded on first access
+        return Employee.from_db(None, ['id', 'user_id'], [employee_id, self.id])
+
+    def __getattr__(self, attr):
+        # TokenUser answers unknown attributes from the claims, a missing employee must keep raising
+        if attr == 'employee':
+            raise User.employee.RelatedObjectDoesNotExist('User has no employee.')
+        return super().__getattr__(attr)
+
+    def get_all_permissions(self, obj=None) -> set:
+        return set(self.permissions)
+
+    def has_perm(self, perm, obj=None) -> bool:
+        return self.is_active and (self.is_superuser or perm in self.permissions)
+
+    def has_perms(self, perm_list, obj=None) -> bool:
+        return all(self.has_perm(perm, obj) for perm in perm_list)
+
+    def has_module_perms(self, module) -> bool:
+        return self.is_active and (self.is_superuser or any(perm.startswith(f'{module}.') for perm in self.permissions))
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that, with settings.STATELESS_JWT_AUTH, builds request.user from the token claims instead of
+    the database. A token whose permission version is behind the user's current one is rejected, the client then
+    refreshes it to get the new grants. Tokens issued without the claims fall back to the database user.
+    """
+
+    def get_user(self, validated_token):
+        if not getattr(settings, 'STATELESS_JWT_AUTH', False) or PERMISSIONS_CLAIM not in validated_token:
+            return super().get_user(validated_token)
+
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken(_('Token contained no recognizable user identification'))
+        if validated_token.get(PERMISSION_VERSION_CLAIM) != permission_version(user_id):
+            raise AuthenticationFailed(_('The user\'s permissions have changed.'), code='permissions_changed')
+        return ClaimsTokenUser(validated_token)
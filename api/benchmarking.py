@@ -0,0 +1,200 @@
+import json
+import math
+import threading
+import time
+import urllib.error
+import urllib.request
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from django.conf import settings
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+
+
+def percentile(values: list[float], q: float) -> float:
+    """Nearest-rank percentile of the values, q between 0 and 100."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(math.ceil(q / 100 * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+@dataclass
+class BenchResponse:
+    status: int
+    data: Any
+    headers: dict
+    queries: Optional[int] = None
+
+
+@dataclass
+class EndpointStats:
+    latencies: list[float] = field(default_factory=list)
+    queries: list[int] = field(default_factory=list)
+    statuses: dict[int, int] = field(default_factory=lambda: defaultdict(int))
+    errors: int = 0
+
+    def summary(self, wall_time: float) -> dict:
+        latencies_ms = [latency * 1000 for latency in self.latencies]
+        return {
+            'requests': len(self.latencies),
+            'errors': self.errors,
+            'statuses': dict(sorted(self.statuses.items())),
+            'throughput_rps': round(len(self.latencies) / wall_time, 2) if wall_time else 0.0,
+            'mean_ms': round(sum(latencies_ms) / len(latencies_ms), 2) if latencies_ms else 0.0,
+            'p50_ms': round(percentile(latencies_ms, 50), 2),
+            'p95_ms': round(percentile(latencies_ms, 95), 2),
+            'p99_ms': round(percentile(latencies_ms, 99), 2),
+            'max_ms': round(max(latencies_ms, default=0.0), 2),
+            'queries_per_request': round(sum(self.queries) / len(self.queries), 2) if self.queries else None,
+        }
+
+
+class Recorder:
+    """Thread-safe collection of the latencies, statuses and query counts of each endpoint."""
+
+    def __init__(self):
+        self.stats: dict[str, EndpointStats] = defaultdict(EndpointStats)
+        self.lock = threading.Lock()
+
+    def record(self, endpoint: str, latency: float, response: Optional[BenchResponse]):
+        with self.lock:
+            stats = self.stats[endpoint]
+            stats.latencies.append(latency)
+            if response is None:
+                stats.errors += 1
+                return
+            stats.statuses[response.status] += 1
+            if response.status >= 400:
+                stats.errors += 1
+            if response.queries is not None:
+                stats.queries.append(response.queries)
+
+    def summary(self, wall_time: float) -> dict:
+        return {endpoint: stats.summary(wall_time) for endpoint, stats in sorted(self.stats.items())}
+
+
+class InProcessTransport:
+    """Calls the API through Django's test client in this process, counting the queries of each request."""
+    counts_queries = True
+
+    def __init__(self):
+        hosts = [host for host in settings.ALLOWED_HOSTS if host not in ('*', '')]
+        self.client = Client(HTTP_HOST=hosts[0].lstrip('.') if hosts else 'localhost')
+
+    def request(self, method: str, path: str, data=None, headers=None) -> BenchResponse:
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.generic(
+                method, path, json.dumps(data) if data is not None else '', 'application/json', headers=headers
+            )
+        body = json.loads(response.content) if response.content else None
+        return BenchResponse(response.status_code, body, dict(response.headers), len(captured.captured_queries))
+
+
+class HttpTransport:
+    """Calls a running server over HTTP, query counts are not available."""
+    counts_queries = False
+
+    def __init__(self, base_url: str):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method: str, path: str, data=None, headers=None) -> BenchResponse:
+        body = json.dumps(data).encode() if data is not None else None
+        request = urllib.request.Request(
+            self.base_url + path, data=body, method=method,
+            headers={'Content-Type': 'application/json', **(headers or {})},
+        )
+        try:
+            with urllib.request.urlopen(request, timeout=60) as response:
+                status, content, response_headers = response.status, response.read(), dict(response.headers)
+        except urllib.error.HTTPError as error:
+            status, content, response_headers = error.code, error.read(), dict(error.headers)
+        return BenchResponse(status, json.loads(content) if content else None, response_headers)
+
+
+class ProcessSampler:
+    """
+    Samples the resident memory and thread count of a (server) process and its children, e.g. the workers of a
+    preforking server, from /proc while a run goes on.
+    """
+
+    def __init__(self, pid: int, interval: float = 0.1):
+        self.pid = pid
+        self.interval = interval
+        self.peak_rss_kb = 0
+        self.peak_threads = 0
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+
+    def process_tree(self, pid: int) -> list[int]:
+        pids = [pid]
+        try:
+            with open(f'/proc/{pid}/task/{pid}/children') as children:
+                for child in children.read().split():
+                    pids.extend(self.process_tree(int(child)))
+        except OSError:
+            pass
+        return pids
+
+    def sample(self):
+        rss_kb = threads = 0
+        for pid in self.process_tree(self.pid):
+            try:
+                with open(f'/proc/{pid}/status') as status:
+                    fields = dict(line.split(':', 1) for line in status if ':' in line)
+            except OSError:
+                # A worker that exited in between
+                continue
+            rss_kb += int(fields['VmRSS'].split()[0])
+            threads += int(fields['Threads'])
+        self.peak_rss_kb = max(self.peak_rss_kb, rss_kb)
+        self.peak_threads = max(self.peak_threads, threads)
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            try:
+                self.sample()
+            except (OSError, KeyError, ValueError):
+                return
+
+    def __enter__(self):
+        self.sample()
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stopped.set()
+        self.thread.join()
+
+    def summary(self) -> dict:
+        return {'pid': self.pid, 'peak_rss_mb': round(self.peak_rss_kb / 1024, 1), 'peak_threads': self.peak_threads}
+
+
+def timed(recorder: Recorder, endpoint: str, transport, method: str, path: str, **kwargs) -> Optional[BenchResponse]:
+    started = time.perf_counter()
+    try:
+        response = transport.request(method, path, **kwargs)
+    except Exception:
+        response = None
+    recorder.record(endpoint, time.perf_counter() - started, response)
+    return response
+
+
+def compare(current: dict, baseline: dict) -> list[str]:
+    """Lines describing how the endpoints of a result moved against a baseline result."""
+    lines = []
+    for endpoint, stats in current['endpoints'].items():
+        before = baseline.get('endpoints', {}).get(endpoint)
+        if not before:
+            continue
+        changes = []
+        for metric in ['throughput_rps', 'p50_ms', 'p95_ms', 'p99_ms', 'queries_per_request']:
+            if before.get(metric) and stats.get(metric) is not None:
+                change = (stats[metric] - before[metric]) / before[metric] * 100
+                changes.append(f'{metric} {before[metric]} -> {stats[metric]} ({change:+.1f}%)')
+        lines.append(f"{endpoint}: {', '.join(changes)}")
+    return lines
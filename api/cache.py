@@ -0,0 +1,109 @@
+import hashlib
+import json
+import time
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Awaitable, Callable
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import transaction
+from django.utils.http import parse_etags
+
+from .db_routers import primary
+
+PAYLOAD_TIMEOUT = getattr(settings, 'PAYLOAD_CACHE_TIMEOUT', 60 * 60 * 24)
+
+
+@dataclass
+class CachedPayload:
+    data: Any
+    etag: str
+
+
+def menus_scope(day: date) -> str:
+    return f'menus:{day.isoformat()}'
+
+
+def get_version(scope: str) -> int:
+    version = cache.get(f'version:{scope}')
+    if version is None:
+        # A fresh version can never match a payload cached before the key was evicted
+        cache.add(f'version:{scope}', time.time_ns(), None)
+        version = cache.get(f'version:{scope}')
+    return version
+
+
+async def aget_version(scope: str) -> int:
+    version = await cache.aget(f'version:{scope}')
+    if version is None:
+        await cache.aadd(f'version:{scope}', time.time_ns(), None)
+        version = await cache.aget(f'version:{scope}')
+    return version
+
+
+def bump_version(scope: str) -> None:
+    """Invalidate the payloads of a scope once the current transaction commits."""
+    transaction.on_commit(lambda: cache.set(f'version:{scope}', time.time_ns(), None))
+
+
+def compute_etag(data: Any) -> str:
+    content = json.dumps(data, cls=DjangoJSONEncoder, sort_keys=True).encode()
+    return f'"{hashlib.sha256(content).hexdigest()}"'
+
+
+def cached_payload(scope: str, build: Callable[[], Any]) -> CachedPayload:
+    """Return the payload of a scope from the cache, building and storing it on a miss."""
+    key = f'payload:{scope}:{get_version(scope)}'
+    payload = cache.get(key)
+    if payload is None:
+        # A replica behind the write that bumped the version would cache stale data under the new version
+        with primary():
+            data = build()
+        payload = CachedPayload(data=data, etag=compute_etag(data))
+        cache.set(key, payload, PAYLOAD_TIMEOUT)
+    return payload
+
+
+async def acached_payload(scope: str, build: Callable[[], Awaitable[Any]]) -> CachedPayload:
+    """cached_payload() for async views, build is awaited on a miss."""
+    key = f'payload:{scope}:{await aget_version(scope)}'
+    payload = await cache.aget(key)
+    if payload is None:
+        with primary():
+            data = await build()
+        payload = CachedPayload(data=data, etag=compute_etag(data))
+        await cache.aset(key, payload, PAYLOAD_TIMEOUT)
+    return payload
+
+
+def representation_etag(etag: str, request) -> str:
+    """The payload's ETag for the negotiated format, JSON keeps the plain one: "abc" -> "abc-msgpack"."""
+    renderer_format = getattr(request.accepted_renderer, 'format', 'json')
+    return etag if renderer_format == 'json' else f'{etag[:-1]}-{renderer_format}"'
+
+
+# Content codings the compression middleware appends to ETags
+ENCODED_ETAG_SUFFIXES = ('-gzip"', '-br"')
+
+
+def encoded_etag(etag: str, encoding: str) -> str:
+    """The ETag of the compressed body: "abc" -> "abc-gzip"."""
+    return f'{etag[:-1]}-{encoding}"'
+
+
+def decoded_etag(etag: str) -> str:
+    for suffix in ENCODED_ETAG_SUFFIXES:
+        if etag.endswith(suffix):
+            return etag[:-len(suffix)] + '"'
+    return etag
+
+
+def etag_matches(request, etag: str) -> bool:
+    """Weak comparison of the request's If-None-Match header with an ETag, whatever the content coding."""
+    if_none_match = request.headers.get('If-None-Match')
+    if not if_none_match:
+        return False
+    etags = parse_etags(if_none_match)
+    return '*' in etags or etag in [decoded_etag(candidate.removeprefix('W/')) for candidate in etags]
@@ -0,0 +1,114 @@
+import gzip
+import zlib
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.cache import patch_vary_headers
+from django.utils.http import parse_etags
+
+from .cache import PAYLOAD_TIMEOUT, encoded_etag
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - optional dependency
+    brotli = None
+
+# Bodies worth keeping compressed in the cache: the cached payloads, the same bytes for every client
+PRECOMPRESSED_TYPES = ('application/json', 'application/msgpack')
+
+
+def compression_settings() -> dict:
+    return {
+        'MIN_SIZE': 1024,
+        'GZIP_LEVEL': 6,
+        'BROTLI_QUALITY': 5,
+        **getattr(settings, 'COMPRESSION', {}),
+    }
+
+
+def available_encodings() -> list[str]:
+    """Supported content codings, preferred first."""
+    return ['br', 'gzip'] if brotli is not None else ['gzip']
+
+
+def choose_encoding(request) -> Optional[str]:
+    """The preferred supported coding the client accepts (q > 0), if any."""
+    accepted: dict[str, float] = {}
+    for item in request.headers.get('Accept-Encoding', '').split(','):
+        coding, _, params = item.strip().partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        accepted[coding.strip().lower()] = quality
+
+    best, best_quality = None, 0.0
+    for encoding in available_encodings():
+        quality = accepted.get(encoding, accepted.get('*', 0.0))
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+def compress(content: bytes, encoding: str) -> bytes:
+    config = compression_settings()
+    if encoding == 'br':
+        return brotli.compress(content, quality=config['BROTLI_QUALITY'])
+    # No timestamp, the same body always compresses to the same bytes
+    return gzip.compress(content, compresslevel=config['GZIP_LEVEL'], mtime=0)
+
+
+def precompressed_key(etag: str, encoding: str, content: bytes) -> str:
+    # The length and checksum guard against a body that differs under the same validator, e.g. indented JSON
+    return f'compressed:{encoding}:{etag}:{len(content)}:{zlib.crc32(content)}'
+
+
+def compress_response(request, response):
+    """
+    Compress the body for the client's Accept-Encoding, suffixing the ETag with the coding. Bodies of cached
+    payloads (an ETag and a JSON or MessagePack type) are compressed once and kept in the cache next to them.
+    """
+    patch_vary_headers(response, ('Accept-Encoding',))
+    encoding = choose_encoding(request)
+    if encoding is None:
+        return response
+
+    etag = response.get('ETag')
+    if response.status_code == 304:
+        # Revalidating a compressed representation, answer with the validator the client holds
+        if etag and encoded_etag(etag, encoding) in parse_etags(request.headers.get('If-None-Match', '')):
+            response['ETag'] = encoded_etag(etag, encoding)
+        return response
+
+    content = response.content
+    if etag and response.get('Content-Type', '').startswith(PRECOMPRESSED_TYPES):
+        key = precompressed_key(etag, encoding, content)
+        compressed = cache.get(key)
+        if compressed is None:
+            compressed = compress(content, encoding)
+            cache.set(key, compressed, PAYLOAD_TIMEOUT)
+    else:
+        compressed = compress(content, encoding)
+    if len(compressed) >= len(content):
+        return response
+
+    response.content = compressed
+    response['Content-Length'] = str(len(compressed))
+    response['Content-Encoding'] = encoding
+    if etag:
+        response['ETag'] = encoded_etag(etag, encoding)
+    return response
+
+
+def should_compress(response) -> bool:
+    if response.streaming or response.has_header('Content-Encoding'):
+        # Streams (Server-Sent Events) must reach the client as they are written
+        return False
+    if 'no-transform' in response.get('Cache-Control', ''):
+        return False
+    return response.status_code == 304 or len(response.content) >= compression_settings()['MIN_SIZE']
@@ -0,0 +1,69 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from itertools import count
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+
+# Whether the reads of the current context must see the primary; outside of requests (commands, signals, tests)
+# every read does. ReplicaRoutingMiddleware clears it for safe requests of clients that did not write recently.
+reads_from_primary: ContextVar[bool] = ContextVar('reads_from_primary', default=True)
+
+_next_replica = count()
+
+
+def replica_aliases() -> list[str]:
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def primary_pin_key(client: str) -> str:
+    return f'primary-pin:{client}'
+
+
+def pin_to_primary(client: str) -> None:
+    """Send the client's reads to the primary until the replicas have caught up with its write."""
+    cache.set(primary_pin_key(client), True, settings.REPLICA_PIN_SECONDS)
+
+
+async def apin_to_primary(client: str) -> None:
+    await cache.aset(primary_pin_key(client), True, settings.REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(client: str) -> bool:
+    return bool(cache.get(primary_pin_key(client)))
+
+
+async def ais_pinned_to_primary(client: str) -> bool:
+    return bool(await cache.aget(primary_pin_key(client)))
+
+
+@contextmanager
+def primary():
+    """Read from the primary inside the block, e.g. to fill a cache that later requests trust."""
+    token = reads_from_primary.set(True)
+    try:
+        yield
+    finally:
+        reads_from_primary.reset(token)
+
+
+class PrimaryReplicaRouter:
+    """Writes go to the primary, reads go round-robin to the DATABASE_REPLICAS when the context allows it."""
+
+    def db_for_read(self, model, **hints) -> Optional[str]:
+        replicas = replica_aliases()
+        if not replicas or reads_from_primary.get():
+            return 'default'
+        return replicas[next(_next_replica) % len(replicas)]
+
+    def db_for_write(self, model, **hints) -> Optional[str]:
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints) -> Optional[bool]:
+        # Every alias holds the same data
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints) -> Optional[bool]:
+        # Replicas get the schema through replication, migrate only touches them when named with --database
+        return None
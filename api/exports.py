@@ -0,0 +1,83 @@
+import csv
+from datetime import date
+from itertools import islice
+from typing import AsyncIterator, Iterable, Iterator
+
+import orjson
+from asgiref.sync import sync_to_async
+
+from .models import Ballot, Vote
+from .renderers import ORJSON_OPTIONS
+from .vote_storage import ballots_enabled
+
+EXPORT_FIELDS = ['date', 'employee_id', 'username', 'menu_id', 'restaurant_id', 'restaurant', 'points', 'cast_at']
+EXPORT_FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+# Rows per fetch from the server-side cursor, and per hop to the event loop when served over ASGI
+CHUNK_SIZE = 2000
+
+
+def vote_export_rows(start: date, end: date, chunk_size: int = CHUNK_SIZE) -> Iterator[tuple]:
+    """The votes cast from start to end (inclusive) as EXPORT_FIELDS tuples, streamed from the database."""
+    if ballots_enabled():
+        yield from _ballot_export_rows(start, end, chunk_size)
+        return
+    votes = Vote.objects.filter(date__range=(start, end)).order_by('date', 'id').values_list(
+        'date', 'employee_id', 'employee__user__username', 'menu_id', 'menu__restaurant_id', 'menu__restaurant__name',
+        'points', 'created_at',
+    )
+    yield from votes.iterator(chunk_size=chunk_size)
+
+
+def _ballot_export_rows(start: date, end: date, chunk_size: int) -> Iterator[tuple]:
+    slot_fields = [
+        field
+        for slot in range(1, len(Ballot.SLOT_FIELDS) + 1)
+        for field in [f'menu_{slot}', f'menu_{slot}__restaurant_id', f'menu_{slot}__restaurant__name', f'points_{slot}']
+    ]
+    ballots = Ballot.objects.filter(date__range=(start, end)).order_by('date', 'id').values_list(
+        'date', 'employee_id', 'employee__user__username', 'created_at', *slot_fields,
+    )
+    for day, employee_id, username, created_at, *slots in ballots.iterator(chunk_size=chunk_size):
+        for offset in range(0, len(slots), 4):
+            menu_id, restaurant_id, restaurant, points = slots[offset:offset + 4]
+            if menu_id is not None:
+                yield day, employee_id, username, menu_id, restaurant_id, restaurant, points, created_at
+
+
+class Echo:
+    """A file-like object whose write() returns the line, for csv.writer to format one row at a time."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows: Iterable[tuple]) -> Iterator[str]:
+    writer = csv.writer(Echo())
+    yield writer.writerow(EXPORT_FIELDS)
+    for row in rows:
+        yield writer.writerow(row)
+
+
+def ndjson_lines(rows: Iterable[tuple]) -> Iterator[bytes]:
+    for row in rows:
+        yield orjson.dumps(dict(zip(EXPORT_FIELDS, row)), option=ORJSON_OPTIONS | orjson.OPT_APPEND_NEWLINE)
+
+
+def export_lines(rows: Iterable[tuple], output: str) -> Iterator:
+    return csv_lines(rows) if output == 'csv' else ndjson_lines(rows)
+
+
+async def aiterate(iterator: Iterator, chunk_size: int = CHUNK_SIZE) -> AsyncIterator:
+    """
+    Serve a sync iterator from an async one, chunk by chunk. Over ASGI Django would otherwise read a sync
+    StreamingHttpResponse iterator to the end before sending anything.
+    """
+    # Thread sensitive, the database cursor stays on the thread that opened it
+    next_chunk = sync_to_async(lambda: list(islice(iterator, chunk_size)), thread_sensitive=True)
+    while chunk := await next_chunk():
+        for item in chunk:
+            yield item
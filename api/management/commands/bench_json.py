@@ -0,0 +1,65 @@
+import io
+import timeit
+from datetime import date
+
+import msgpack
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Sum
+from django.utils import timezone
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import DailyTally, Menu
+from api.parsers import ORJSONParser
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from api.serializers.menu_serializers import MenuSerializer
+from api.results import results_payload, results_tallies, results_votes, vote_rows
+
+# Renderer and decoder of each codec, JSON is decoded by the API's parsers
+CODECS = {
+    'drf': (JSONRenderer, lambda content: JSONParser().parse(io.BytesIO(content))),
+    'orjson': (ORJSONRenderer, lambda content: ORJSONParser().parse(io.BytesIO(content))),
+    # As a client decodes it, the results are keyed by integer menu ids
+    'msgpack': (MessagePackRenderer, lambda content: msgpack.unpackb(content, strict_map_key=False)),
+}
+
+
+class Command(BaseCommand):
+    help = ('Time rendering and parsing the current-day-menu and all-votes-results payloads with DRF\'s JSON, orjson '
+            'and MessagePack')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help='Day of the payloads (YYYY-MM-DD). Defaults to the day with the most votes.')
+        parser.add_argument('--repeat', type=int, default=200, help='Renders and parses timed per payload and codec.')
+
+    def handle(self, *args, **options):
+        day = options['date'] or (
+            DailyTally.objects.values('date').annotate(votes=Sum('vote_count')).order_by('-votes')
+            .values_list('date', flat=True).first()
+        ) or timezone.now().date()
+
+        payloads = {
+            'current-day-menu': MenuSerializer(
+                Menu.objects.filter(date=day).select_related('restaurant__owner'), many=True
+            ).data,
+            'all-votes-results': results_payload(list(results_tallies(day)), list(vote_rows(results_votes(day)))),
+        }
+        self.stdout.write(f'Payloads of {day}, {options["repeat"]} runs each')
+        self.stdout.write(f'{"payload":<20}{"codec":<8}{"bytes":>10}{"render µs":>12}{"parse µs":>12}')
+        for name, data in payloads.items():
+            baseline = None
+            for codec, (renderer_class, decode) in CODECS.items():
+                renderer = renderer_class()
+                content = renderer.render(data)
+                if baseline is None:
+                    baseline = content
+                elif renderer.format == 'json' and content != baseline:
+                    raise CommandError(f'{codec} renders {name} differently from drf')
+
+                render = timeit.timeit(lambda: renderer.render(data), number=options['repeat'])
+                parse = timeit.timeit(lambda: decode(content), number=options['repeat'])
+                self.stdout.write(
+                    f'{name:<20}{codec:<8}{len(content):>10}'
+                    f'{render / options["repeat"] * 1e6:>12.1f}{parse / options["repeat"] * 1e6:>12.1f}'
+                )
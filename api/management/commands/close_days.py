@@ -0,0 +1,41 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.models import DailyTally
+from api.rollups import close_days, last_closed_day, unclosed_dates
+from api.tallies import rebuild_tallies
+
+
+class Command(BaseCommand):
+    help = 'Roll up the results of the days that are over, per restaurant, for the results and range endpoints'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', action='append', type=date.fromisoformat, dest='dates',
+                            help='Day (YYYY-MM-DD) to roll up again, can be repeated. Defaults to every day that is '
+                                 'over and has no rollups yet.')
+        parser.add_argument('--all', action='store_true', help='Roll up every day that is over again.')
+        parser.add_argument('--rebuild-tallies', action='store_true',
+                            help='Rebuild the tallies of the days from the raw votes first.')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            dates = sorted(set(
+                DailyTally.objects.filter(date__lte=last_closed_day()).values_list('date', flat=True).distinct()
+            ))
+        elif options['dates']:
+            dates = sorted(set(options['dates']))
+            if dates[-1] > last_closed_day():
+                raise CommandError(f'{dates[-1]} is not over yet, days up to {last_closed_day()} can be rolled up.')
+        else:
+            dates = unclosed_dates()
+
+        if not dates:
+            self.stdout.write(self.style.SUCCESS('Every day is rolled up.'))
+            return
+        if options['rebuild_tallies']:
+            rebuild_tallies(dates)
+        count = close_days(dates)
+        self.stdout.write(self.style.SUCCESS(
+            f'Rolled up {len(dates)} days ({dates[0]} to {dates[-1]}) into {count} rows.'
+        ))
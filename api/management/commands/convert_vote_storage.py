@@ -0,0 +1,30 @@
+from datetime import date
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.vote_storage import convert_to_ballots, convert_to_votes
+
+
+class Command(BaseCommand):
+    help = 'Copy the cast votes between the Vote table and the Ballot table, e.g. before switching VOTE_STORAGE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--to', choices=['ballots', 'votes'], required=True, help='Storage to fill.')
+        parser.add_argument('--date', action='append', type=date.fromisoformat, dest='dates',
+                            help='Date (YYYY-MM-DD) to convert, can be repeated. Defaults to every date.')
+
+    def handle(self, *args, **options):
+        if options['to'] == 'ballots':
+            count, dropped = convert_to_ballots(options['dates'])
+            self.stdout.write(self.style.SUCCESS(f'Stored {count} ballots.'))
+            if dropped:
+                self.stdout.write(self.style.WARNING(
+                    f'{dropped} votes were left out, a ballot holds the first three menus of an employee and day.'
+                ))
+        else:
+            count = convert_to_votes(options['dates'])
+            self.stdout.write(self.style.SUCCESS(f'Stored {count} votes.'))
+
+        if getattr(settings, 'VOTE_STORAGE', 'votes') != options['to']:
+            self.stdout.write(f"Set VOTE_STORAGE={options['to']} to cast and read votes from them.")
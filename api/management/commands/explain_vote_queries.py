@@ -0,0 +1,33 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from api.models import Ballot, Employee, Vote
+from api.results import employee_votes_of_day, results_votes
+from api.vote_storage import ballots_enabled
+
+
+class Command(BaseCommand):
+    help = 'Print the query plans of the per-day vote lookups of the configured VOTE_STORAGE'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat, help='Date (YYYY-MM-DD) to look up. Defaults to today.')
+        parser.add_argument('--employee', type=int, help='Employee id for the my-vote lookup. Defaults to the first one.')
+        parser.add_argument('--analyze', action='store_true', help='Run the queries (EXPLAIN ANALYZE, PostgreSQL only).')
+
+    def handle(self, *args, **options):
+        day = options['date'] or timezone.now().date()
+        employee_id = options['employee'] or Employee.objects.values_list('id', flat=True).first()
+        explain_options = {'analyze': True, 'buffers': True} if options['analyze'] else {}
+
+        stored = Ballot.objects if ballots_enabled() else Vote.objects
+        queries = {
+            'all-votes-results': results_votes(day),
+            'my-vote': employee_votes_of_day(day, employee_id=employee_id),
+            'already-voted': stored.filter(employee_id=employee_id, date=day).values_list('id', flat=True),
+        }
+        for name, queryset in queries.items():
+            self.stdout.write(self.style.SUCCESS(name))
+            self.stdout.write(queryset.explain(**explain_options))
+            self.stdout.write('')
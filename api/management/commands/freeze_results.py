@@ -0,0 +1,29 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.snapshots import freeze_day, voting_closed
+
+
+class Command(BaseCommand):
+    help = 'Freeze the results of a day whose voting closed into its immutable snapshot (run after VOTING_DEADLINE)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', type=date.fromisoformat,
+                            help='Day (YYYY-MM-DD) to freeze. Defaults to today.')
+
+    def handle(self, *args, **options):
+        day = options['date'] or timezone.now().date()
+        if not voting_closed(day):
+            raise CommandError(f'Voting for {day} is still open.')
+
+        snapshot = freeze_day(day)
+        if not snapshot.ranking:
+            self.stdout.write(self.style.SUCCESS(f'Froze the results of {day}: no votes were cast.'))
+            return
+        self.stdout.write(self.style.SUCCESS(
+            f"Froze the results of {day} at {snapshot.created_at:%H:%M}: menu {snapshot.winner_id} won with "
+            f"{snapshot.ranking[0]['points']} points ({snapshot.tie_break['decided_by']} decided), "
+            f"{snapshot.vote_count} votes."
+        ))
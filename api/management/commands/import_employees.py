@@ -0,0 +1,42 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.onboarding import import_employees
+
+
+class Command(BaseCommand):
+    help = ('Create employees from a CSV file (username,password,email,first_name,last_name,phone,position header) '
+            'or a JSON list, hashing the passwords in parallel')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', type=Path, help='CSV or JSON file, by extension.')
+        parser.add_argument('--workers', type=int, help='Password hashing processes, 0 for one per CPU. '
+                                                        'Defaults to EMPLOYEE_IMPORT_HASH_WORKERS.')
+        parser.add_argument('--chunk-size', type=int, help='Employees per transaction. '
+                                                           'Defaults to EMPLOYEE_IMPORT_CHUNK_SIZE.')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        try:
+            with path.open(newline='', encoding='utf-8') as file:
+                rows = json.load(file) if path.suffix.lower() == '.json' else list(csv.DictReader(file))
+        except (OSError, ValueError, csv.Error) as exc:
+            raise CommandError(f'Cannot read {path}: {exc}')
+        if not isinstance(rows, list):
+            raise CommandError('The JSON file must hold a list of employees.')
+
+        started = time.perf_counter()
+        results = import_employees(rows, workers=options['workers'], chunk_size=options['chunk_size'])
+        elapsed = time.perf_counter() - started
+
+        failed = [result for result in results if result['status'] != 'created']
+        for result in failed:
+            self.stdout.write(self.style.WARNING(f"Row {result['row'] + 1}: {result['status']} {result['errors']}"))
+        created = len(results) - len(failed)
+        self.stdout.write(self.style.SUCCESS(
+            f'Imported {created} employees in {elapsed:.2f}s, {len(failed)} rows skipped.'
+        ))
@@ -2,6 +2,7 @@ from django.core.management.base import BaseCommand
 from django.contrib.auth.models import Group, Permission
 
 from api.constants import GROUP_NAMES
+from api.permission_cache import bump_permissions
 
 
 class Command(BaseCommand):
@@ -30,5 +31,7 @@ class Command(BaseCommand):
         admin_group.permissions.add(*admin_permissions)
         restaurant_owner_group.permissions.add(*restaurant_owner_permissions)
         employee_group.permissions.add(*employee_permissions)
+        # Drop the cached permission sets and token grants of every user
+        bump_permissions()
 
         self.stdout.write(self.style.SUCCESS('Admin, RestaurantOwner, Employee Groups created with permissions'))
\ No newline at end of file
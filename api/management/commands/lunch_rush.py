@@ -0,0 +1,178 @@
+import json
+import platform
+import random
+import subprocess
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, connections
+from django.utils import timezone
+
+from api.benchmarking import HttpTransport, InProcessTransport, ProcessSampler, Recorder, compare, timed
+from api.models import Ballot, Employee, Vote
+from api.tallies import rebuild_tallies
+
+V1 = {'Accept': 'application/json; version=v1'}
+V2 = {'Accept': 'application/json; version=v2'}
+
+
+class Command(BaseCommand):
+    help = ('Simulate the lunch rush: concurrent employees log in, read the menus, vote and check the results. '
+            'Today\'s votes of the simulated employees are deleted first, run it against a local database.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=200, help='Simulated employees (employee1..N from seed).')
+        parser.add_argument('--concurrency', type=int, default=16, help='Employees acting at the same time.')
+        parser.add_argument('--v2-share', type=float, default=0.5, help='Share of the employees using the v2 app.')
+        parser.add_argument('--menu-polls', type=int, default=3,
+                            help='current-day-menu requests per employee, the later ones with If-None-Match.')
+        parser.add_argument('--results-polls', type=int, default=1,
+                            help='all-votes-results requests (as admin) per employee.')
+        parser.add_argument('--password', default='123qwe!@#QWE', help='Password of the employees.')
+        parser.add_argument('--admin-username', default='admin')
+        parser.add_argument('--admin-password', default='adminpassword')
+        parser.add_argument('--url', help='Benchmark a running server at this base URL instead of in-process.')
+        parser.add_argument('--server-pid', type=int,
+                            help='Process id of the --url server, to report the peak memory and threads of it and '
+                                 'its workers.')
+        parser.add_argument('--reads-only', action='store_true',
+                            help='Skip casting votes, only exercise the read endpoints.')
+        parser.add_argument('--output', help='Write the results as JSON to this file.')
+        parser.add_argument('--compare', help='A previous JSON result to compare with.')
+        parser.add_argument('--random-seed', type=int)
+
+    def handle(self, *args, **options):
+        usernames = list(
+            Employee.objects.filter(user__username__startswith='employee')
+            .order_by('id').values_list('user__username', flat=True)[:options['employees']]
+        )
+        if not usernames:
+            raise CommandError('No employees to simulate, run manage.py seed first.')
+
+        # Start from an empty ballot box for the simulated employees
+        today = timezone.now().date()
+        Vote.objects.filter(employee__user__username__in=usernames, date=today).delete()
+        Ballot.objects.filter(employee__user__username__in=usernames, date=today).delete()
+        rebuild_tallies([today])
+
+        self.options = options
+        self.random = random.Random(options['random_seed'])
+        self.recorder = Recorder()
+        self.local = threading.local()
+        self.admin_token = self.login(options['admin_username'], options['admin_password'])
+
+        sampler = ProcessSampler(options['server_pid']) if options['server_pid'] else None
+        started = time.perf_counter()
+        with sampler or nullcontext():
+            if options['concurrency'] > 1:
+                with ThreadPoolExecutor(max_workers=options['concurrency']) as executor:
+                    list(executor.map(self.simulate_employee_in_thread, usernames))
+            else:
+                for username in usernames:
+                    self.simulate_employee(username)
+        wall_time = time.perf_counter() - started
+
+        result = {
+            'meta': {
+                'started_at': datetime.now().isoformat(timespec='seconds'),
+                'commit': self.git_commit(),
+                'transport': 'http' if options['url'] else 'in-process',
+                'database': connection.vendor,
+                'python': platform.python_version(),
+                'employees': len(usernames),
+                'concurrency': options['concurrency'],
+                'v2_share': options['v2_share'],
+                'wall_time_s': round(wall_time, 3),
+                'server': sampler.summary() if sampler else None,
+            },
+            'endpoints': self.recorder.summary(wall_time),
+        }
+        self.print_result(result)
+        if options['output']:
+            with open(options['output'], 'w') as output:
+                json.dump(result, output, indent=2)
+        if options['compare']:
+            with open(options['compare']) as baseline:
+                for line in compare(result, json.load(baseline)):
+                    self.stdout.write(line)
+
+    @property
+    def transport(self):
+        # One client (and database connection) per thread
+        if not hasattr(self.local, 'transport'):
+            url = self.options['url']
+            self.local.transport = HttpTransport(url) if url else InProcessTransport()
+        return self.local.transport
+
+    def login(self, username, password):
+        response = timed(self.recorder, 'token', self.transport, 'POST', '/api/token/',
+                         data={'username': username, 'password': password})
+        if response is None or response.status != 200:
+            raise CommandError(f'Could not log in as {username}.')
+        return response.data['access']
+
+    def simulate_employee(self, username):
+        try:
+            token = self.login(username, self.options['password'])
+            auth = {'Authorization': f'Bearer {token}'}
+            version = V2 if self.random.random() < self.options['v2_share'] else V1
+
+            menus, etag = [], None
+            for _ in range(self.options['menu_polls']):
+                headers = {**auth, **version, **({'If-None-Match': etag} if etag else {})}
+                response = timed(self.recorder, 'current-day-menu', self.transport,
+                                 'GET', '/api/menus/current-day-menu/', headers=headers)
+                if response is not None and response.status == 200:
+                    menus, etag = response.data, response.headers.get('ETag')
+
+            menu_ids = [] if self.options['reads_only'] else [menu['id'] for menu in menus]
+            if version is V2 and len(menu_ids) >= 3:
+                picked = self.random.sample(menu_ids, 3)
+                data = {'top_menus': [{'menu_id': menu_id, 'points': points} for menu_id, points in zip(picked, [3, 2, 1])]}
+                timed(self.recorder, 'cast-vote-v2', self.transport, 'POST', '/api/votes/cast-vote/',
+                      data=data, headers={**auth, **V2})
+            elif menu_ids:
+                timed(self.recorder, 'cast-vote-v1', self.transport, 'POST', '/api/votes/cast-vote/',
+                      data={'menu_id': self.random.choice(menu_ids)}, headers={**auth, **V1})
+
+            timed(self.recorder, 'my-vote', self.transport, 'GET', '/api/votes/my-vote/', headers={**auth, **version})
+            for _ in range(self.options['results_polls']):
+                timed(self.recorder, 'all-votes-results', self.transport, 'GET', '/api/votes/all-votes-results/',
+                      headers={'Authorization': f'Bearer {self.admin_token}'})
+        except CommandError as error:
+            self.stderr.write(str(error))
+
+    def simulate_employee_in_thread(self, username):
+        try:
+            self.simulate_employee(username)
+        finally:
+            connections.close_all()
+
+    def print_result(self, result):
+        meta = result['meta']
+        self.stdout.write(
+            f"{meta['employees']} employees, concurrency {meta['concurrency']}, {meta['transport']} on "
+            f"{meta['database']}, {meta['wall_time_s']}s"
+        )
+        if meta['server']:
+            self.stdout.write(f"server: peak RSS {meta['server']['peak_rss_mb']} MB, "
+                              f"peak threads {meta['server']['peak_threads']}")
+        self.stdout.write(f"{'endpoint':<20}{'requests':>9}{'errors':>8}{'req/s':>9}{'p50 ms':>9}"
+                          f"{'p95 ms':>9}{'p99 ms':>9}{'queries':>9}")
+        for endpoint, stats in result['endpoints'].items():
+            queries = stats['queries_per_request']
+            self.stdout.write(
+                f"{endpoint:<20}{stats['requests']:>9}{stats['errors']:>8}{stats['throughput_rps']:>9}"
+                f"{stats['p50_ms']:>9}{stats['p95_ms']:>9}{stats['p99_ms']:>9}{queries if queries is not None else '-':>9}"
+            )
+
+    def git_commit(self):
+        try:
+            return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                  timeout=5).stdout.strip() or None
+        except (OSError, subprocess.SubprocessError):
+            return None
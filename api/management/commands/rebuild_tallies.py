@@ -0,0 +1,36 @@
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from api.tallies import rebuild_tallies, verify_tallies
+
+
+class Command(BaseCommand):
+    help = 'Rebuild or verify the daily vote tallies from the raw votes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', action='append', type=date.fromisoformat, dest='dates',
+                            help='Date (YYYY-MM-DD) to process, can be repeated. Defaults to today.')
+        parser.add_argument('--all', action='store_true', help='Process every date.')
+        parser.add_argument('--verify', action='store_true', help='Only compare tallies with votes, do not write.')
+
+    def handle(self, *args, **options):
+        if options['all']:
+            dates = None
+        else:
+            dates = options['dates'] or [timezone.now().date()]
+
+        if options['verify']:
+            mismatches = verify_tallies(dates)
+            for mismatch in mismatches:
+                self.stdout.write(self.style.WARNING(
+                    f"Menu {mismatch['menu_id']}: expected {mismatch['expected']}, stored {mismatch['stored']}"
+                ))
+            if mismatches:
+                raise CommandError(f'{len(mismatches)} tallies do not match the votes.')
+            self.stdout.write(self.style.SUCCESS('All tallies match the votes.'))
+            return
+
+        count = rebuild_tallies(dates)
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt {count} tallies.'))
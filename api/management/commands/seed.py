@@ -1,18 +1,45 @@
+import random
+import time
+from datetime import timedelta
+from itertools import accumulate, groupby, islice
+
+from django.contrib.auth.hashers import make_password
 from django.core.management.base import BaseCommand
 from django.contrib.auth.models import User, Group
 
 from api.constants import GROUP_NAMES
-from api.models import Restaurant, Menu, Employee  # Adjust according to your actual models
+from api.models import Restaurant, Menu, Employee, Vote, Ballot
+from api.rollups import close_days, last_closed_day
+from api.tallies import rebuild_tallies
+from api.vote_storage import ballots_enabled
 from faker import Faker
 from django.utils import timezone
 from django.core.exceptions import ObjectDoesNotExist
 
 fake = Faker()
 
+
+def chunked(iterable, size):
+    iterator = iter(iterable)
+    while chunk := list(islice(iterator, size)):
+        yield chunk
+
+
 class Command(BaseCommand):
-    help = 'Seed the database with initial data'
+    help = 'Seed the database with initial data, or with production-sized data for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--employees', type=int, default=3, help='Number of employees to create.')
+        parser.add_argument('--restaurants', type=int, default=3, help='Number of restaurants (and owners) to create.')
+        parser.add_argument('--days', type=int, default=1, help='Number of days, up to today, with a menu per restaurant.')
+        parser.add_argument('--vote-rate', type=float, default=0.0,
+                            help='Share of employees voting each day, between 0 and 1.')
+        parser.add_argument('--v2-share', type=float, default=0.5,
+                            help='Share of the ballots cast with the v2 top three menus, the rest are v1.')
+        parser.add_argument('--chunk-size', type=int, default=5000, help='Rows per bulk insert.')
+        parser.add_argument('--random-seed', type=int, help='Seed for reproducible data.')
 
-    def handle(self, *args, **kwargs):
+    def handle(self, *args, **options):
 
         try:
             admin_group = Group.objects.get(name=GROUP_NAMES['ADMIN'])
@@ -26,8 +53,18 @@ class Command(BaseCommand):
             self.stdout.write(self.style.WARNING('The database has already been seeded.'))
             return
 
+        self.chunk_size = options['chunk_size']
+        self.random = random.Random(options['random_seed'])
+        if options['random_seed'] is not None:
+            Faker.seed(options['random_seed'])
+        self.created: dict[str, int] = {}
+        self.elapsed: dict[str, float] = {}
+        started = time.perf_counter()
+
         superuser_password = 'adminpassword'
         fake_password = '123qwe!@#QWE'
+        # Hash the shared password once, PBKDF2 per user would dominate the run
+        fake_password_hash = make_password(fake_password)
 
         # Create admin user
         user = User.objects.create_superuser(
@@ -40,57 +77,135 @@ class Command(BaseCommand):
         )
         user.groups.add(admin_group)
 
-        # Create 3 normal users for employee group
-        employee_usernames = ['employee1', 'employee2', 'employee3']
-        for username in employee_usernames:
-            user = User.objects.create_user(
-                username=username,
-                email=fake.email(),
-                password=fake_password,
-                first_name=fake.first_name(),
-                last_name=fake.last_name(),
-                is_active=True
-            )
-            user.groups.add(employee_group)
-
-
-        # Create 3 users for restaurant owner group
-        restaurant_owner_usernames = ['rest_owner1', 'rest_owner2', 'rest_owner3']
-        for username in restaurant_owner_usernames:
-            user = User.objects.create_user(
-                username=username,
-                email=fake.email(),
-                password=fake_password,
-                first_name=fake.first_name(),
-                last_name=fake.last_name(),
-                is_active=True
-            )
-            user.groups.add(restaurant_owner_group)
-
-        # Create 3 restaurants
-        for owner_username in restaurant_owner_usernames:
-            restaurant = Restaurant(
-                name=fake.company() + ' Restaurant',
-                owner=User.objects.get(username=owner_username)
-            )
-            restaurant.save()
-
-        # Create 3 employees
-        employee_items = ['employee1', 'employee2','employee3']
-        for employee_username in employee_items:
-            employee = Employee(
-                user=User.objects.get(username=employee_username),
-                phone=fake.phone_number(),
-                position=fake.job()
-            )
-            employee.save()
-
-        # Create 3 menus for each restaurant
-        for owner_username in restaurant_owner_usernames:
-            menu = Menu(
-                restaurant=Restaurant.objects.get(owner=User.objects.get(username=owner_username)),
-                date=timezone.now().date(),
-                items= ', '.join([fake.word().capitalize() for _ in range(3)])
-            )
-            menu.save()
-        self.stdout.write(self.style.SUCCESS('Database seeding completed successfully: 1 superuser, 3 restaurant owners, 3 employees, 3 restaurants, and 3 menus have been created.'))
\ No newline at end of file
+        # Create users for employee group, and their employees
+        employee_ids: list[int] = []
+        employee_users = self.create_users('employee', options['employees'], fake_password_hash, employee_group)
+        for users in employee_users:
+            employees = self.bulk_create(Employee, [
+                Employee(user=user, phone=fake.phone_number(), position=fake.job()) for user in users
+            ])
+            employee_ids.extend(employee.id for employee in employees)
+
+        # Create users for restaurant owner group, and their restaurants
+        restaurant_ids: list[int] = []
+        owner_users = self.create_users('rest_owner', options['restaurants'], fake_password_hash, restaurant_owner_group)
+        for users in owner_users:
+            restaurants = self.bulk_create(Restaurant, [
+                Restaurant(name=fake.company() + ' Restaurant', owner=user) for user in users
+            ])
+            restaurant_ids.extend(restaurant.id for restaurant in restaurants)
+
+        # Create a menu for each restaurant and day, up to today
+        today = timezone.now().date()
+        dates = [today - timedelta(days=offset) for offset in reversed(range(options['days']))]
+        menu_ids: dict = {day: [] for day in dates}
+        for menus in chunked(self.generate_menus(dates, restaurant_ids), self.chunk_size):
+            for menu in self.bulk_create(Menu, menus):
+                menu_ids[menu.date].append(menu.id)
+
+        # Cast the votes of each day and build their tallies
+        if options['vote_rate'] > 0:
+            votes = self.generate_votes(menu_ids, employee_ids, options['vote_rate'], options['v2_share'])
+            model, rows = (Ballot, self.generate_ballots(votes)) if ballots_enabled() else (Vote, votes)
+            for chunk in chunked(rows, self.chunk_size):
+                self.bulk_create(model, chunk)
+            started_tallies = time.perf_counter()
+            self.created['DailyTally'] = rebuild_tallies(dates)
+            self.elapsed['DailyTally'] = time.perf_counter() - started_tallies
+            started_rollups = time.perf_counter()
+            self.created['DailyRollup'] = close_days([day for day in dates if day <= last_closed_day()])
+            self.elapsed['DailyRollup'] = time.perf_counter() - started_rollups
+
+        self.report(time.perf_counter() - started)
+
+    def create_users(self, prefix, count, password_hash, group):
+        """Create users named <prefix>1..<prefix><count> in the group, yielding them chunk by chunk."""
+        memberships = User.groups.through
+        for numbers in chunked(range(1, count + 1), self.chunk_size):
+            users = self.bulk_create(User, [
+                User(
+                    username=f'{prefix}{number}',
+                    email=fake.email(),
+                    password=password_hash,
+                    first_name=fake.first_name(),
+                    last_name=fake.last_name(),
+                    is_active=True
+                )
+                for number in numbers
+            ])
+            self.bulk_create(memberships, [memberships(user_id=user.id, group_id=group.id) for user in users])
+            yield users
+
+    def generate_menus(self, dates, restaurant_ids):
+        for day in dates:
+            for restaurant_id in restaurant_ids:
+                yield Menu(
+                    restaurant_id=restaurant_id,
+                    date=day,
+                    items=', '.join([fake.word().capitalize() for _ in range(3)])
+                )
+
+    def generate_votes(self, menu_ids, employee_ids, vote_rate, v2_share):
+        """
+        Yield a realistic day of votes per date: a few restaurants are favourites (Zipf-like popularity that
+        drifts from day to day), v1 ballots give one point to one menu, v2 ballots give 3, 2 and 1 points.
+        """
+        # Menus of every day are in restaurant order, each restaurant keeps its popularity rank
+        restaurant_count = len(next(iter(menu_ids.values()), []))
+        ranks = self.random.sample(range(1, restaurant_count + 1), restaurant_count)
+        for day, day_menu_ids in menu_ids.items():
+            weights = [1 / (rank ** 1.1) * self.random.uniform(0.8, 1.2) for rank in ranks]
+            cum_weights = list(accumulate(weights))
+            for employee_id in employee_ids:
+                if self.random.random() >= vote_rate:
+                    continue
+                if len(day_menu_ids) >= 3 and self.random.random() < v2_share:
+                    ballot = zip(self.weighted_sample(day_menu_ids, cum_weights, 3), [3, 2, 1])
+                else:
+                    ballot = zip(self.weighted_sample(day_menu_ids, cum_weights, 1), [1])
+                for menu_id, points in ballot:
+                    yield Vote(employee_id=employee_id, menu_id=menu_id, points=points, date=day)
+
+    def generate_ballots(self, votes):
+        """Group the generated votes into one Ballot per employee and day, for VOTE_STORAGE='ballots'."""
+        for (employee_id, day), ballot in groupby(votes, key=lambda vote: (vote.employee_id, vote.date)):
+            yield Ballot.from_choices(employee_id, day, [(vote.menu_id, vote.points) for vote in ballot])
+
+    def weighted_sample(self, menu_ids, cum_weights, count):
+        """Pick `count` distinct menu ids, favouring the popular ones."""
+        picked: list[int] = []
+        while len(picked) < count:
+            menu_id = self.random.choices(menu_ids, cum_weights=cum_weights)[0]
+            if menu_id not in picked:
+                picked.append(menu_id)
+        return picked
+
+    def bulk_create(self, model, objects):
+        started = time.perf_counter()
+        objects = model.objects.bulk_create(objects, batch_size=self.chunk_size)
+        name = model.__name__
+        self.created[name] = self.created.get(name, 0) + len(objects)
+        self.elapsed[name] = self.elapsed.get(name, 0) + time.perf_counter() - started
+        return objects
+
+    def report(self, elapsed):
+        for name, count in self.created.items():
+            rate = count / self.elapsed[name] if self.elapsed[name] else 0
+            self.stdout.write(f'{name}: {count} rows in {self.elapsed[name]:.2f}s ({rate:,.0f} rows/s)')
+        total = sum(self.created.values())
+        self.stdout.write(f'Total: {total} rows in {elapsed:.2f}s ({total / elapsed:,.0f} rows/s)')
+
+        created = [
+            '1 superuser',
+            f"{self.created.get('Restaurant', 0)} restaurant owners",
+            f"{self.created.get('Employee', 0)} employees",
+            f"{self.created.get('Restaurant', 0)} restaurants",
+            f"{self.created.get('Menu', 0)} menus",
+        ]
+        if self.created.get('Vote'):
+            created.append(f"{self.created['Vote']} votes")
+        if self.created.get('Ballot'):
+            created.append(f"{self.created['Ballot']} ballots")
+        self.stdout.write(self.style.SUCCESS(
+            f"Database seeding completed successfully: {', '.join(created[:-1])}, and {created[-1]} have been created."
+        ))
@@ -0,0 +1,118 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from typing import Optional
+
+from django.conf import settings
+from django.http import HttpResponse, HttpResponseForbidden
+from rest_framework import serializers
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 8, 13, 21, 34, 55, 89)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+# Time spent in serializers during the current request, None outside of instrumented requests
+serializer_seconds: ContextVar[Optional[list[float]]] = ContextVar('serializer_seconds', default=None)
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, buckets: tuple):
+        self.name = name
+        self.documentation = documentation
+        self.buckets = buckets
+        self.series: dict[str, list] = {}  # label -> [bucket counts, sum, count]
+
+    def observe(self, label: str, value: float):
+        series = self.series.setdefault(label, [[0] * (len(self.buckets) + 1), 0.0, 0])
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} histogram']
+        for label, (counts, total, count) in sorted(self.series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip([*self.buckets, '+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f'{self.name}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{view="{label}"}} {total}')
+            lines.append(f'{self.name}_count{{view="{label}"}} {count}')
+        return lines
+
+
+class MetricsRegistry:
+    """In-process request metrics per view; each worker process exposes its own."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.histograms = {
+            'duration': Histogram('api_request_duration_seconds', 'Wall time of the request.', DURATION_BUCKETS),
+            'db_queries': Histogram('api_request_db_queries', 'Database queries run by the request.', QUERY_BUCKETS),
+            'db_time': Histogram('api_request_db_seconds', 'Time spent in database queries.', DURATION_BUCKETS),
+            'serializer_time': Histogram('api_request_serializer_seconds', 'Time spent serializing the response data.',
+                                         DURATION_BUCKETS),
+            'response_size': Histogram('api_response_size_bytes', 'Size of the response body.', SIZE_BUCKETS),
+        }
+        self.responses: dict[tuple[str, int], int] = {}
+
+    def observe(self, view: str, status: int, **values: float):
+        with self.lock:
+            for name, value in values.items():
+                self.histograms[name].observe(view, value)
+            self.responses[(view, status)] = self.responses.get((view, status), 0) + 1
+
+    def render(self) -> str:
+        with self.lock:
+            lines = ['# HELP api_responses_total Responses by view and status code.',
+                     '# TYPE api_responses_total counter']
+            for (view, status), count in sorted(self.responses.items()):
+                lines.append(f'api_responses_total{{view="{view}",status="{status}"}} {count}')
+            for histogram in self.histograms.values():
+                lines.extend(histogram.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = MetricsRegistry()
+
+
+def metrics_settings() -> dict:
+    return {
+        'ENABLED': True,
+        'SLOW_REQUEST_MS': 500,
+        'SLOW_REQUEST_MAX_QUERIES': 50,
+        'TOKEN': None,
+        **getattr(settings, 'PERFORMANCE_METRICS', {}),
+    }
+
+
+def instrument_serializers():
+    """Time the top-level .data of every serializer, nested serializers are rendered inside it."""
+    data_property = serializers.BaseSerializer.data
+
+    def timed_data(serializer):
+        timings = serializer_seconds.get()
+        if timings is None or hasattr(serializer, '_data'):
+            return data_property.fget(serializer)
+        started = time.perf_counter()
+        try:
+            return data_property.fget(serializer)
+        finally:
+            timings.append(time.perf_counter() - started)
+
+    serializers.BaseSerializer.data = property(timed_data)  # type: ignore[method-assign, assignment]
+
+
+def metrics_view(request):
+    """
+    Expose the request metrics of this process in the Prometheus text format, to scrapers sending the METRICS_TOKEN
+    and to staff users logged in to the admin. Closed to everyone else, and to scrapers when no token is set.
+    """
+    token = metrics_settings()['TOKEN']
+    scraper = bool(token) and request.headers.get('Authorization') == f'Bearer {token}'
+    if not scraper and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
@@ -0,0 +1,242 @@
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+from rest_framework.permissions import SAFE_METHODS
+from rest_framework_simplejwt.exceptions import InvalidToken
+from rest_framework_simplejwt.settings import api_settings
+
+from .authentication import ClaimsJWTAuthentication
+from .compression import compress_response, should_compress
+from .db_routers import (
+    ais_pinned_to_primary, apin_to_primary, is_pinned_to_primary, pin_to_primary, reads_from_primary, replica_aliases,
+)
+from .metrics import metrics_settings, registry, serializer_seconds
+
+logger = logging.getLogger('api.performance')
+
+
+def view_name(request) -> str:
+    """Name of the resolved view action, e.g. VoteViewSet.cast_vote."""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    view = match.func
+    view_class = getattr(view, 'cls', None) or getattr(view, 'view_class', None)
+    if view_class is None:
+        return getattr(view, '__name__', match.view_name)
+    actions = getattr(view, 'actions', None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    return f'{view_class.__name__}.{action}'
+
+
+class QueryRecorder:
+    """Times every query of the request."""
+
+    def __init__(self, max_queries: int):
+        self.max_queries = max_queries
+        self.count = 0
+        self.seconds = 0.0
+        self.statements: list[tuple[float, str]] = []
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - started
+            self.count += 1
+            self.seconds += duration
+            if len(self.statements) < self.max_queries:
+                # Without the parameters: they hold user data, password hashes among them
+                self.statements.append((duration, sql))
+
+
+# Recorder of the current request; context variables follow the request into sync_to_async threads
+current_recorder: ContextVar[Optional[QueryRecorder]] = ContextVar('current_recorder', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    recorder = current_recorder.get()
+    if recorder is None:
+        return execute(sql, params, many, context)
+    return recorder(execute, sql, params, many, context)
+
+
+def install_query_recorder(connection, **kwargs):
+    """Database execute wrapper for the connections of every thread, connected to connection_created."""
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+class PerformanceMiddleware:
+    """
+    Records the wall time, database queries and time, serializer time and response size of each request per
+    view action into the in-process histograms served at /metrics, and logs slow requests with their SQL.
+    Runs natively under both WSGI and ASGI.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        config = metrics_settings()
+        if not config['ENABLED']:
+            return self.get_response(request)
+
+        # Connections opened before the app was ready
+        for alias in connections:
+            install_query_recorder(connections[alias])
+        with self.measure(request, config) as measurement:
+            measurement['response'] = self.get_response(request)
+        return measurement['response']
+
+    async def __acall__(self, request):
+        config = metrics_settings()
+        if not config['ENABLED']:
+            return await self.get_response(request)
+
+        with self.measure(request, config) as measurement:
+            measurement['response'] = await self.get_response(request)
+        return measurement['response']
+
+    @contextmanager
+    def measure(self, request, config):
+        recorder = QueryRecorder(config['SLOW_REQUEST_MAX_QUERIES'])
+        timings: list[float] = []
+        recorder_token = current_recorder.set(recorder)
+        timings_token = serializer_seconds.set(timings)
+        measurement: dict = {}
+        started = time.perf_counter()
+        try:
+            yield measurement
+        finally:
+            serializer_seconds.reset(timings_token)
+            current_recorder.reset(recorder_token)
+        duration = time.perf_counter() - started
+
+        response = measurement['response']
+        view = view_name(request)
+        size = 0 if response.streaming else len(response.content)
+        registry.observe(
+            view,
+            response.status_code,
+            duration=duration,
+            db_queries=recorder.count,
+            db_time=recorder.seconds,
+            serializer_time=sum(timings),
+            response_size=size,
+        )
+
+        if duration * 1000 >= config['SLOW_REQUEST_MS']:
+            statements = '\n'.join(f'  {seconds * 1000:.2f} ms  {sql}' for seconds, sql in recorder.statements)
+            logger.warning(
+                'Slow request %s %s (%s): %.1f ms, %d queries in %.1f ms, serializers %.1f ms, %d bytes\n%s',
+                request.method, request.path, view, duration * 1000, recorder.count, recorder.seconds * 1000,
+                sum(timings) * 1000, size, statements,
+            )
+
+
+def routing_client(request) -> Optional[str]:
+    """Who is asking, before authentication runs: the user of a valid bearer token, or the session."""
+    authentication = ClaimsJWTAuthentication()
+    header = authentication.get_header(request)
+    raw_token = authentication.get_raw_token(header) if header is not None else None
+    if raw_token is not None:
+        try:
+            token = authentication.get_validated_token(raw_token)
+        except InvalidToken:
+            return None
+        return f'user:{token.get(api_settings.USER_ID_CLAIM)}'
+    session_key = request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    return f'session:{session_key}' if session_key else None
+
+
+class ReplicaRoutingMiddleware:
+    """
+    Lets safe requests read from the DATABASE_REPLICAS. After a successful write the client's reads stay on the
+    primary for REPLICA_PIN_SECONDS, so it sees its own writes while the replicas catch up.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        if not replica_aliases():
+            return self.get_response(request)
+
+        client = routing_client(request)
+        safe = request.method in SAFE_METHODS
+        token = reads_from_primary.set(not safe or client is not None and is_pinned_to_primary(client))
+        try:
+            response = self.get_response(request)
+        finally:
+            reads_from_primary.reset(token)
+        if not safe and client is not None and response.status_code < 400:
+            pin_to_primary(client)
+        return response
+
+    async def __acall__(self, request):
+        if not replica_aliases():
+            return await self.get_response(request)
+
+        client = routing_client(request)
+        safe = request.method in SAFE_METHODS
+        pinned = not safe or client is not None and await ais_pinned_to_primary(client)
+        token = reads_from_primary.set(pinned)
+        try:
+            response = await self.get_response(request)
+        finally:
+            reads_from_primary.reset(token)
+        if not safe and client is not None and response.status_code < 400:
+            await apin_to_primary(client)
+        return response
+
+
+class CompressionMiddleware:
+    """
+    Compresses response bodies of at least COMPRESSION['MIN_SIZE'] bytes with brotli (when installed) or gzip, as
+    negotiated on Accept-Encoding. Streaming responses pass through untouched.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = iscoroutinefunction(get_response)
+        if self.is_async:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        response = self.get_response(request)
+        if not should_compress(response):
+            return response
+        return compress_response(request, response)
+
+    async def __acall__(self, request):
+        response = await self.get_response(request)
+        if not should_compress(response):
+            return response
+        # Compressing a large body would stall the event loop
+        return await sync_to_async(compress_response)(request, response)
@@ -0,0 +1,61 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:49
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, Q, Sum
+
+
+def build_tallies(apps, schema_editor):
+    Vote = apps.get_model('api', 'Vote')
+    DailyTally = apps.get_model('api', 'DailyTally')
+    rows = Vote.objects.values('menu_id', 'menu__date').annotate(
+        total_points=Sum('points'),
+        total_votes=Count('id'),
+        one=Count('id', filter=Q(points=1)),
+        two=Count('id', filter=Q(points=2)),
+        three=Count('id', filter=Q(points=3)),
+    )
+    DailyTally.objects.bulk_create(
+        [
+            DailyTally(
+                menu_id=row['menu_id'],
+                date=row['menu__date'],
+                points=row['total_points'],
+                vote_count=row['total_votes'],
+                one_point_votes=row['one'],
+                two_point_votes=row['two'],
+                three_point_votes=row['three'],
+            )
+            for row in rows.iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyTally',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('points', models.IntegerField(default=0)),
+                ('vote_count', models.IntegerField(default=0)),
+                ('one_point_votes', models.IntegerField(default=0)),
+                ('two_point_votes', models.IntegerField(default=0)),
+                ('three_point_votes', models.IntegerField(default=0)),
+                ('menu', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='tally', to='api.menu')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date', '-points'], name='api_tally_date_points_idx')],
+            },
+        ),
+        migrations.RunPython(build_tallies, migrations.RunPython.noop),
+    ]
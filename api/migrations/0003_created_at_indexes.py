@@ -0,0 +1,31 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:52
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_daily_tally'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='employee',
+            index=models.Index(fields=['created_at', 'id'], name='api_employee_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='menu',
+            index=models.Index(fields=['created_at', 'id'], name='api_menu_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='restaurant',
+            index=models.Index(fields=['created_at', 'id'], name='api_restaurant_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['created_at', 'id'], name='api_vote_created_idx'),
+        ),
+    ]
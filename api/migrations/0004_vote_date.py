@@ -0,0 +1,41 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_vote_dates(apps, schema_editor):
+    Vote = apps.get_model('api', 'Vote')
+    Menu = apps.get_model('api', 'Menu')
+    Vote.objects.filter(date__isnull=True).update(
+        date=Subquery(Menu.objects.filter(pk=OuterRef('menu_id')).values('date')[:1])
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_created_at_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='vote',
+            name='date',
+            field=models.DateField(editable=False, null=True),
+        ),
+        migrations.RunPython(backfill_vote_dates, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='vote',
+            name='date',
+            field=models.DateField(editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['date', 'menu'], include=['employee', 'points'], name='api_vote_date_menu_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['employee', 'date'], include=['menu', 'points'], name='api_vote_employee_date_idx'),
+        ),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 5.1.1 on 2026-10-18 10:51
+
+from itertools import groupby
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_votes_to_ballots(apps, schema_editor):
+    # The Vote rows are kept, they stay the cast votes until VOTE_STORAGE is switched to 'ballots'
+    Vote = apps.get_model('api', 'Vote')
+    Ballot = apps.get_model('api', 'Ballot')
+    rows = (
+        Vote.objects.order_by('employee_id', 'date', 'id')
+        .values_list('employee_id', 'date', 'menu_id', 'points')
+        .iterator(chunk_size=1000)
+    )
+    ballots = []
+    for (employee_id, day), group in groupby(rows, key=lambda row: row[:2]):
+        ballot = Ballot(employee_id=employee_id, date=day)
+        # Menus in the order they were cast, an employee's fourth and later v1 votes of a day have no slot
+        for slot, (_, _, menu_id, points) in enumerate(list(group)[:3], start=1):
+            setattr(ballot, f'menu_{slot}_id', menu_id)
+            setattr(ballot, f'points_{slot}', points)
+        ballots.append(ballot)
+        if len(ballots) >= 1000:
+            Ballot.objects.bulk_create(ballots)
+            ballots = []
+    Ballot.objects.bulk_create(ballots)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0004_vote_date'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Ballot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('points_1', models.PositiveSmallIntegerField(null=True)),
+                ('points_2', models.PositiveSmallIntegerField(null=True)),
+                ('points_3', models.PositiveSmallIntegerField(null=True)),
+                ('employee', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to='api.employee')),
+                ('menu_1', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.menu')),
+                ('menu_2', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.menu')),
+                ('menu_3', models.ForeignKey(db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.menu')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['date'], include=('employee', 'menu_1', 'points_1', 'menu_2', 'points_2', 'menu_3', 'points_3'), name='api_ballot_date_idx')],
+                'constraints': [models.UniqueConstraint(fields=('employee', 'date'), name='api_ballot_employee_date_uniq')],
+            },
+        ),
+        migrations.RunPython(copy_votes_to_ballots, migrations.RunPython.noop),
+    ]
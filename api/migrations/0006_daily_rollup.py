@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:09
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0005_ballot'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField()),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('points', models.IntegerField(default=0)),
+                ('vote_count', models.IntegerField(default=0)),
+                ('one_point_votes', models.IntegerField(default=0)),
+                ('two_point_votes', models.IntegerField(default=0)),
+                ('three_point_votes', models.IntegerField(default=0)),
+                ('menu', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.menu')),
+                ('restaurant', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.restaurant')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('date', 'restaurant'), name='api_rollup_date_restaurant_uniq')],
+            },
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:13
+
+import api.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0006_daily_rollup'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyResultSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('date', models.DateField(unique=True)),
+                ('vote_count', models.IntegerField(default=0)),
+                ('ranking', models.JSONField(decoder=api.models.IntKeysJSONDecoder, default=list)),
+                ('tie_break', models.JSONField(default=dict)),
+                ('payload', models.JSONField(decoder=api.models.IntKeysJSONDecoder, default=dict)),
+                ('etag', models.CharField(max_length=80)),
+                ('winner', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.menu')),
+                ('winner_restaurant', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='api.restaurant')),
+            ],
+            options={
+                'abstract': False,
+            },
+        ),
+    ]
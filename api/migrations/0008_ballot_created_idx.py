@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 11:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0007_daily_result_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ballot',
+            index=models.Index(fields=['created_at', 'id'], name='api_ballot_created_idx'),
+        ),
+    ]
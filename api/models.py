@@ -1,3 +1,5 @@
+import json
+
 from django.db import models
 from datetime import date
 from django.contrib.auth.models import User
@@ -15,6 +17,11 @@ class Restaurant(TimestampedModel):
     name = models.CharField(max_length = 100)
     owner = models.OneToOneField(User, on_delete=models.CASCADE)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='api_restaurant_created_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -26,6 +33,9 @@ class Menu(TimestampedModel):
 
     class Meta:
         unique_together = ('restaurant', 'date')
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='api_menu_created_idx'),
+        ]
         permissions = [
             ('get_current_day_menu', 'Can get menus of current day'),
             ('upload_menu', 'Can upload menu'),
@@ -40,6 +50,11 @@ class Employee(TimestampedModel):
     phone = models.CharField(max_length=100)
     position = models.CharField(max_length=100)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='api_employee_created_idx'),
+        ]
+
     def __str__(self):
         return self.user.username
 
@@ -48,14 +63,181 @@ class Vote(TimestampedModel):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE)
     menu = models.ForeignKey(Menu, on_delete=models.CASCADE)
     points = models.IntegerField() # 1-3
+    date = models.DateField(editable=False)  # Copy of menu.date, so per-day lookups need no join
 
     class Meta:
         unique_together = ('employee', 'menu')
+        indexes = [
+            models.Index(fields=['created_at', 'id'], name='api_vote_created_idx'),
+            # Covering indexes: the per-day results and my-vote lookups are answered from the index alone
+            models.Index(fields=['date', 'menu'], include=['employee', 'points'], name='api_vote_date_menu_idx'),
+            models.Index(fields=['employee', 'date'], include=['menu', 'points'], name='api_vote_employee_date_idx'),
+        ]
         permissions = [
             ('cast_vote', 'Can cast vote to menu for the current day'),
             ('get_my_vote', 'Can get the menu voted for the current day by the employee'),
             ('get_all_votes_results', 'Can get all menus voted by employees for the current day')
         ]
+    def save(self, *args, **kwargs):
+        if self.date is None:
+            self.date = self.menu.date
+        super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.employee.user.username} voted for {self.menu.restaurant.name}'
 
+
+class Ballot(TimestampedModel):
+    """
+    An employee's vote of a day in one row, the compact alternative to a Vote row per menu (VOTE_STORAGE='ballots').
+    The menus fill the slots in the order they were cast: v1 ballots use the first slot only, v2 ballots all three.
+    """
+    # No single-column foreign key indexes: (employee, date) is covered by the unique constraint, and the menu
+    # lookups only run when a menu is deleted, which is rare next to the inserts every index would slow down.
+    # (created_at, id) is indexed for the admin votes/ list, paginated on it like the Vote rows.
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, db_index=False)
+    date = models.DateField()
+    menu_1 = models.ForeignKey(Menu, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    points_1 = models.PositiveSmallIntegerField(null=True)
+    menu_2 = models.ForeignKey(Menu, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    points_2 = models.PositiveSmallIntegerField(null=True)
+    menu_3 = models.ForeignKey(Menu, on_delete=models.SET_NULL, null=True, related_name='+', db_index=False)
+    points_3 = models.PositiveSmallIntegerField(null=True)
+
+    SLOT_FIELDS = [('menu_1_id', 'points_1'), ('menu_2_id', 'points_2'), ('menu_3_id', 'points_3')]
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['employee', 'date'], name='api_ballot_employee_date_uniq'),
+        ]
+        indexes = [
+            # Covering index: the per-day results are answered from the index alone
+            models.Index(fields=['date'], include=['employee', 'menu_1', 'points_1', 'menu_2', 'points_2', 'menu_3',
+                                                   'points_3'], name='api_ballot_date_idx'),
+            models.Index(fields=['created_at', 'id'], name='api_ballot_created_idx'),
+        ]
+
+    @classmethod
+    def from_choices(cls, employee_id: int, day, choices) -> 'Ballot':
+        """A ballot from up to three (menu_id, points) pairs, in the order they were cast."""
+        ballot = cls(employee_id=employee_id, date=day)
+        for (menu_field, points_field), (menu_id, points) in zip(cls.SLOT_FIELDS, choices):
+            setattr(ballot, menu_field, menu_id)
+            setattr(ballot, points_field, points)
+        return ballot
+
+    def choices(self) -> list[tuple[int, int]]:
+        """The (menu_id, points) pairs of the filled slots."""
+        return [
+            (getattr(self, menu_field), getattr(self, points_field))
+            for menu_field, points_field in self.SLOT_FIELDS
+            if getattr(self, menu_field) is not None
+        ]
+
+    def votes(self) -> list[Vote]:
+        """The ballot as the unsaved Vote rows it stands for, e.g. to update the tallies."""
+        return [
+            Vote(employee_id=self.employee_id, menu_id=menu_id, points=points, date=self.date)
+            for menu_id, points in self.choices()
+        ]
+
+    def __str__(self):
+        return f'{self.employee_id} - {self.date}: {self.choices()}'
+
+
+class DailyTally(TimestampedModel):
+    """Running vote totals of a menu, kept in step with the stored votes on every cast."""
+    date = models.DateField()
+    menu = models.OneToOneField(Menu, on_delete=models.CASCADE, related_name='tally')
+    points = models.IntegerField(default=0)
+    vote_count = models.IntegerField(default=0)
+    # Histogram of the points given to the menu
+    one_point_votes = models.IntegerField(default=0)
+    two_point_votes = models.IntegerField(default=0)
+    three_point_votes = models.IntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['date', '-points'], name='api_tally_date_points_idx'),
+        ]
+
+    @property
+    def histogram(self) -> dict[int, int]:
+        return {1: self.one_point_votes, 2: self.two_point_votes, 3: self.three_point_votes}
+
+    def __str__(self):
+        return f'{self.menu_id} - {self.date}: {self.points} points'
+
+
+class DailyRollup(TimestampedModel):
+    """Final results of a restaurant on a closed day, its menu's tally ranked among the day's menus."""
+    date = models.DateField()
+    restaurant = models.ForeignKey(Restaurant, on_delete=models.CASCADE, related_name='+')
+    menu = models.ForeignKey(Menu, on_delete=models.SET_NULL, null=True, related_name='+')
+    # 1 for the day's winner, in the order of the all-votes-results
+    rank = models.PositiveSmallIntegerField()
+    points = models.IntegerField(default=0)
+    vote_count = models.IntegerField(default=0)
+    one_point_votes = models.IntegerField(default=0)
+    two_point_votes = models.IntegerField(default=0)
+    three_point_votes = models.IntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            # Also the index of the date and range reads
+            models.UniqueConstraint(fields=['date', 'restaurant'], name='api_rollup_date_restaurant_uniq'),
+        ]
+
+    @property
+    def histogram(self) -> dict[int, int]:
+        return {1: self.one_point_votes, 2: self.two_point_votes, 3: self.three_point_votes}
+
+    def __str__(self):
+        return f'{self.restaurant_id} - {self.date}: #{self.rank}, {self.points} points'
+
+
+class IntKeysJSONDecoder(json.JSONDecoder):
+    """Reads back the integer keys (menu ids, points) JSON turned into strings."""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, object_pairs_hook=self.int_keys, **kwargs)
+
+    @staticmethod
+    def int_keys(pairs):
+        return {int(key) if key.isdigit() else key: value for key, value in pairs}
+
+
+class PermissionVersion(TimestampedModel):
+    """
+    Version of the grants of a user, or of everyone's, checked against the access tokens' claims. Kept in the database
+    so a cache eviction cannot change it and revoke the tokens.
+    """
+    # api.permission_cache's scopes: 'permissions' or 'permissions:user:<id>'
+    scope = models.CharField(max_length=64, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.scope}: {self.version}'
+
+
+class DailyResultSnapshot(TimestampedModel):
+    """The results of a day as they stood when its voting closed, written once and never changed."""
+    date = models.DateField(unique=True)
+    winner = models.ForeignKey(Menu, on_delete=models.SET_NULL, null=True, related_name='+')
+    winner_restaurant = models.ForeignKey(Restaurant, on_delete=models.SET_NULL, null=True, related_name='+')
+    vote_count = models.IntegerField(default=0)
+    # [{rank, menu_id, restaurant_id, points, vote_count, histogram}], best first
+    ranking = models.JSONField(default=list, decoder=IntKeysJSONDecoder)
+    # How the winner was picked among the menus with the most points
+    tie_break = models.JSONField(default=dict)
+    # The all-votes-results body
+    payload = models.JSONField(default=dict, decoder=IntKeysJSONDecoder)
+    etag = models.CharField(max_length=80)
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding:
+            raise ValueError('Result snapshots are immutable.')
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return f'{self.date}: {self.winner_id}'
@@ -0,0 +1,141 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+
+import django
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import Group, User
+from django.db import IntegrityError, transaction
+
+from .constants import GROUP_NAMES
+from .models import Employee
+from .serializers.employee_serializers import EmployeeSerializer
+from .serializers.user_serializers import UserImportSerializer
+
+USER_FIELDS = ['username', 'password', 'email', 'first_name', 'last_name']
+# The messages of UserSerializer's per-row checks
+TAKEN_MESSAGES = {
+    'username': 'This username is already taken.',
+    'email': 'This email address is already in use.',
+}
+
+
+def import_settings() -> dict:
+    return {
+        'HASH_WORKERS': 0,
+        'CHUNK_SIZE': 500,
+        **getattr(settings, 'EMPLOYEE_IMPORT', {}),
+    }
+
+
+def hash_passwords(passwords: list[str], workers: int = 0) -> list[str]:
+    """
+    make_password() for every password, spread over `workers` processes (0: one per CPU). PBKDF2 takes a few hundred
+    milliseconds per password and holds the GIL, so only processes make it parallel.
+    """
+    workers = workers or os.cpu_count() or 1
+    # Spawning a process and setting up Django in it costs about four hashes
+    if workers <= 1 or len(passwords) < 4 * workers:
+        return [make_password(password) for password in passwords]
+
+    # Spawned, not forked: the caller may be a threaded server process
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn'),
+                             initializer=django.setup) as executor:
+        return list(executor.map(make_password, passwords, chunksize=max(len(passwords) // (workers * 4), 1)))
+
+
+def flatten_row(row) -> dict:
+    """Rows are flat (a CSV line) or nested like the create endpoint's body: {"user": {...}, "phone", "position"}."""
+    if not isinstance(row, dict):
+        return {}
+    if isinstance(row.get('user'), dict):
+        return {**row['user'], **{key: value for key, value in row.items() if key != 'user'}}
+    return row
+
+
+def validate_rows(rows: list) -> tuple[list[Optional[dict]], list[dict]]:
+    """Validated (user, employee) data per row and the rows' errors, uniqueness checked with one query per field."""
+    validated: list[Optional[dict]] = []
+    errors: list[dict] = []
+    for row in rows:
+        row = flatten_row(row)
+        user_serializer = UserImportSerializer(data={key: row[key] for key in USER_FIELDS if key in row})
+        employee_serializer = EmployeeSerializer(data={key: row.get(key) for key in ['phone', 'position']})
+        user_serializer.is_valid()
+        employee_serializer.is_valid()
+        row_errors = {**user_serializer.errors, **employee_serializer.errors}
+        errors.append(row_errors)
+        validated.append(None if row_errors else {
+            'user': user_serializer.validated_data,
+            'employee': employee_serializer.validated_data,
+        })
+
+    for field, taken_message in TAKEN_MESSAGES.items():
+        values = [data['user'].get(field) for data in validated if data is not None and data['user'].get(field)]
+        taken = set(User.objects.filter(**{f'{field}__in': values}).values_list(field, flat=True))
+        seen = set()
+        for index, data in enumerate(validated):
+            value = data['user'].get(field) if data is not None else None
+            if not value:
+                continue
+            if value in taken:
+                message = taken_message
+            elif value in seen:
+                message = f'This {field} appears more than once in the import.'
+            else:
+                seen.add(value)
+                continue
+            errors[index][field] = [message]
+            validated[index] = None
+    return validated, errors
+
+
+def build_user(data: dict, password_hash: str) -> User:
+    """The unsaved User UserManager.create_user() would create."""
+    user = User(**{**data, 'password': password_hash})
+    user.username = User.normalize_username(user.username)
+    user.email = User.objects.normalize_email(user.email)
+    return user
+
+
+def import_employees(rows: list, workers: Optional[int] = None, chunk_size: Optional[int] = None) -> list[dict]:
+    """
+    Create a User in the Employee group and its Employee for every valid row, chunk by chunk, each chunk in its own
+    transaction. Returns a result per row: {'row', 'status': 'created', 'id', 'username'} or
+    {'row', 'status': 'invalid' | 'failed', 'errors'}.
+    """
+    config = import_settings()
+    workers = config['HASH_WORKERS'] if workers is None else workers
+    chunk_size = chunk_size or config['CHUNK_SIZE']
+    group = Group.objects.get(name=GROUP_NAMES['EMPLOYEE'])
+
+    validated, errors = validate_rows(rows)
+    results: list[dict] = [
+        {'row': index, 'status': 'invalid', 'errors': row_errors} for index, row_errors in enumerate(errors)
+    ]
+    valid = [index for index, data in enumerate(validated) if data is not None]
+    hashes = iter(hash_passwords([validated[index]['user']['password'] for index in valid], workers))
+
+    for start in range(0, len(valid), chunk_size):
+        chunk = valid[start:start + chunk_size]
+        users = [build_user(validated[index]['user'], next(hashes)) for index in chunk]
+        try:
+            # No post_save/m2m_changed: new users have no cached permissions or tokens to invalidate
+            with transaction.atomic():
+                User.objects.bulk_create(users)
+                User.groups.through.objects.bulk_create(
+                    [User.groups.through(user_id=user.id, group_id=group.id) for user in users]
+                )
+                employees = Employee.objects.bulk_create(
+                    [Employee(user=user, **validated[index]['employee']) for index, user in zip(chunk, users)]
+                )
+        except IntegrityError as exc:
+            # A user of the chunk was created concurrently
+            for index in chunk:
+                results[index] = {'row': index, 'status': 'failed', 'errors': {'non_field_errors': [str(exc)]}}
+            continue
+        for index, user, employee in zip(chunk, users, employees):
+            results[index] = {'row': index, 'status': 'created', 'id': employee.id, 'username': user.username}
+    return results
@@ -0,0 +1,76 @@
+import codecs
+import csv
+import io
+import json
+
+import msgpack
+import orjson
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, JSONParser
+
+from .renderers import MessagePackRenderer, ORJSONRenderer
+
+
+class ORJSONParser(JSONParser):
+    """JSONParser on orjson for UTF-8 bodies, other charsets and non-strict parsing fall back to DRF's parser."""
+    renderer_class = ORJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
+
+
+class MessagePackParser(BaseParser):
+    """Parses application/msgpack bodies; maps must have string keys, like JSON objects."""
+    media_type = 'application/msgpack'
+    renderer_class = MessagePackRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, TypeError) as exc:
+            raise ParseError('MessagePack parse error - %s' % str(exc))
+
+
+class NDJSONParser(BaseParser):
+    """Parses application/x-ndjson bodies, one JSON object per line, into a list. Blank lines are skipped."""
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            lines = stream.read().decode(encoding).splitlines()
+        except UnicodeDecodeError as exc:
+            raise ParseError('NDJSON parse error - %s' % str(exc))
+
+        rows = []
+        for number, line in enumerate(lines, start=1):
+            if not line.strip():
+                continue
+            try:
+                rows.append(json.loads(line))
+            except ValueError as exc:
+                raise ParseError('NDJSON parse error - line %d: %s' % (number, str(exc)))
+        return rows
+
+
+class CSVParser(BaseParser):
+    """Parses text/csv bodies into a list of dicts keyed by the header row."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            return list(csv.DictReader(io.StringIO(stream.read().decode(encoding), newline='')))
+        except (UnicodeDecodeError, csv.Error) as exc:
+            raise ParseError('CSV parse error - %s' % str(exc))
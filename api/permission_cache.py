@@ -0,0 +1,80 @@
+from typing import Optional
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+
+from .cache import PAYLOAD_TIMEOUT
+from .db_routers import primary
+from .models import PermissionVersion
+
+# Bumped when group permissions change, every user's grants may have moved
+PERMISSIONS_SCOPE = 'permissions'
+# The cached versions are read from PermissionVersion again after this many seconds. This bounds how long a worker
+# keeps granting a revoked permission when the bump did not reach its cache, e.g. a process-local one.
+VERSION_TIMEOUT = 30
+# Caches that each worker process keeps to itself, a bump would only reach the worker that made it
+PROCESS_LOCAL_CACHES = ['django.core.cache.backends.locmem.LocMemCache']
+
+
+def user_permissions_scope(user_id) -> str:
+    return f'permissions:user:{user_id}'
+
+
+def version_key(scope: str) -> str:
+    return f'permission-version:{scope}'
+
+
+def permission_version(user_id) -> str:
+    """Version of a user's grants, it changes whenever their groups, permissions or roles change."""
+    scopes = [PERMISSIONS_SCOPE, user_permissions_scope(user_id)]
+    found = cache.get_many([version_key(scope) for scope in scopes])
+    if len(found) < len(scopes):
+        # An evicted version is reloaded from the database, a new one would revoke every token carrying it
+        with primary():
+            stored = dict(PermissionVersion.objects.filter(scope__in=scopes).values_list('scope', 'version'))
+        for scope in scopes:
+            if version_key(scope) not in found:
+                found[version_key(scope)] = stored.get(scope, 0)
+                # add(): a bump that committed meanwhile has set the newer version
+                cache.add(version_key(scope), found[version_key(scope)], VERSION_TIMEOUT)
+    return '.'.join(str(found[version_key(scope)]) for scope in scopes)
+
+
+def bump_permissions(user_id: Optional[int] = None) -> None:
+    """
+    Invalidate the grants of one user, or of everyone. The new version is stored in the current transaction and
+    cached once it commits.
+    """
+    scope = user_permissions_scope(user_id) if user_id is not None else PERMISSIONS_SCOPE
+    with transaction.atomic():
+        stored, created = PermissionVersion.objects.select_for_update().get_or_create(scope=scope,
+                                                                                      defaults={'version': 1})
+        if not created:
+            stored.version += 1
+            stored.save(update_fields=['version', 'updated_at'])
+    transaction.on_commit(lambda: cache.set(version_key(scope), stored.version, VERSION_TIMEOUT))
+
+
+def check_permission_cache() -> None:
+    """The cached permission versions must be shared by the workers when tokens are checked against them."""
+    backend = settings.CACHES['default']['BACKEND']
+    if getattr(settings, 'STATELESS_JWT_AUTH', False) and backend in PROCESS_LOCAL_CACHES:
+        raise ImproperlyConfigured(
+            f'STATELESS_JWT_AUTH needs a cache shared by the workers (e.g. CACHE_URL=redis://...), not {backend}.'
+        )
+
+
+def cached_permissions(user) -> frozenset:
+    """
+    The user's permissions from the shared cache, loaded with get_all_permissions() on a miss. Keyed by the
+    permission version, so grant changes are picked up without deleting anything.
+    """
+    key = f'permission-set:{user.id}:{permission_version(user.id)}'
+    permissions = cache.get(key)
+    if permissions is None:
+        with primary():
+            permissions = frozenset(user.get_all_permissions())
+        cache.set(key, permissions, PAYLOAD_TIMEOUT)
+    return permissions
@@ -1,11 +1,18 @@
 # mypy: disable-error-code="misc"
+from django.contrib.auth.models import User
 from rest_framework import permissions
 
+from .permission_cache import cached_permissions
+
 class HasPermission(permissions.BasePermission):
     permission_name: str = ''
 
     def has_permission(self, request, view):
-        return request.user.has_perm(self.permission_name)
+        user = request.user
+        if isinstance(user, User):
+            # Django only caches the permissions on the user instance, which is loaded again for every request
+            return user.is_active and (user.is_superuser or self.permission_name in cached_permissions(user))
+        return user.has_perm(self.permission_name)
 
 
 #Employee Permission
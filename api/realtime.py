@@ -0,0 +1,174 @@
+import asyncio
+import atexit
+import json
+import logging
+import os
+import socket
+import threading
+import uuid
+from collections import defaultdict
+from pathlib import Path
+from typing import Optional
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+
+logger = logging.getLogger('api.realtime')
+
+# Largest event a datagram carries, far above a ballot's delta
+MAX_DATAGRAM = 64 * 1024
+
+
+def realtime_settings() -> dict:
+    return {
+        'HEARTBEAT_SECONDS': 15,
+        'QUEUE_SIZE': 100,
+        'BROKER_SOCKET_DIR': None,
+        **getattr(settings, 'REALTIME', {}),
+    }
+
+
+class Subscription:
+    """Events for one stream, delivered on the event loop that subscribed."""
+
+    def __init__(self, loop: asyncio.AbstractEventLoop, size: int):
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+
+    def put(self, event: dict):
+        # Runs on self.loop
+        if self.queue.full():
+            # A slow client lost deltas, replace them with a request to start over from a snapshot
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            event = {'type': 'resync'}
+        self.queue.put_nowait(event)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class UnixSocketBroker:
+    """
+    Local stand-in for a pub/sub broker when several worker processes run on one host: every process with
+    subscribers binds a datagram socket in a shared directory, and publishing sends the event to each socket there,
+    its own included.
+    """
+
+    def __init__(self, directory: str, deliver):
+        self.directory = Path(directory)
+        self.deliver = deliver
+        self.lock = threading.Lock()
+        self.socket: Optional[socket.socket] = None
+        self.path: Optional[Path] = None
+
+    def start(self):
+        with self.lock:
+            if self.socket is not None:
+                return
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self.path = self.directory / f'{os.getpid()}-{uuid.uuid4().hex[:8]}.sock'
+            self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            self.socket.bind(str(self.path))
+            threading.Thread(target=self.listen, name='realtime-broker', daemon=True).start()
+            atexit.register(self.stop)
+
+    def stop(self):
+        with self.lock:
+            if self.socket is None:
+                return
+            self.socket.close()
+            self.socket = None
+            if self.path is not None:
+                self.path.unlink(missing_ok=True)
+
+    def listen(self):
+        sock = self.socket
+        while sock is not None:
+            try:
+                data = sock.recv(MAX_DATAGRAM)
+            except OSError:
+                return
+            self.deliver(json.loads(data))
+
+    def publish(self, event: dict):
+        data = json.dumps(event, cls=DjangoJSONEncoder).encode()
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sender:
+            # Never block the committing request on a slow worker
+            sender.setblocking(False)
+            for path in self.directory.glob('*.sock'):
+                try:
+                    sender.sendto(data, str(path))
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Left behind by a worker that is gone
+                    path.unlink(missing_ok=True)
+                except OSError as error:
+                    logger.warning('Dropped a realtime event for %s: %s', path.name, error)
+
+
+class Broadcaster:
+    """In-process fan-out of events to the subscribed streams, through the broker when one is configured."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.subscriptions: set[Subscription] = set()
+        self._broker: Optional[UnixSocketBroker] = None
+
+    @property
+    def broker(self) -> Optional[UnixSocketBroker]:
+        directory = realtime_settings()['BROKER_SOCKET_DIR']
+        if not directory:
+            return None
+        if self._broker is None or self._broker.directory != Path(directory):
+            self._broker = UnixSocketBroker(directory, self.deliver)
+        return self._broker
+
+    def subscribe(self) -> Subscription:
+        """Subscribe the running event loop; the stream must unsubscribe() when it ends."""
+        broker = self.broker
+        if broker is not None:
+            # Only processes with watchers need to receive events
+            broker.start()
+        subscription = Subscription(asyncio.get_running_loop(), realtime_settings()['QUEUE_SIZE'])
+        with self.lock:
+            self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        with self.lock:
+            self.subscriptions.discard(subscription)
+
+    def publish(self, event: dict):
+        """Send an event to every subscriber, callable from any thread."""
+        broker = self.broker
+        if broker is not None:
+            broker.publish(event)
+        else:
+            self.deliver(event)
+
+    def deliver(self, event: dict):
+        with self.lock:
+            by_loop: dict[asyncio.AbstractEventLoop, list[Subscription]] = defaultdict(list)
+            for subscription in self.subscriptions:
+                by_loop[subscription.loop].append(subscription)
+        # Wake each event loop once, not once per watcher
+        for loop, subscriptions in by_loop.items():
+            try:
+                loop.call_soon_threadsafe(deliver_on_loop, subscriptions, event)
+            except RuntimeError:
+                # The loop of these streams is closed
+                with self.lock:
+                    self.subscriptions.difference_update(subscriptions)
+
+
+def deliver_on_loop(subscriptions: list[Subscription], event: dict):
+    for subscription in subscriptions:
+        subscription.put(event)
+
+
+broadcaster = Broadcaster()
+
+
+def format_event(event: str, data) -> str:
+    """One Server-Sent Events message."""
+    return f'event: {event}\ndata: {json.dumps(data, cls=DjangoJSONEncoder)}\n\n'
@@ -0,0 +1,48 @@
+import msgpack
+import orjson
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+# Types orjson does not know (lazy strings, Decimals, querysets...) are encoded the way DRF's encoder does
+_default = JSONEncoder().default
+
+# Integer keys such as menu ids become strings, like with json.dumps; UTC datetimes end in Z, like DRF
+ORJSON_OPTIONS = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer on orjson, which encodes dicts, lists, strings, numbers, datetimes, dates and UUIDs natively.
+    Indented output (the browsable API, `; indent=` in Accept) and non-default UNICODE_JSON/COMPACT_JSON settings
+    fall back to DRF's renderer.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context) is not None or self.ensure_ascii or not self.compact:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        content = orjson.dumps(data, default=_default, option=ORJSON_OPTIONS)
+        if b'\xe2\x80\xa8' in content or b'\xe2\x80\xa9' in content:
+            # Like DRF, escape the line separators JavaScript does not allow in strings
+            content = content.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return content
+
+
+class MessagePackRenderer(BaseRenderer):
+    """
+    The JSON payloads as MessagePack (application/msgpack), for clients that want smaller bodies and faster decoding.
+    Datetimes, Decimals and lazy strings are encoded as DRF's JSON encoder does. Integer map keys (menu ids,
+    histogram points) stay integers, where JSON turns them into strings.
+    """
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=_default, use_bin_type=True)
@@ -0,0 +1,45 @@
+from .models import Ballot, DailyTally, Vote
+from .vote_storage import BALLOT_ROW_FIELDS, ballots_enabled, spread_ballots
+
+
+def results_tallies(day):
+    return DailyTally.objects.filter(date=day, vote_count__gt=0).order_by('-points', 'menu_id')
+
+
+def results_votes(day):
+    # Per-employee breakdown as one flat projection, without loading Vote, Menu or Employee rows
+    if ballots_enabled():
+        # One row per ballot, vote_rows() spreads its menus
+        return Ballot.objects.filter(date=day).values_list(*BALLOT_ROW_FIELDS)
+    return Vote.objects.filter(date=day).values_list('menu_id', 'employee_id', 'points')
+
+
+def employee_votes_of_day(day, **employee_filter):
+    if ballots_enabled():
+        return Ballot.objects.filter(date=day, **employee_filter).values_list(*BALLOT_ROW_FIELDS)
+    return Vote.objects.filter(date=day, **employee_filter).values_list('menu_id', 'employee_id', 'points')
+
+
+def vote_rows(rows):
+    """The (menu_id, employee_id, points) rows of a results_votes() or employee_votes_of_day() queryset."""
+    return spread_ballots(rows) if ballots_enabled() else rows
+
+
+def results_payload(tallies, votes) -> dict[int, dict]:
+    """The all-votes-results body from the day's tallies and its (menu_id, employee_id, points) rows."""
+    results: dict[int, dict] = {}
+    for tally in tallies:
+        results[tally.menu_id] = {
+            'menu_id': tally.menu_id,
+            'points': tally.points,
+            'vote_count': tally.vote_count,
+            'histogram': tally.histogram,
+            'votes': []
+        }
+    for menu_id, employee_id, points in votes:
+        if menu_id in results:
+            results[menu_id]['votes'].append({
+                'employee_id': employee_id,
+                'points': points
+            })
+    return results
@@ -0,0 +1,97 @@
+from contextlib import nullcontext
+from datetime import date, timedelta
+from typing import Iterable, Optional
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from .db_routers import primary
+from .models import DailyRollup, DailyTally
+from .snapshots import voting_closed
+from .tallies import TALLY_FIELDS
+
+ROLLUP_ROW_FIELDS = ['date', 'restaurant_id', 'menu_id', 'rank', *TALLY_FIELDS]
+
+
+def last_closed_day() -> date:
+    """Days up to this one are over (or past their voting deadline), their results no longer change."""
+    today = timezone.now().date()
+    return today if voting_closed(today) else today - timedelta(days=1)
+
+
+def build_rollups(dates: Iterable[date]) -> list[DailyRollup]:
+    """The unsaved rollups of the dates from their tallies, ranked per day like the all-votes-results."""
+    return _ranked(DailyTally.objects.filter(date__in=list(dates)))
+
+
+def _ranked(tallies) -> list[DailyRollup]:
+    tallies = (
+        tallies.filter(vote_count__gt=0)
+        .order_by('date', '-points', 'menu_id')
+        .values_list('date', 'menu_id', 'menu__restaurant_id', *TALLY_FIELDS)
+    )
+    rollups: list[DailyRollup] = []
+    rank = 0
+    for day, menu_id, restaurant_id, *values in tallies:
+        rank = rank + 1 if rollups and rollups[-1].date == day else 1
+        rollups.append(DailyRollup(
+            date=day, restaurant_id=restaurant_id, menu_id=menu_id, rank=rank, **dict(zip(TALLY_FIELDS, values))
+        ))
+    return rollups
+
+
+def close_days(dates: Iterable[date]) -> int:
+    """Replace the rollups of the dates with ones built from their tallies. Returns the rollups stored."""
+    dates = list(dates)
+    # From the primary: a replica behind the last votes would store rollups that miss them
+    with primary():
+        rollups = build_rollups(dates)
+    with transaction.atomic():
+        DailyRollup.objects.filter(date__in=dates).delete()
+        DailyRollup.objects.bulk_create(rollups, batch_size=1000)
+    return len(rollups)
+
+
+def reclose_days(dates: Iterable[date]) -> None:
+    """Roll up again the closed days among the dates after their votes changed, in the transaction that changed them."""
+    closed = sorted({day for day in dates if day <= last_closed_day()})
+    if closed:
+        close_days(closed)
+
+
+def unclosed_dates(start: Optional[date] = None, end: Optional[date] = None) -> list[date]:
+    """The closed days from start to end (inclusive, every day if None) with votes but no rollups yet."""
+    end = min(end, last_closed_day()) if end is not None else last_closed_day()
+    tallies = DailyTally.objects.filter(date__lte=end, vote_count__gt=0)
+    rollups = DailyRollup.objects.filter(date__lte=end)
+    if start is not None:
+        tallies, rollups = tallies.filter(date__gte=start), rollups.filter(date__gte=start)
+    voted = set(tallies.values_list('date', flat=True).distinct())
+    return sorted(voted - set(rollups.values_list('date', flat=True).distinct()))
+
+
+def rollup_rows(start: date, end: date) -> list[tuple]:
+    """
+    The ROLLUP_ROW_FIELDS rows of the days from start to end (inclusive), ordered by date and rank: the rollups of
+    the closed days, which are rolled up first if needed, and the running tallies of the others.
+    """
+    missing = unclosed_dates(start, end)
+    if missing:
+        try:
+            close_days(missing)
+        except IntegrityError:
+            # A concurrent read closed one of the days first
+            pass
+
+    # Read the rollups just written from the primary, a replica may not have them yet
+    with primary() if missing else nullcontext():
+        rows = list(
+            DailyRollup.objects.filter(date__range=(start, min(end, last_closed_day())))
+            .order_by('date', 'rank').values_list(*ROLLUP_ROW_FIELDS)
+        )
+    if end > last_closed_day():
+        first_open_day = max(start, last_closed_day() + timedelta(days=1))
+        live = _ranked(DailyTally.objects.filter(date__range=(first_open_day, end)))
+        rows.extend(tuple(getattr(rollup, field) for field in ROLLUP_ROW_FIELDS) for rollup in live)
+    return rows
+
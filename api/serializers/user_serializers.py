@@ -5,6 +5,9 @@ from rest_framework import serializers
 
 
 class UserSerializer(serializers.ModelSerializer):
+    # Bulk imports check the uniqueness of a whole batch at once, see api/onboarding.py
+    check_unique = True
+
     class Meta:
         model = User
         fields = ['username', 'password', 'email' , 'first_name', 'last_name']
@@ -22,7 +25,7 @@ class UserSerializer(serializers.ModelSerializer):
         if '..' in value or '__' in value:
             raise serializers.ValidationError("Username cannot contain consecutive dots or underscores.")
 
-        if User.objects.filter(username=value).exists():
+        if self.check_unique and User.objects.filter(username=value).exists():
             raise serializers.ValidationError("This username is already taken.")
         return value
 
@@ -32,7 +35,7 @@ class UserSerializer(serializers.ModelSerializer):
         except serializers.ValidationError:
             raise serializers.ValidationError("Please provide a valid email address.")
 
-        if User.objects.filter(email=value).exists():
+        if self.check_unique and User.objects.filter(email=value).exists():
             raise serializers.ValidationError("This email address is already in use.")
         return value
 
@@ -46,4 +49,12 @@ class UserSerializer(serializers.ModelSerializer):
         if not re.search(r'[@$!%*?&]', value):
             raise serializers.ValidationError("Password must contain at least one special character.")
 
-        return value
\ No newline at end of file
+        return value
+
+
+class UserImportSerializer(UserSerializer):
+    """UserSerializer without the per-row uniqueness queries, for rows checked together by import_employees()."""
+    check_unique = False
+
+    class Meta(UserSerializer.Meta):
+        extra_kwargs = {**UserSerializer.Meta.extra_kwargs, 'username': {'validators': []}}
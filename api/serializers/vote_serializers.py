@@ -1,9 +1,13 @@
+from django.db import IntegrityError, transaction
 from django.utils import timezone
 from rest_framework import serializers
 
 from .employee_serializers import EmployeeSerializer
 from .menu_serializers import MenuSerializer
-from ..models import Menu, Vote
+from ..models import Ballot, Menu, Vote
+from ..snapshots import check_votes_open
+from ..tallies import record_votes
+from ..vote_storage import MAX_BALLOT_MENUS, ballots_enabled
 
 
 class VoteCreateSerializer(serializers.ModelSerializer):
@@ -29,28 +33,18 @@ class VoteCastSerializer(serializers.ModelSerializer):
     def validate(self, data):
         version = self.context['request'].version
         try:
-            employee = self.context['request'].user.employee
+            self.context['request'].user.employee
         except AttributeError:
             raise serializers.ValidationError({'role': 'Attempt to cast a vote as an employee role.'})
 
         today = timezone.now().date()
 
-        # Validate based on version
+        # Validate based on version, collecting the ballot as menu id -> points
         if version == 'v1':
             menu_id = data.get('menu_id')
             if not menu_id:
                 raise serializers.ValidationError({'menu_id': 'Menu ID is required.'})
-
-            # Validate menu existence
-            try:
-                menu = Menu.objects.get(id=menu_id, date=today)
-            except Menu.DoesNotExist:
-                raise serializers.ValidationError(
-                    {'menu_id': f'Menu with ID {menu_id} not found or not available for today.'})
-
-            # Check if the user has already voted
-            if Vote.objects.filter(employee=employee, menu=menu).exists():
-                raise serializers.ValidationError({'vote': 'You have already cast your vote for this menu.'})
+            ballot = {menu_id: 1}
 
         elif version == 'v2':
             top_menus = data.get('top_menus')
@@ -79,42 +73,64 @@ class VoteCastSerializer(serializers.ModelSerializer):
                 if menu_id in unique_menu_ids:
                     raise serializers.ValidationError({'menu_id': 'Menu IDs must be unique.'})
                 unique_menu_ids.add(menu_id)
-
-                try:
-                    menu = Menu.objects.get(id=menu_id, date=today)
-                except Menu.DoesNotExist:
-                    raise serializers.ValidationError(
-                        {'menu_id': f'Menu with ID {menu_id} not found or not available for today.'})
-
-                if Vote.objects.filter(employee=employee, menu=menu).exists():
-                    raise serializers.ValidationError(
-                        {'vote': f'You have already cast your vote for this Menu with ID {menu_id}.'})
+            ballot = {menu_vote['menu_id']: menu_vote['points'] for menu_vote in top_menus}
         else:
             raise serializers.ValidationError({'version': 'Unsupported version.'})
+
+        # Validate menu existence for the whole ballot with one query
+        menus = {str(menu.id): menu for menu in Menu.objects.filter(id__in=list(ballot), date=today)}
+        for menu_id in ballot:
+            if str(menu_id) not in menus:
+                raise serializers.ValidationError(
+                    {'menu_id': f'Menu with ID {menu_id} not found or not available for today.'})
+
+        data['ballot'] = [(menus[str(menu_id)], points) for menu_id, points in ballot.items()]
         return data
 
     def create(self, validated_data):
         employee = self.context['request'].user.employee
-        today = timezone.now().date()
+        votes = [
+            Vote(employee=employee, menu=menu, points=points, date=menu.date)
+            for menu, points in validated_data['ballot']
+        ]
 
-        version = self.context['request'].version
-        if version == 'v1':
-            # Create a single vote
-            menu_id = validated_data['menu_id']
-            menu = Menu.objects.get(id=menu_id, date=today)
-            vote = Vote.objects.create(employee=employee, menu=menu, points=1)
-            return vote
+        # Insert the whole ballot at once. The unique constraint on (employee, menu) rejects repeated votes, the one
+        # on (employee, date) a second ballot of the day when votes are stored as ballots.
+        try:
+            with transaction.atomic():
+                # The deadline may have passed since the view checked it
+                check_votes_open(votes[0].date)
+                if ballots_enabled():
+                    choices = [(vote.menu_id, vote.points) for vote in votes]
+                    Ballot.from_choices(employee.id, votes[0].date, choices).save()
+                else:
+                    Vote.objects.bulk_create(votes)
+                record_votes(votes)
+        except IntegrityError:
+            raise serializers.ValidationError({'vote': [self.already_cast_message(employee, votes)]})
+
+        if self.context['request'].version == 'v1':
+            return votes[0]
+        return votes
+
+    def already_cast_message(self, employee, votes) -> str:
+        menu_ids = [vote.menu_id for vote in votes]
+        if ballots_enabled():
+            ballot = Ballot.objects.filter(employee=employee, date=votes[0].date).first()
+            voted_menu_ids = {menu_id for menu_id, _ in ballot.choices()} if ballot else set()
+            if not voted_menu_ids & set(menu_ids):
+                return 'You have already cast your vote for today.'
+        elif self.context['request'].version == 'v1':
+            return 'You have already cast your vote for this menu.'
+        else:
+            voted_menu_ids = set(
+                Vote.objects.filter(employee=employee, menu_id__in=menu_ids).values_list('menu_id', flat=True)
+            )
 
-        elif version == 'v2':
-            # Create votes for each of the top 3 menus
-            votes = []
-            for menu_vote in validated_data['top_menus']:
-                menu_id = menu_vote['menu_id']
-                points = menu_vote['points']
-                menu = Menu.objects.get(id=menu_id, date=today)
-                vote = Vote.objects.create(employee=employee, menu=menu, points=points)
-                votes.append(vote)
-            return votes
+        if self.context['request'].version == 'v1':
+            return 'You have already cast your vote for this menu.'
+        menu_id = next((menu_id for menu_id in menu_ids if menu_id in voted_menu_ids), menu_ids[0])
+        return f'You have already cast your vote for this Menu with ID {menu_id}.'
 
 
 class VoteSerializer(serializers.ModelSerializer):
@@ -124,3 +140,85 @@ class VoteSerializer(serializers.ModelSerializer):
     class Meta:
         model = Vote
         fields = '__all__'
+
+
+class BallotSerializer(serializers.ModelSerializer):
+    """A stored ballot, what the admin votes/ endpoints list with VOTE_STORAGE='ballots'."""
+    employee = EmployeeSerializer(read_only=True)
+    top_menus = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Ballot
+        fields = ['id', 'employee', 'date', 'top_menus', 'created_at', 'updated_at']
+
+    def get_top_menus(self, ballot) -> list[dict]:
+        return [{'menu_id': menu_id, 'points': points} for menu_id, points in ballot.choices()]
+
+
+class BallotCreateSerializer(serializers.ModelSerializer):
+    """An admin's ballot for an employee, the menus of one day ranked with unique points like a v2 cast."""
+    top_menus = serializers.ListField(child=serializers.DictField(), min_length=1, max_length=MAX_BALLOT_MENUS,
+                                      write_only=True)
+
+    class Meta:
+        model = Ballot
+        fields = ['id', 'employee', 'date', 'top_menus']
+        read_only_fields = ['date']
+
+    def validate_top_menus(self, top_menus):
+        points = [menu_vote.get('points') for menu_vote in top_menus]
+        if any(menu_points not in [1, 2, 3] for menu_points in points):
+            raise serializers.ValidationError('Points must be 1, 2, or 3.')
+        if len(set(points)) != len(points):
+            raise serializers.ValidationError('Points must be unique for each menu.')
+        menu_ids = [menu_vote.get('menu_id') for menu_vote in top_menus]
+        if len(set(menu_ids)) != len(menu_ids):
+            raise serializers.ValidationError('Menu IDs must be unique.')
+
+        menus = {str(menu.id): menu for menu in Menu.objects.filter(id__in=menu_ids)}
+        for menu_id in menu_ids:
+            if str(menu_id) not in menus:
+                raise serializers.ValidationError(f'Menu with ID {menu_id} not found.')
+        if len({menu.date for menu in menus.values()}) > 1:
+            raise serializers.ValidationError('The menus of a ballot must be of the same day.')
+        return [(menus[str(menu_id)], menu_points) for menu_id, menu_points in zip(menu_ids, points)]
+
+    def create(self, validated_data):
+        choices = validated_data['top_menus']
+        day = choices[0][0].date
+        ballot = Ballot.from_choices(validated_data['employee'].id, day,
+                                     [(menu.id, points) for menu, points in choices])
+        # The unique constraint on (employee, date) rejects a second ballot of the day
+        try:
+            with transaction.atomic():
+                ballot.save()
+        except IntegrityError:
+            raise serializers.ValidationError({'employee': [f'The employee has already cast a ballot on {day}.']})
+        return ballot
+
+    def to_representation(self, instance):
+        return BallotSerializer(instance, context=self.context).data
+
+
+class BallotUpdateSerializer(BallotCreateSerializer):
+    """New menus and points for a stored ballot, of the ballot's day."""
+
+    class Meta(BallotCreateSerializer.Meta):
+        read_only_fields = ['employee', 'date']
+
+    def validate_top_menus(self, top_menus):
+        choices = super().validate_top_menus(top_menus)
+        if choices[0][0].date != self.instance.date:
+            raise serializers.ValidationError(f'The menus must be of the ballot\'s day, {self.instance.date}.')
+        return choices
+
+    def update(self, instance, validated_data):
+        if 'top_menus' not in validated_data:
+            return instance
+        updated = Ballot.from_choices(instance.employee_id, instance.date,
+                                      [(menu.id, points) for menu, points in validated_data['top_menus']])
+        for menu_field, points_field in Ballot.SLOT_FIELDS:
+            setattr(instance, menu_field, getattr(updated, menu_field))
+            setattr(instance, points_field, getattr(updated, points_field))
+        instance.save()
+        return instance
@@ -0,0 +1,82 @@
+from django.contrib.auth.models import Group, Permission, User
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .cache import bump_version, menus_scope
+from .models import Employee, Menu, Restaurant
+from .permission_cache import bump_permissions
+
+
+@receiver([post_save, post_delete], sender=Menu)
+def invalidate_menus_of_day(sender, instance, **kwargs):
+    bump_version(menus_scope(instance.date))
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def invalidate_menus_of_restaurant(sender, instance, **kwargs):
+    # Restaurants are nested in the cached menu payloads
+    bump_version(menus_scope(timezone.now().date()))
+
+
+@receiver(post_save, sender=User)
+def invalidate_menus_of_owner(sender, instance, created, **kwargs):
+    # So are their owners
+    if not created and Restaurant.objects.filter(owner_id=instance.id).exists():
+        bump_version(menus_scope(timezone.now().date()))
+
+
+# Grants and roles are embedded in the access token claims, see api/authentication.py
+
+@receiver(m2m_changed, sender=User.groups.through)
+@receiver(m2m_changed, sender=User.user_permissions.through)
+def invalidate_user_permissions(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        bump_permissions(instance.id)
+    elif pk_set is None:
+        # Cleared from the group or permission side, the users are no longer known
+        bump_permissions()
+    else:
+        for user_id in pk_set:
+            bump_permissions(user_id)
+
+
+@receiver(m2m_changed, sender=Group.permissions.through)
+def invalidate_group_permissions(sender, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        bump_permissions()
+
+
+@receiver(post_delete, sender=Group)
+@receiver(post_delete, sender=Permission)
+def invalidate_deleted_grants(sender, instance, **kwargs):
+    bump_permissions()
+
+
+@receiver([post_save, post_delete], sender=User)
+def invalidate_user_claims(sender, instance, update_fields=None, **kwargs):
+    # Deactivated users and superuser changes. A login only saves last_login, which no claim carries.
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    bump_permissions(instance.id)
+
+
+@receiver([post_save, post_delete], sender=Employee)
+def invalidate_employee_claims(sender, instance, **kwargs):
+    bump_permissions(instance.user_id)
+
+
+@receiver(pre_save, sender=Restaurant)
+def invalidate_previous_owner_claims(sender, instance, **kwargs):
+    if instance.pk is None:
+        return
+    previous_owner_id = Restaurant.objects.filter(pk=instance.pk).values_list('owner_id', flat=True).first()
+    if previous_owner_id is not None and previous_owner_id != instance.owner_id:
+        bump_permissions(previous_owner_id)
+
+
+@receiver([post_save, post_delete], sender=Restaurant)
+def invalidate_owner_claims(sender, instance, **kwargs):
+    bump_permissions(instance.owner_id)
@@ -0,0 +1,215 @@
+from dataclasses import dataclass
+from datetime import date, datetime, time
+from typing import Any, Iterable, Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import exceptions, status
+
+from .cache import PAYLOAD_TIMEOUT, acached_payload, aget_version, bump_version, cached_payload, compute_etag, \
+    get_version
+from .db_routers import primary
+from .models import DailyResultSnapshot, DailyTally
+from .results import results_payload, results_tallies, results_votes, vote_rows
+from .tallies import HISTOGRAM_FIELDS, TALLY_FIELDS
+
+# The order of results_tallies()
+TIE_BREAK_RULE = 'Most points, then the lowest menu id (the menu uploaded first).'
+# Renderers whose output only depends on the payload and the media type, their bodies are cached
+RENDERED_FORMATS = ('json', 'msgpack')
+
+
+@dataclass
+class FrozenBody:
+    etag: str
+    # No votes were cast
+    empty: bool
+    # The rendered payload, or for the other renderers (the browsable API) the payload itself
+    content: Optional[bytes] = None
+    data: Any = None
+
+
+def voting_settings() -> dict:
+    return {
+        'DEADLINE': '',
+        'FREEZE_ON_READ': True,
+        **getattr(settings, 'VOTING', {}),
+    }
+
+
+def voting_deadline(day: date) -> Optional[datetime]:
+    """When voting for the day closes, None if it never does."""
+    deadline = voting_settings()['DEADLINE']
+    if not deadline:
+        return None
+    try:
+        cutoff = deadline if isinstance(deadline, time) else time.fromisoformat(deadline)
+    except ValueError:
+        raise ImproperlyConfigured(f'VOTING_DEADLINE must be a time (HH:MM), not {deadline!r}.')
+    return timezone.make_aware(datetime.combine(day, cutoff))
+
+
+def voting_closed(day: Optional[date] = None) -> bool:
+    """Whether the votes of the day (today if None) can no longer change: the day is over or past its deadline."""
+    today = timezone.now().date()
+    day = day or today
+    if day != today:
+        return day < today
+    deadline = voting_deadline(day)
+    return deadline is not None and timezone.now() >= deadline
+
+
+class VotingClosed(exceptions.APIException):
+    status_code = status.HTTP_400_BAD_REQUEST
+    default_code = 'voting_closed'
+
+
+def locked_days(days: Iterable[date]) -> set[date]:
+    """The days whose votes can no longer be cast, changed or removed: past their deadline, or their results frozen."""
+    today = timezone.now().date()
+    days = set(days)
+    locked = {day for day in days if voting_deadline(day) is not None and voting_closed(day)}
+    # Today's results are only frozen past its deadline
+    unknown = days - locked - {today}
+    if unknown:
+        locked.update(DailyResultSnapshot.objects.filter(date__in=unknown).values_list('date', flat=True))
+    return locked
+
+
+def check_votes_open(day: date) -> None:
+    """Raise VotingClosed if the day's votes are locked. Call inside the transaction that changes them."""
+    if not locked_days([day]):
+        return
+    deadline = voting_deadline(day)
+    if day == timezone.now().date() and deadline is not None:
+        raise VotingClosed({'error': f'Voting for today closed at {deadline:%H:%M}.'})
+    raise VotingClosed({'error': f'Voting for {day} is closed, its results are final.'})
+
+
+def results_scope(day: date) -> str:
+    return f'results:{day.isoformat()}'
+
+
+def build_ranking(day: date) -> list[dict]:
+    tallies = (
+        DailyTally.objects.filter(date=day, vote_count__gt=0).order_by('-points', 'menu_id')
+        .values_list('menu_id', 'menu__restaurant_id', *TALLY_FIELDS)
+    )
+    ranking = []
+    for rank, (menu_id, restaurant_id, *values) in enumerate(tallies, start=1):
+        tally = dict(zip(TALLY_FIELDS, values))
+        ranking.append({
+            'rank': rank,
+            'menu_id': menu_id,
+            'restaurant_id': restaurant_id,
+            'points': tally['points'],
+            'vote_count': tally['vote_count'],
+            'histogram': {points: tally[field] for points, field in HISTOGRAM_FIELDS.items()},
+        })
+    return ranking
+
+
+def tie_break(ranking: list[dict]) -> dict:
+    if not ranking:
+        return {'rule': TIE_BREAK_RULE, 'tied_menu_ids': [], 'decided_by': None}
+    tied = [entry['menu_id'] for entry in ranking if entry['points'] == ranking[0]['points']]
+    return {
+        'rule': TIE_BREAK_RULE,
+        'tied_menu_ids': tied,
+        # What set the winner apart: its points, or its menu id among the menus with as many
+        'decided_by': 'points' if len(tied) == 1 else 'menu_id',
+    }
+
+
+def freeze_day(day: date) -> DailyResultSnapshot:
+    """The day's snapshot, computed from its tallies and votes if this is the first freeze."""
+    # From the primary: a replica behind the last votes would freeze results that miss them
+    with primary():
+        snapshot = DailyResultSnapshot.objects.filter(date=day).first()
+        if snapshot is not None:
+            return snapshot
+        ranking = build_ranking(day)
+        payload = results_payload(results_tallies(day), vote_rows(results_votes(day)))
+
+    winner = ranking[0] if ranking else {}
+    snapshot = DailyResultSnapshot(
+        date=day,
+        winner_id=winner.get('menu_id'),
+        winner_restaurant_id=winner.get('restaurant_id'),
+        vote_count=sum(entry['vote_count'] for entry in ranking),
+        ranking=ranking,
+        tie_break=tie_break(ranking),
+        payload=payload,
+        etag=compute_etag(payload),
+    )
+    try:
+        with transaction.atomic():
+            snapshot.save()
+            # Readers that cached the unfrozen state of the scope pick the snapshot up
+            bump_version(results_scope(day))
+    except IntegrityError:
+        # A concurrent reader froze the day first
+        with primary():
+            return DailyResultSnapshot.objects.get(date=day)
+    return snapshot
+
+
+def _snapshot_payload(day: date) -> Optional[dict]:
+    snapshot = DailyResultSnapshot.objects.filter(date=day).first()
+    if snapshot is None:
+        if not voting_settings()['FREEZE_ON_READ']:
+            return None
+        snapshot = freeze_day(day)
+    return snapshot.payload
+
+
+def rendered_key(scope: str, version: int, media_type: str) -> str:
+    return f'rendered:{scope}:{version}:{media_type}'
+
+
+def _frozen_body(payload, renderer, media_type: str) -> FrozenBody:
+    if renderer.format not in RENDERED_FORMATS:
+        return FrozenBody(payload.etag, not payload.data, data=payload.data)
+    content = renderer.render(payload.data, media_type) if payload.data else None
+    return FrozenBody(payload.etag, not payload.data, content=content)
+
+
+def frozen_body(day: date, renderer, media_type: str) -> Optional[FrozenBody]:
+    """
+    The all-votes-results of a day whose voting closed, from its snapshot, rendered once per media type and cached
+    with its ETag: later reads neither load nor render the payload. None while the results are live, or until
+    freeze_results runs when FREEZE_ON_READ is off.
+    """
+    if not voting_closed(day):
+        return None
+    scope = results_scope(day)
+    key = rendered_key(scope, get_version(scope), media_type)
+    body = cache.get(key)
+    if body is None:
+        payload = cached_payload(scope, lambda: _snapshot_payload(day))
+        if payload.data is None:
+            return None
+        body = _frozen_body(payload, renderer, media_type)
+        if body.data is None:
+            cache.set(key, body, PAYLOAD_TIMEOUT)
+    return body
+
+
+async def afrozen_body(day: date, renderer, media_type: str) -> Optional[FrozenBody]:
+    if not voting_closed(day):
+        return None
+    scope = results_scope(day)
+    key = rendered_key(scope, await aget_version(scope), media_type)
+    body = await cache.aget(key)
+    if body is None:
+        payload = await acached_payload(scope, sync_to_async(lambda: _snapshot_payload(day)))
+        if payload.data is None:
+            return None
+        body = _frozen_body(payload, renderer, media_type)
+        if body.data is None:
+            await cache.aset(key, body, PAYLOAD_TIMEOUT)
+    return body
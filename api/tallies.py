@@ -0,0 +1,168 @@
+from collections import defaultdict
+from datetime import date
+from typing import Iterable, Optional
+
+from django.db import transaction
+from django.db.models import Case, Count, F, IntegerField, Q, Sum, Value, When
+from django.utils import timezone
+
+from .models import Ballot, DailyTally, Vote
+from .realtime import broadcaster
+from .vote_storage import ballots_enabled
+
+HISTOGRAM_FIELDS = {
+    1: 'one_point_votes',
+    2: 'two_point_votes',
+    3: 'three_point_votes',
+}
+TALLY_FIELDS = ['points', 'vote_count', *HISTOGRAM_FIELDS.values()]
+
+
+def _collect_deltas(votes: Iterable[Vote], sign: int) -> dict[tuple[int, date], dict[str, int]]:
+    deltas: dict[tuple[int, date], dict[str, int]] = defaultdict(lambda: dict.fromkeys(TALLY_FIELDS, 0))
+    for vote in votes:
+        delta = deltas[(vote.menu_id, vote.date)]
+        delta['points'] += sign * vote.points
+        delta['vote_count'] += sign
+        if vote.points in HISTOGRAM_FIELDS:
+            delta[HISTOGRAM_FIELDS[vote.points]] += sign
+    return deltas
+
+
+def _apply_deltas(deltas: dict[tuple[int, date], dict[str, int]]) -> None:
+    if not deltas:
+        return
+    now = timezone.now()
+    menu_ids = [menu_id for menu_id, _ in deltas]
+
+    # First votes of the day for some menus: make sure their tallies exist before incrementing, a concurrent first
+    # vote then adds to the same row. Retractions create nothing, rebuild_tallies repairs a missing tally if needed.
+    DailyTally.objects.bulk_create(
+        [DailyTally(menu_id=menu_id, date=menu_date) for (menu_id, menu_date), delta in deltas.items()
+         if delta['vote_count'] > 0],
+        ignore_conflicts=True,
+    )
+
+    # One UPDATE for every menu of the ballot, each row gets its own increments
+    increments = {
+        field: F(field) + Case(
+            *[When(menu_id=menu_id, then=Value(delta[field])) for (menu_id, _), delta in deltas.items()],
+            default=Value(0),
+            output_field=IntegerField(),
+        )
+        for field in TALLY_FIELDS
+    }
+    DailyTally.objects.filter(menu_id__in=menu_ids).update(updated_at=now, **increments)
+
+
+def _publish_deltas(deltas: dict[tuple[int, date], dict[str, int]]) -> None:
+    """Push the deltas to the results streams once the transaction commits."""
+    if not deltas:
+        return
+    by_date: dict[date, list[dict]] = defaultdict(list)
+    for (menu_id, menu_date), delta in deltas.items():
+        by_date[menu_date].append({
+            'menu_id': menu_id,
+            'points': delta['points'],
+            'vote_count': delta['vote_count'],
+            'histogram': {points: delta[field] for points, field in HISTOGRAM_FIELDS.items()},
+        })
+    for menu_date, menus in by_date.items():
+        event = {'type': 'delta', 'date': menu_date.isoformat(), 'menus': menus}
+        transaction.on_commit(lambda event=event: broadcaster.publish(event))
+
+
+def record_votes(votes: Iterable[Vote]) -> None:
+    """Add the votes to the tallies of their menus. Call inside the transaction that saves the votes."""
+    deltas = _collect_deltas(votes, 1)
+    _apply_deltas(deltas)
+    _publish_deltas(deltas)
+
+
+def retract_votes(votes: Iterable[Vote]) -> None:
+    """Remove the votes from the tallies of their menus. Call inside the transaction that deletes the votes."""
+    deltas = _collect_deltas(votes, -1)
+    _apply_deltas(deltas)
+    _publish_deltas(deltas)
+
+
+def compute_tallies(dates: Optional[Iterable[date]] = None) -> dict[int, dict]:
+    """Aggregate the raw votes (the Vote or Ballot table, per VOTE_STORAGE) into tally rows keyed by menu id."""
+    if ballots_enabled():
+        return _compute_ballot_tallies(dates)
+    votes = Vote.objects.all()
+    if dates is not None:
+        votes = votes.filter(date__in=list(dates))
+    rows = votes.values('menu_id', 'date').annotate(
+        total_points=Sum('points'),
+        total_votes=Count('id'),
+        **{field: Count('id', filter=Q(points=points)) for points, field in HISTOGRAM_FIELDS.items()},
+    )
+    return {
+        row['menu_id']: {
+            'date': row['date'],
+            'points': row['total_points'],
+            'vote_count': row['total_votes'],
+            **{field: row[field] for field in HISTOGRAM_FIELDS.values()},
+        }
+        for row in rows
+    }
+
+
+def _compute_ballot_tallies(dates: Optional[Iterable[date]] = None) -> dict[int, dict]:
+    ballots = Ballot.objects.all()
+    if dates is not None:
+        ballots = ballots.filter(date__in=list(dates))
+
+    # One aggregate per ballot slot, a menu's tally sums its rows of every slot
+    tallies: dict[int, dict] = {}
+    for menu_field, points_field in Ballot.SLOT_FIELDS:
+        rows = ballots.filter(**{f'{menu_field}__isnull': False}).values('date', menu=F(menu_field)).annotate(
+            total_points=Sum(points_field),
+            total_votes=Count('id'),
+            **{field: Count('id', filter=Q(**{points_field: points})) for points, field in HISTOGRAM_FIELDS.items()},
+        )
+        for row in rows:
+            tally = tallies.setdefault(row['menu'], {'date': row['date'], **dict.fromkeys(TALLY_FIELDS, 0)})
+            tally['points'] += row['total_points']
+            tally['vote_count'] += row['total_votes']
+            for field in HISTOGRAM_FIELDS.values():
+                tally[field] += row[field]
+    return tallies
+
+
+def rebuild_tallies(dates: Optional[Iterable[date]] = None) -> int:
+    """Replace the stored tallies of the given dates (all dates if None) with ones computed from votes."""
+    dates = list(dates) if dates is not None else None
+    expected = compute_tallies(dates)
+    with transaction.atomic():
+        stale = DailyTally.objects.all()
+        if dates is not None:
+            stale = stale.filter(date__in=dates)
+        stale.delete()
+        DailyTally.objects.bulk_create(
+            [DailyTally(menu_id=menu_id, **values) for menu_id, values in expected.items()],
+            batch_size=1000,
+        )
+    return len(expected)
+
+
+def verify_tallies(dates: Optional[Iterable[date]] = None) -> list[dict]:
+    """Compare stored tallies with the raw votes and return the menus that disagree."""
+    dates = list(dates) if dates is not None else None
+    expected = compute_tallies(dates)
+    stored_tallies = DailyTally.objects.all()
+    if dates is not None:
+        stored_tallies = stored_tallies.filter(date__in=dates)
+    stored = {
+        row['menu_id']: row
+        for row in stored_tallies.values('menu_id', 'date', *TALLY_FIELDS)
+    }
+
+    mismatches = []
+    for menu_id in sorted(expected.keys() | stored.keys()):
+        expected_values = {field: expected.get(menu_id, {}).get(field, 0) for field in TALLY_FIELDS}
+        stored_values = {field: stored.get(menu_id, {}).get(field, 0) for field in TALLY_FIELDS}
+        if expected_values != stored_values:
+            mismatches.append({'menu_id': menu_id, 'expected': expected_values, 'stored': stored_values})
+    return mismatches
@@ -0,0 +1,103 @@
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import ResolverMatch, reverse
+from django.utils import timezone
+
+from api.metrics import registry
+from api.middleware import PerformanceMiddleware
+from api.models import Menu
+from api.utils import BaseTestCase
+from api.views import async_views
+
+
+class AsyncViewsTestCase(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups')
+        call_command('seed')
+
+    def setUp(self):
+        super().setUp()
+        self.test_password = '123qwe!@#QWE'
+        self.factory = AsyncRequestFactory()
+
+    def cast_votes(self):
+        menu_ids = list(Menu.objects.filter(date=timezone.now().date()).order_by('id').values_list('id', flat=True))
+        for username, menu_id in [('employee1', menu_ids[0]), ('employee2', menu_ids[0]), ('employee3', menu_ids[1])]:
+            self.api_login(username, self.test_password)
+            self.client.post(reverse('vote-cast-vote'), {'menu_id': menu_id}, format='json')
+        self.client.credentials()
+
+    def sync_response(self, username, password, url, **headers):
+        self.api_login(username, password)
+        return self.client.get(url, headers=headers)
+
+    async def assert_same_response(self, view, url, username, password, **headers):
+        """The async view answers with the status, headers and body of its DRF action."""
+        expected = await sync_to_async(self.sync_response)(username, password, url, **headers)
+        token = await sync_to_async(self.get_jwt_token)(username, password)
+        request = self.factory.get(url, headers={'Authorization': f'Bearer {token}', **headers})
+        response = await view(request)
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.content, expected.content)
+        for header in ['Content-Type', 'ETag', 'Cache-Control']:
+            self.assertEqual(response.get(header), expected.get(header))
+        return response
+
+    async def test_current_day_menu(self):
+        response = await self.assert_same_response(
+            async_views.current_day_menu, reverse('menu-current-day-menu'), 'employee1', self.test_password
+        )
+        await self.assert_same_response(
+            async_views.current_day_menu, reverse('menu-current-day-menu'), 'employee1', self.test_password,
+            **{'If-None-Match': response['ETag']}
+        )
+
+    async def test_current_day_menu_msgpack(self):
+        await self.assert_same_response(
+            async_views.current_day_menu, reverse('menu-current-day-menu'), 'employee1', self.test_password,
+            Accept='application/msgpack'
+        )
+        response = await async_views.current_day_menu(
+            self.factory.get(reverse('menu-current-day-menu'), headers={'Accept': 'text/csv'})
+        )
+        self.assertEqual(response.status_code, 406)
+
+    async def test_my_vote(self):
+        await self.assert_same_response(async_views.my_vote, reverse('vote-my-vote'), 'employee1', self.test_password)
+        await sync_to_async(self.cast_votes)()
+        await self.assert_same_response(async_views.my_vote, reverse('vote-my-vote'), 'employee1', self.test_password)
+
+    @override_settings(STATELESS_JWT_AUTH=True)
+    async def test_my_vote_stateless(self):
+        await sync_to_async(self.cast_votes)()
+        await self.assert_same_response(async_views.my_vote, reverse('vote-my-vote'), 'employee3', self.test_password)
+
+    async def test_all_votes_results(self):
+        url = reverse('vote-all-votes-results')
+        await self.assert_same_response(async_views.all_votes_results, url, 'admin', 'adminpassword')
+        await sync_to_async(self.cast_votes)()
+        await self.assert_same_response(async_views.all_votes_results, url, 'admin', 'adminpassword')
+
+    async def test_permissions(self):
+        response = await async_views.all_votes_results(self.factory.get(reverse('vote-all-votes-results')))
+        self.assertEqual(response.status_code, 401)
+        await self.assert_same_response(
+            async_views.all_votes_results, reverse('vote-all-votes-results'), 'employee1', self.test_password
+        )
+
+    async def test_middleware_records_async_queries(self):
+        registry.reset()
+        middleware = PerformanceMiddleware(async_views.all_votes_results)
+        token = await sync_to_async(self.get_jwt_token)('admin', 'adminpassword')
+        await sync_to_async(self.cast_votes)()
+        request = self.factory.get(reverse('vote-all-votes-results'), headers={'Authorization': f'Bearer {token}'})
+        request.resolver_match = ResolverMatch(async_views.all_votes_results, (), {})
+
+        response = await middleware(request)
+        self.assertEqual(response.status_code, 200)
+        # User, tallies and votes, the permissions are cached by the login
+        _, total, count = registry.histograms['db_queries'].series['all_votes_results']
+        self.assertEqual(count, 1)
+        self.assertGreaterEqual(total, 3)
@@ -0,0 +1,139 @@
+from datetime import timedelta
+
+from django.contrib.auth.models import Group, User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
+
+from api.constants import GROUP_NAMES
+from api.models import Employee, Menu, Restaurant, Vote
+from api.permission_cache import check_permission_cache
+from api.utils import BaseTestCase
+
+
+@override_settings(STATELESS_JWT_AUTH=True)
+class StatelessAuthenticationTestCase(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups')
+        call_command('seed')
+
+    def setUp(self):
+        super().setUp()
+        self.test_password = '123qwe!@#QWE'
+
+    def obtain_tokens(self, username):
+        response = self.client.post(reverse('token_obtain_pair'), {'username': username, 'password': self.test_password},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_access_token_claims(self):
+        token = AccessToken(self.obtain_tokens('employee1')['access'])
+        self.assertEqual(token['employee_id'], Employee.objects.get(user__username='employee1').id)
+        self.assertIsNone(token['restaurant_id'])
+        self.assertFalse(token['is_superuser'])
+        self.assertEqual(token['perms'], ['api.cast_vote', 'api.get_current_day_menu', 'api.get_my_vote'])
+
+        token = AccessToken(self.obtain_tokens('rest_owner1')['access'])
+        self.assertEqual(token['restaurant_id'], Restaurant.objects.get(owner__username='rest_owner1').id)
+        self.assertIsNone(token['employee_id'])
+
+    def test_my_vote_without_user_queries(self):
+        self.api_login('employee1', self.test_password)
+        menu = Menu.objects.filter(date=timezone.now().date()).first()
+        response = self.client.post(reverse('vote-cast-vote'), {'menu_id': menu.id}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(Vote.objects.filter(employee__user__username='employee1', menu=menu).exists())
+
+        # Only the lookup of the vote itself
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('vote-my-vote'))
+        self.assertEqual(response.data, [{'menu_id': menu.id, 'points': 1}])
+
+    def test_permission_denied_from_claims(self):
+        self.api_login('employee1', self.test_password)
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('vote-all-votes-results'))
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_upload_menu_uses_restaurant_claim(self):
+        self.api_login('rest_owner1', self.test_password)
+        data = {'date': timezone.now().date() + timedelta(days=1), 'items': 'New Menu'}
+        response = self.client.post(reverse('menu-upload-menu'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Menu.objects.get(items='New Menu').restaurant.owner.username, 'rest_owner1')
+
+    def test_revoked_group_rejects_token_until_refresh(self):
+        tokens = self.obtain_tokens('employee1')
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {tokens["access"]}')
+        self.assertEqual(self.client.get(reverse('vote-my-vote')).status_code, status.HTTP_200_OK)
+
+        user = User.objects.get(username='employee1')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.groups.remove(Group.objects.get(name=GROUP_NAMES['EMPLOYEE']))
+        response = self.client.get(reverse('vote-my-vote'))
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        # The refreshed token carries the current grants
+        self.client.credentials()
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(AccessToken(response.data['access'])['perms'], [])
+        self.client.credentials(HTTP_AUTHORIZATION=f'Bearer {response.data["access"]}')
+        self.assertEqual(self.client.get(reverse('vote-my-vote')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_cache_eviction_keeps_tokens(self):
+        self.api_login('employee1', self.test_password)
+        cache.clear()
+        # The versions are reloaded from the database, the token stays valid
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get(reverse('vote-my-vote')).status_code, status.HTTP_200_OK)
+        with self.assertNumQueries(1):
+            self.assertEqual(self.client.get(reverse('vote-my-vote')).status_code, status.HTTP_200_OK)
+
+        user = User.objects.get(username='employee1')
+        with self.captureOnCommitCallbacks(execute=True):
+            user.groups.remove(Group.objects.get(name=GROUP_NAMES['EMPLOYEE']))
+        cache.clear()
+        self.assertEqual(self.client.get(reverse('vote-my-vote')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_shared_cache_required(self):
+        locmem = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+        redis = {'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache', 'LOCATION': 'redis://cache'}}
+        with self.settings(CACHES=locmem):
+            with self.assertRaises(ImproperlyConfigured):
+                check_permission_cache()
+            with self.settings(STATELESS_JWT_AUTH=False):
+                check_permission_cache()
+        with self.settings(CACHES=redis):
+            check_permission_cache()
+
+    def test_login_keeps_tokens(self):
+        self.api_login('employee1', self.test_password)
+        # The session login of the admin site saves last_login
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertTrue(self.client.login(username='employee1', password=self.test_password))
+        self.assertEqual(self.client.get(reverse('vote-my-vote')).status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.filter(username='employee1').first().save(update_fields=['is_active'])
+        self.assertEqual(self.client.get(reverse('vote-my-vote')).status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_refresh_rejects_inactive_user(self):
+        tokens = self.obtain_tokens('employee1')
+        User.objects.filter(username='employee1').update(is_active=False)
+        response = self.client.post(reverse('token_refresh'), {'refresh': tokens['refresh']}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(STATELESS_JWT_AUTH=False)
+    def test_database_user_when_disabled(self):
+        self.api_login('employee1', self.test_password)
+        response = self.client.get(reverse('vote-my-vote'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsInstance(response.wsgi_request.user, User)
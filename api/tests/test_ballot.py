@@ -0,0 +1,176 @@
+from datetime import timedelta
+from io import StringIO
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from api.constants import GROUP_NAMES
+from api.models import Ballot, DailyTally, Employee, Menu, Restaurant, Vote
+from api.tallies import verify_tallies
+from api.utils import BaseTestCase, create_user_with_group
+from api.views import async_views
+
+V2 = {'Accept': 'application/json; version=v2'}
+
+
+@override_settings(VOTE_STORAGE='ballots')
+class BallotStorageTestCase(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups')
+        call_command('seed')
+
+    def setUp(self):
+        super().setUp()
+        self.test_password = '123qwe!@#QWE'
+        self.today = timezone.now().date()
+        self.menu_ids = list(Menu.objects.filter(date=self.today).order_by('id').values_list('id', flat=True)[:3])
+        self.employee = Employee.objects.get(user__username='employee1')
+
+    def cast(self, username, data, headers=None):
+        self.api_login(username, self.test_password)
+        return self.client.post(reverse('vote-cast-vote'), data, format='json', headers=headers)
+
+    def cast_ballots(self):
+        self.cast('employee1', {'menu_id': self.menu_ids[1]})
+        top_menus = [{'menu_id': menu_id, 'points': points} for menu_id, points in zip(self.menu_ids, [1, 3, 2])]
+        self.cast('employee2', {'top_menus': top_menus}, V2)
+
+    def test_cast_vote_v2_stores_one_row(self):
+        top_menus = [{'menu_id': menu_id, 'points': points} for menu_id, points in zip(self.menu_ids, [3, 2, 1])]
+        response = self.cast('employee1', {'top_menus': top_menus}, V2)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        ballot = Ballot.objects.get(employee=self.employee, date=self.today)
+        self.assertEqual(ballot.choices(), list(zip(self.menu_ids, [3, 2, 1])))
+        self.assertFalse(Vote.objects.filter(employee=self.employee, date=self.today).exists())
+        self.assertEqual(DailyTally.objects.get(menu_id=self.menu_ids[0]).points, 3)
+        self.assertEqual(verify_tallies([self.today]), [])
+
+    def test_one_ballot_per_day(self):
+        self.cast('employee1', {'menu_id': self.menu_ids[0]})
+        response = self.cast('employee1', {'menu_id': self.menu_ids[0]})
+        self.assertEqual(response.data['vote'], ['You have already cast your vote for this menu.'])
+        response = self.cast('employee1', {'menu_id': self.menu_ids[1]})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['vote'], ['You have already cast your vote for today.'])
+
+        top_menus = [{'menu_id': menu_id, 'points': points} for menu_id, points in zip(self.menu_ids, [3, 2, 1])]
+        response = self.cast('employee1', {'top_menus': top_menus}, V2)
+        self.assertEqual(response.data['vote'], [f'You have already cast your vote for this Menu with ID '
+                                                 f'{self.menu_ids[0]}.'])
+        self.assertEqual(Ballot.objects.filter(employee=self.employee).count(), 1)
+
+    def test_responses_match_vote_storage(self):
+        self.cast_ballots()
+        responses = {}
+        for storage in ['ballots', 'votes']:
+            with self.settings(VOTE_STORAGE=storage):
+                if storage == 'votes':
+                    call_command('convert_vote_storage', '--to', 'votes', stdout=StringIO())
+                self.assertEqual(verify_tallies([self.today]), [])
+                self.api_login('employee2', self.test_password)
+                my_vote = self.client.get(reverse('vote-my-vote')).content
+                self.api_login('admin', 'adminpassword')
+                results = self.client.get(reverse('vote-all-votes-results')).content
+                responses[storage] = my_vote, results
+        self.assertEqual(responses['ballots'], responses['votes'])
+        self.assertIn(b'"points":3', responses['ballots'][0])
+
+    async def test_async_views(self):
+        await sync_to_async(self.cast_ballots)()
+        for view, url, username, password in [
+            (async_views.my_vote, reverse('vote-my-vote'), 'employee2', self.test_password),
+            (async_views.all_votes_results, reverse('vote-all-votes-results'), 'admin', 'adminpassword'),
+        ]:
+            await sync_to_async(self.api_login)(username, password)
+            expected = await sync_to_async(self.client.get)(url)
+            token = await sync_to_async(self.get_jwt_token)(username, password)
+            response = await view(AsyncRequestFactory().get(url, headers={'Authorization': f'Bearer {token}'}))
+            self.assertEqual(response.content, expected.content)
+
+    def test_delete_employee_retracts_ballot(self):
+        self.cast_ballots()
+        self.api_login('admin', 'adminpassword')
+        employee = Employee.objects.get(user__username='employee2')
+        self.client.delete(reverse('employee-detail', args=[employee.id]))
+        self.assertFalse(Ballot.objects.filter(employee_id=employee.id).exists())
+        self.assertEqual(verify_tallies([self.today]), [])
+
+    def test_admin_vote_endpoints(self):
+        self.cast_ballots()
+        self.api_login('admin', 'adminpassword')
+        response = self.client.get(reverse('vote-list'), headers=V2)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([ballot['employee']['user']['username'] for ballot in response.data['results']],
+                         ['employee2', 'employee1'])
+        ballot = Ballot.objects.get(employee=self.employee)
+        response = self.client.get(reverse('vote-detail', args=[ballot.id]))
+        self.assertEqual(response.data['top_menus'], [{'menu_id': self.menu_ids[1], 'points': 1}])
+
+        # Written through the ballots, the tallies follow
+        employee3 = Employee.objects.get(user__username='employee3')
+        top_menus = [{'menu_id': self.menu_ids[0], 'points': 2}, {'menu_id': self.menu_ids[2], 'points': 3}]
+        response = self.client.post(reverse('vote-list'), {'employee': employee3.id, 'top_menus': top_menus},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['top_menus'], top_menus)
+        self.assertEqual(Ballot.objects.get(employee=employee3).date, self.today)
+        self.assertEqual(verify_tallies([self.today]), [])
+        response = self.client.post(reverse('vote-list'), {'employee': employee3.id, 'top_menus': top_menus},
+                                    format='json')
+        self.assertEqual(response.data, {'employee': [f'The employee has already cast a ballot on {self.today}.']})
+
+        response = self.client.patch(reverse('vote-detail', args=[ballot.id]),
+                                     {'top_menus': [{'menu_id': self.menu_ids[0], 'points': 3}]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        ballot.refresh_from_db()
+        self.assertEqual(ballot.choices(), [(self.menu_ids[0], 3)])
+        self.assertEqual(verify_tallies([self.today]), [])
+
+        response = self.client.delete(reverse('vote-detail', args=[ballot.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertFalse(Ballot.objects.filter(employee=self.employee).exists())
+        self.assertEqual(verify_tallies([self.today]), [])
+        self.assertFalse(Vote.objects.exists())
+
+    def test_admin_ballot_validation(self):
+        self.cast_ballots()
+        self.api_login('admin', 'adminpassword')
+        ballot = Ballot.objects.get(employee=self.employee)
+        yesterday_menu = Menu.objects.create(restaurant=Restaurant.objects.first(), items='Soup',
+                                             date=self.today - timedelta(days=1))
+        for top_menus, error in [
+            ([{'menu_id': self.menu_ids[0], 'points': 4}], 'Points must be 1, 2, or 3.'),
+            ([{'menu_id': self.menu_ids[0], 'points': 1}, {'menu_id': self.menu_ids[1], 'points': 1}],
+             'Points must be unique for each menu.'),
+            ([{'menu_id': 0, 'points': 1}], 'Menu with ID 0 not found.'),
+            ([{'menu_id': self.menu_ids[0], 'points': 1}, {'menu_id': yesterday_menu.id, 'points': 2}],
+             'The menus of a ballot must be of the same day.'),
+            ([{'menu_id': yesterday_menu.id, 'points': 1}], f"The menus must be of the ballot's day, {self.today}."),
+        ]:
+            response = self.client.put(reverse('vote-detail', args=[ballot.id]), {'top_menus': top_menus},
+                                       format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertEqual(response.data, {'top_menus': [error]})
+
+    def test_convert_to_ballots(self):
+        employee2 = Employee.objects.get(user__username='employee2')
+        menus = list(Menu.objects.filter(date=self.today).order_by('id')[:3])
+        owner = create_user_with_group('rest_owner4', self.test_password, GROUP_NAMES['RESTAURANT_OWNER'])
+        restaurant = Restaurant.objects.create(name='Fourth Restaurant', owner=owner)
+        menus.append(Menu.objects.create(restaurant=restaurant, date=self.today, items='Soup'))
+        Vote.objects.bulk_create(
+            [Vote(employee=self.employee, menu=menu, points=1, date=self.today) for menu in menus]
+            + [Vote(employee=employee2, menu=menus[2], points=1, date=self.today)]
+        )
+        out = StringIO()
+        call_command('convert_vote_storage', '--to', 'ballots', '--date', self.today.isoformat(), stdout=out)
+        self.assertIn('Stored 2 ballots.', out.getvalue())
+        self.assertIn('1 votes were left out', out.getvalue())
+        ballot = Ballot.objects.get(employee=self.employee, date=self.today)
+        self.assertEqual(ballot.choices(), [(menu.id, 1) for menu in menus[:3]])
@@ -0,0 +1,47 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.core.management import call_command
+from django.test import TestCase
+
+from api.benchmarking import ProcessSampler, compare, percentile
+
+
+class LunchRushCommandTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups', stdout=StringIO())
+        call_command('seed', stdout=StringIO())
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 50), 50)
+        self.assertEqual(percentile(values, 99), 99)
+        self.assertEqual(percentile([], 95), 0.0)
+
+    def test_process_sampler(self):
+        with ProcessSampler(os.getpid()) as sampler:
+            pass
+        summary = sampler.summary()
+        self.assertGreater(summary['peak_rss_mb'], 0)
+        self.assertGreaterEqual(summary['peak_threads'], 1)
+
+    def test_lunch_rush(self):
+        with tempfile.NamedTemporaryFile('r', suffix='.json') as output:
+            call_command('lunch_rush', '--employees', '3', '--concurrency', '1', '--random-seed', '1',
+                         '--output', output.name, stdout=StringIO())
+            result = json.load(output)
+
+        endpoints = result['endpoints']
+        self.assertEqual(endpoints['token']['requests'], 4)
+        self.assertEqual(endpoints['current-day-menu']['requests'], 9)
+        self.assertEqual(sum(stats['requests'] for name, stats in endpoints.items() if name.startswith('cast-vote')), 3)
+        self.assertTrue(all(stats['errors'] == 0 for stats in endpoints.values()))
+        self.assertEqual(set(endpoints['my-vote']), {
+            'requests', 'errors', 'statuses', 'throughput_rps', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms',
+            'queries_per_request',
+        })
+        self.assertIsNotNone(endpoints['all-votes-results']['queries_per_request'])
+        self.assertEqual(len(compare(result, result)), len(endpoints))
@@ -0,0 +1,97 @@
+import gzip
+import unittest
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncRequestFactory, RequestFactory, override_settings
+from django.urls import reverse
+
+from api import compression
+from api.compression import choose_encoding
+from api.middleware import CompressionMiddleware
+from api.utils import BaseTestCase
+
+GZIP = {'Accept-Encoding': 'gzip, deflate'}
+
+
+@override_settings(COMPRESSION={'MIN_SIZE': 100})
+class CompressionTestCase(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups', stdout=StringIO())
+        call_command('seed', stdout=StringIO())
+
+    def setUp(self):
+        super().setUp()
+        self.api_login('employee1', '123qwe!@#QWE')
+        self.factory = RequestFactory()
+
+    def test_choose_encoding(self):
+        cases = {
+            '': None,
+            'identity': None,
+            'gzip': 'gzip',
+            'gzip;q=0': None,
+            '*': compression.available_encodings()[0],
+            'br;q=0.5, gzip;q=0.8': 'gzip',
+        }
+        for header, expected in cases.items():
+            self.assertEqual(choose_encoding(self.factory.get('/', headers={'Accept-Encoding': header})), expected)
+        with mock.patch.object(compression, 'brotli', None):
+            self.assertEqual(choose_encoding(self.factory.get('/', headers={'Accept-Encoding': 'br, gzip'})), 'gzip')
+
+    def test_current_day_menu(self):
+        url = reverse('menu-current-day-menu')
+        plain = self.client.get(url)
+        self.assertNotIn('Content-Encoding', plain)
+
+        response = self.client.get(url, headers=GZIP)
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+        self.assertEqual(response['Content-Length'], str(len(response.content)))
+        self.assertIn('Accept-Encoding', response['Vary'])
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+
+        # Both validators revalidate, each answered with itself
+        response = self.client.get(url, headers={**GZIP, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], plain['ETag'][:-1] + '-gzip"')
+        response = self.client.get(url, headers={'If-None-Match': plain['ETag']})
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], plain['ETag'])
+
+    def test_cached_payload_is_compressed_once(self):
+        url = reverse('menu-current-day-menu')
+        with mock.patch.object(compression, 'compress', wraps=compression.compress) as compress:
+            first = self.client.get(url, headers=GZIP)
+            second = self.client.get(url, headers=GZIP)
+        self.assertEqual(compress.call_count, 1)
+        self.assertEqual(first.content, second.content)
+
+    def test_skipped_responses(self):
+        # Below the threshold
+        response = self.client.get(reverse('vote-my-vote'), headers=GZIP)
+        self.assertNotIn('Content-Encoding', response)
+
+        for response in [StreamingHttpResponse(iter(['data: {}\n\n'] * 100), content_type='text/event-stream'),
+                         HttpResponse('x' * 1000, headers={'Cache-Control': 'no-transform'})]:
+            middleware = CompressionMiddleware(lambda request: response)
+            self.assertNotIn('Content-Encoding', middleware(self.factory.get('/', headers=GZIP)))
+
+    @unittest.skipIf(compression.brotli is None, 'brotli is not installed')
+    def test_brotli(self):
+        url = reverse('menu-current-day-menu')
+        plain = self.client.get(url)
+        response = self.client.get(url, headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(compression.brotli.decompress(response.content), plain.content)
+
+    async def test_async_middleware(self):
+        async def view(request):
+            return HttpResponse(b'{"items": "' + b'Soup, ' * 100 + b'"}', content_type='application/json')
+
+        response = await CompressionMiddleware(view)(AsyncRequestFactory().get('/', headers=GZIP))
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertTrue(gzip.decompress(response.content).startswith(b'{"items": "Soup'))
@@ -1,10 +1,18 @@
+import tempfile
+from io import StringIO
+from pathlib import Path
+
+from django.contrib.auth.hashers import check_password
 from django.contrib.auth.models import User
 from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from rest_framework import status
 from django.urls import reverse
 
 from api.constants import GROUP_NAMES
 from api.models import Employee
+from api.onboarding import hash_passwords
 from api.utils import BaseTestCase, create_user_with_group
 
 
@@ -14,6 +22,7 @@ class EmployeeViewSetTestCase(BaseTestCase):
         call_command('init_groups')
 
     def setUp(self):
+        super().setUp()
         self.test_password = '123qwe!@#QWE'
         # Create a user and authenticate them
         create_user_with_group(username='testuser', password=self.test_password, group_name=GROUP_NAMES['ADMIN'])
@@ -31,6 +40,16 @@ class EmployeeViewSetTestCase(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_list_employees_query_budget(self):
+        def add_employees():
+            for index in range(3):
+                user = User.objects.create_user(username=f'employee{index + 5}', password=self.test_password)
+                Employee.objects.create(user=user, phone="1234567890", position="Developer")
+
+        # Auth (user, permissions come from the cache) and the employees joined with their users
+        response = self.assert_query_budget(reverse('employee-list'), 2, add_employees)
+        self.assertEqual(len(response.data), 4)
+
     def test_create_employee(self):
         url = reverse('employee-list')
         user_data = {
@@ -65,4 +84,66 @@ class EmployeeViewSetTestCase(BaseTestCase):
         url = reverse('employee-detail', args=[self.employee.id])
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(Employee.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(Employee.objects.count(), 0)
+
+    def import_rows(self, count, start=0):
+        return [
+            {'username': f'import{index}', 'password': self.test_password, 'email': f'import{index}@example.com',
+             'phone': '0987654321', 'position': 'Developer'}
+            for index in range(start, start + count)
+        ]
+
+    def test_import_employees(self):
+        rows = [
+            *self.import_rows(2),
+            {'user': {'username': 'nested', 'password': self.test_password}, 'phone': '0987654321', 'position': 'QA'},
+            {**self.import_rows(1)[0], 'email': 'other@example.com'},
+            {**self.import_rows(1, start=5)[0], 'username': 'employee4'},
+            {**self.import_rows(1, start=6)[0], 'password': 'short'},
+        ]
+        response = self.client.post(reverse('employee-import-employees'), rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['created'], 3)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'created', 'created', 'invalid', 'invalid', 'invalid'])
+        self.assertIn('username', response.data['results'][3]['errors'])
+        self.assertEqual(response.data['results'][4]['errors']['username'], ['This username is already taken.'])
+        self.assertIn('password', response.data['results'][5]['errors'])
+
+        employee = Employee.objects.select_related('user').get(id=response.data['results'][2]['id'])
+        self.assertEqual((employee.user.username, employee.position), ('nested', 'QA'))
+        self.assertTrue(employee.user.check_password(self.test_password))
+        self.assertTrue(employee.user.groups.filter(name=GROUP_NAMES['EMPLOYEE']).exists())
+
+    def test_import_employees_query_count(self):
+        url = reverse('employee-import-employees')
+        # With the permissions of the user cached
+        self.client.post(url, self.import_rows(1, start=100), format='json')
+        counts = []
+        for start, count in [(0, 2), (10, 20)]:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.post(url, self.import_rows(count, start), format='json')
+            counts.append(len(queries))
+        self.assertEqual(counts[0], counts[1])
+
+    def test_import_employees_command(self):
+        header = 'username,password,email,first_name,last_name,phone,position\n'
+        lines = [f'csv{index},{self.test_password},csv{index}@example.com,Ada,Lovelace,0987654321,Dev\n'
+                 for index in range(3)]
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'employees.csv'
+            path.write_text(header + ''.join(lines) + lines[0])
+            out = StringIO()
+            call_command('import_employees', str(path), '--workers', '1', stdout=out)
+        self.assertIn('Imported 3 employees', out.getvalue())
+        self.assertIn('Row 4: invalid', out.getvalue())
+        self.assertEqual(User.objects.get(username='csv1').last_name, 'Lovelace')
+
+        csv = header + 'csv9,' + self.test_password + ',csv9@example.com,,,0987654321,Dev\n'
+        response = self.client.post(reverse('employee-import-employees'), csv, content_type='text/csv')
+        self.assertEqual(response.data['created'], 1)
+
+    def test_hash_passwords_in_processes(self):
+        passwords = [f'{self.test_password}{index}' for index in range(8)]
+        hashes = hash_passwords(passwords, workers=2)
+        self.assertTrue(all(check_password(password, encoded) for password, encoded in zip(passwords, hashes)))
@@ -18,6 +18,7 @@ class MenuViewSetTestCase(BaseTestCase):
         call_command('seed')
 
     def setUp(self):
+        super().setUp()
         self.admin_password = 'adminpassword'
         self.test_password = '123qwe!@#QWE'
         # Authenticate admin User
@@ -84,6 +85,37 @@ class MenuViewSetTestCase(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 3)
 #
+    def test_current_day_menu_etag(self):
+        self.api_login('employee1', self.test_password)
+
+        url = reverse('menu-current-day-menu')
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(etag.startswith('"'))
+
+        # Served from the cache without touching the menus or the permissions
+        with self.assertNumQueries(1):
+            response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+
+        response = self.client.get(url, headers={'If-None-Match': '"stale"'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 3)
+
+    def test_current_day_menu_invalidated_on_menu_write(self):
+        self.api_login('employee1', self.test_password)
+        url = reverse('menu-current-day-menu')
+        etag = self.client.get(url)['ETag']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Menu.objects.filter(date=timezone.now().date()).first().delete()
+        response = self.client.get(url, headers={'If-None-Match': etag})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data), 2)
+        self.assertNotEqual(response['ETag'], etag)
+
     def test_current_day_menu_no_menu(self):
         Menu.objects.all().delete()  # Remove all menus
         url = reverse('menu-current-day-menu')
@@ -91,6 +123,15 @@ class MenuViewSetTestCase(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
         self.assertEqual(response.data['message'], 'No menus available for today.')
 
+    def test_list_menus_query_budget(self):
+        def add_menus():
+            for days in range(2, 5):
+                Menu.objects.create(restaurant=self.restaurant, date=timezone.now().date() - timedelta(days=days), items='Old Menu')
+
+        # Auth and the menus joined with their restaurants and owners
+        response = self.assert_query_budget(reverse('menu-list'), 2, add_menus)
+        self.assertEqual(len(response.data), 7)
+
     def test_retrieve_menu(self):
         url = reverse('menu-detail', args=[self.menu.id])
         response = self.client.get(url)
@@ -112,3 +153,65 @@ class MenuViewSetTestCase(BaseTestCase):
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
         self.assertEqual(Menu.objects.count(), 3)
+
+    def upload_menus(self, data, upsert=False, **kwargs):
+        self.api_login('rest_owner2', self.test_password)
+        url = reverse('menu-upload-menus') + ('?upsert=true' if upsert else '')
+        return self.client.post(url, data, **kwargs)
+
+    def test_upload_menus(self):
+        today = timezone.now().date()
+        data = [{'date': today + timedelta(days=offset), 'items': f'Menu {offset}'} for offset in range(1, 8)]
+        self.api_login('rest_owner2', self.test_password)
+        # Auth (user, 2x permissions), restaurant, existing menus, insert and the savepoint around it
+        with self.assertNumQueries(8):
+            response = self.client.post(reverse('menu-upload-menus'), data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([result['status'] for result in response.data['results']], ['created'] * 7)
+        restaurant = Restaurant.objects.get(owner__username='rest_owner2')
+        menu = Menu.objects.get(restaurant=restaurant, date=today + timedelta(days=3))
+        self.assertEqual((menu.items, response.data['results'][2]['id']), ('Menu 3', menu.id))
+
+    def test_upload_menus_rejects_whole_batch(self):
+        today = timezone.now().date()
+        data = [
+            {'date': today + timedelta(days=1), 'items': 'Soup'},
+            {'date': today, 'items': 'Taken'},
+            {'date': today + timedelta(days=1), 'items': 'Twice'},
+            {'date': 'not a date', 'items': 'Broken'},
+        ]
+        response = self.upload_menus(data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'exists', 'duplicate', 'invalid'])
+        self.assertFalse(Menu.objects.filter(date=today + timedelta(days=1)).exists())
+
+    def test_upload_menus_upsert(self):
+        today = timezone.now().date()
+        menu = Menu.objects.get(restaurant__owner__username='rest_owner2', date=today)
+        self.client.get(reverse('menu-current-day-menu'))
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.upload_menus([{'date': today, 'items': 'Replaced'}], upsert=True, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data['results'][0]['status'], 'updated')
+        menu.refresh_from_db()
+        self.assertEqual(menu.items, 'Replaced')
+        # The cached current-day-menu payload is rebuilt
+        self.api_login('admin', self.admin_password)
+        response = self.client.get(reverse('menu-current-day-menu'))
+        self.assertIn('Replaced', [item['items'] for item in response.data])
+
+    def test_upload_menus_ndjson_and_csv(self):
+        today = timezone.now().date()
+        days = [today + timedelta(days=offset) for offset in range(1, 5)]
+        ndjson = '\n'.join(f'{{"date": "{day}", "items": "Pho"}}' for day in days[:2]) + '\n'
+        response = self.upload_menus(ndjson, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        csv = 'date,items\n' + ''.join(f'{day},"Rice, beans"\n' for day in days[2:])
+        response = self.upload_menus(csv, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Menu.objects.get(restaurant__owner__username='rest_owner2', date=days[3]).items, 'Rice, beans')
+
+        response = self.upload_menus('{"date": \n', content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,63 @@
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.test import override_settings
+from django.urls import reverse
+
+from api.metrics import registry
+from api.utils import BaseTestCase
+
+
+class PerformanceMetricsTestCase(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups')
+        call_command('seed')
+
+    def setUp(self):
+        super().setUp()
+        registry.reset()
+        self.api_login('employee1', '123qwe!@#QWE')
+
+    def test_metrics_per_view_action(self):
+        self.client.get(reverse('menu-current-day-menu'))
+
+        self.client.force_login(User.objects.get(username='admin'))
+        response = self.client.get(reverse('metrics'))
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        metrics = response.content.decode()
+        self.assertIn('api_responses_total{view="MenuViewSet.current_day_menu",status="200"} 1', metrics)
+        self.assertIn('api_request_duration_seconds_count{view="MenuViewSet.current_day_menu"} 1', metrics)
+        self.assertIn('api_request_db_queries_bucket{view="MenuViewSet.current_day_menu",le="+Inf"} 1', metrics)
+        self.assertIn('api_request_serializer_seconds_count{view="MenuViewSet.current_day_menu"} 1', metrics)
+        self.assertIn('api_response_size_bytes_sum{view="MenuViewSet.current_day_menu"}', metrics)
+        # Token obtain pair view is a plain APIView
+        self.assertIn('view="TokenObtainPairView.post"', metrics)
+
+    @override_settings(PERFORMANCE_METRICS={'SLOW_REQUEST_MS': 0})
+    def test_slow_request_log_includes_sql(self):
+        with self.assertLogs('api.performance', level='WARNING') as logs:
+            self.client.get(reverse('vote-my-vote'))
+        self.assertIn('VoteViewSet.my_vote', logs.output[0])
+        self.assertIn('SELECT', logs.output[0])
+
+    @override_settings(PERFORMANCE_METRICS={'SLOW_REQUEST_MS': 0})
+    def test_slow_request_log_omits_params(self):
+        self.client.credentials()
+        with self.assertLogs('api.performance', level='WARNING') as logs:
+            self.client.post(reverse('token_obtain_pair'), {'username': 'employee1', 'password': '123qwe!@#QWE'})
+        self.assertIn('auth_user', logs.output[0])
+        self.assertNotIn('employee1', logs.output[0])
+        self.assertNotIn('params', logs.output[0])
+
+    def test_metrics_closed_by_default(self):
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        self.client.force_login(User.objects.get(username='employee1'))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+
+    @override_settings(PERFORMANCE_METRICS={'TOKEN': 'scrape-secret'})
+    def test_metrics_token(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), headers={'Authorization': 'Bearer scrape-secret'})
+        self.assertEqual(response.status_code, 200)
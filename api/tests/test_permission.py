@@ -1,8 +1,15 @@
+import time
+from unittest import mock
+
+from django.contrib.auth.models import Group, Permission, User
 from django.core.management import call_command
 from rest_framework.exceptions import ErrorDetail
 from rest_framework import status
 from django.urls import reverse
 
+from api.constants import GROUP_NAMES
+from api.models import PermissionVersion
+from api.permission_cache import VERSION_TIMEOUT, PERMISSIONS_SCOPE
 from api.utils import BaseTestCase
 
 
@@ -13,6 +20,7 @@ class PermissionTestCase(BaseTestCase):
         call_command('seed')
 
     def setUp(self):
+        super().setUp()
         self.test_password = '123qwe!@#QWE'
         self.admin_passwor = 'adminpassword'
     def test_employee_permission(self):
@@ -62,4 +70,47 @@ class PermissionTestCase(BaseTestCase):
         url = reverse('vote-all-votes-results')
         response = self.client.get(url)
         self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
-        self.assertEqual(response.data, {'detail': ErrorDetail(string='You do not have permission to perform this action.', code='permission_denied')})
\ No newline at end of file
+        self.assertEqual(response.data, {'detail': ErrorDetail(string='You do not have permission to perform this action.', code='permission_denied')})
+
+    def test_permissions_cached_across_requests(self):
+        self.api_login('employee1', self.test_password)
+        url = reverse('vote-my-vote')
+        # User, then its user and group permissions on the first check
+        with self.assertNumQueries(5):
+            self.client.get(url)
+        # Only the user and the votes afterwards
+        with self.assertNumQueries(3):
+            self.client.get(url)
+
+    def test_permission_cache_invalidated_by_group_changes(self):
+        self.api_login('employee1', self.test_password)
+        url = reverse('vote-my-vote')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        employee_group = Group.objects.get(name=GROUP_NAMES['EMPLOYEE'])
+        with self.captureOnCommitCallbacks(execute=True):
+            employee_group.permissions.remove(Permission.objects.get(codename='get_my_vote'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            employee_group.permissions.add(Permission.objects.get(codename='get_my_vote'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            User.objects.get(username='employee1').groups.remove(employee_group)
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_permission_versions_expire(self):
+        self.api_login('employee1', self.test_password)
+        url = reverse('vote-my-vote')
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+
+        # Revoked in another worker, whose bump only reached its own process-local cache
+        employee_group = Group.objects.get(name=GROUP_NAMES['EMPLOYEE'])
+        employee_group.permissions.remove(Permission.objects.get(codename='get_my_vote'))
+        self.assertEqual(self.client.get(url).status_code, status.HTTP_200_OK)
+        self.assertTrue(PermissionVersion.objects.filter(scope=PERMISSIONS_SCOPE).exists())
+
+        later = time.time() + VERSION_TIMEOUT + 1
+        with mock.patch('django.core.cache.backends.locmem.time.time', return_value=later):
+            self.assertEqual(self.client.get(url).status_code, status.HTTP_403_FORBIDDEN)
@@ -0,0 +1,112 @@
+import asyncio
+import gc
+import json
+import socket
+import tempfile
+import threading
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils import timezone
+
+from api.models import Menu
+from api.realtime import UnixSocketBroker, broadcaster
+from api.utils import BaseTestCase
+
+
+def parse_event(chunk: bytes) -> tuple[str, dict]:
+    lines = dict(line.split(': ', 1) for line in chunk.decode().strip().splitlines())
+    return lines['event'], json.loads(lines['data'])
+
+
+class ResultsStreamTestCase(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups')
+        call_command('seed')
+
+    def setUp(self):
+        super().setUp()
+        self.test_password = '123qwe!@#QWE'
+        self.url = reverse('vote-results-stream')
+
+    def cast_vote(self, username, menu_id):
+        self.api_login(username, self.test_password)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('vote-cast-vote'), {'menu_id': menu_id}, format='json')
+        self.assertEqual(response.status_code, 201)
+
+    async def test_requires_results_permission(self):
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response.status_code, 401)
+
+        token = await sync_to_async(self.get_jwt_token)('employee1', self.test_password)
+        response = await self.async_client.get(self.url, headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 403)
+
+    def test_not_served_over_wsgi(self):
+        self.api_login('admin', 'adminpassword')
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 501)
+
+    async def test_snapshot_then_deltas(self):
+        menu_ids = await sync_to_async(list)(
+            Menu.objects.filter(date=timezone.now().date()).order_by('id').values_list('id', flat=True)
+        )
+        await sync_to_async(self.cast_vote)('employee1', menu_ids[0])
+
+        token = await sync_to_async(self.get_jwt_token)('admin', 'adminpassword')
+        response = await self.async_client.get(self.url, headers={'Authorization': f'Bearer {token}'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = response.streaming_content.__aiter__()
+
+        event, data = parse_event(await events.__anext__())
+        self.assertEqual(event, 'snapshot')
+        self.assertEqual(data['menus'], [
+            {'menu_id': menu_ids[0], 'points': 1, 'vote_count': 1, 'histogram': {'1': 1, '2': 0, '3': 0}},
+        ])
+
+        await sync_to_async(self.cast_vote)('employee2', menu_ids[1])
+        event, data = parse_event(await asyncio.wait_for(events.__anext__(), 5))
+        self.assertEqual(event, 'delta')
+        self.assertEqual(data['menus'], [
+            {'menu_id': menu_ids[1], 'points': 1, 'vote_count': 1, 'histogram': {'1': 1, '2': 0, '3': 0}},
+        ])
+
+        # Closing the response, as the ASGI handler does when the client leaves, drops the subscription
+        await events.aclose()
+        del events, response
+        gc.collect()
+        for _ in range(10):
+            await asyncio.sleep(0)
+        self.assertEqual(broadcaster.subscriptions, set())
+
+
+class UnixSocketBrokerTestCase(BaseTestCase):
+    def test_publish_reaches_every_worker(self):
+        with tempfile.TemporaryDirectory() as directory:
+            received = []
+            done = threading.Event()
+
+            def deliver(event):
+                received.append(event)
+                if len(received) == 2:
+                    done.set()
+
+            workers = [UnixSocketBroker(directory, deliver) for _ in range(2)]
+            for worker in workers:
+                worker.start()
+            # A socket left behind by a worker that is gone
+            stale = Path(directory) / 'gone.sock'
+            with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as gone:
+                gone.bind(str(stale))
+
+            UnixSocketBroker(directory, deliver).publish({'type': 'delta', 'date': '2026-10-18', 'menus': []})
+            self.assertTrue(done.wait(5))
+            self.assertEqual(received, [{'type': 'delta', 'date': '2026-10-18', 'menus': []}] * 2)
+            self.assertFalse(stale.exists())
+            for worker in workers:
+                worker.stop()
@@ -0,0 +1,140 @@
+import io
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+
+import msgpack
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from api.models import Employee, Menu, Vote
+from api.parsers import MessagePackParser, ORJSONParser
+from api.renderers import MessagePackRenderer, ORJSONRenderer
+from api.serializers.menu_serializers import MenuSerializer
+from api.tallies import record_votes
+from api.utils import BaseTestCase
+from api.results import results_payload, results_tallies, results_votes
+
+MSGPACK_V2 = {'Accept': 'application/msgpack; version=v2'}
+
+
+class ORJSONTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups', stdout=StringIO())
+        call_command('seed', stdout=StringIO())
+
+    def assert_same_rendering(self, data):
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+    def test_api_payloads(self):
+        today = timezone.now().date()
+        menus = list(Menu.objects.filter(date=today).order_by('id'))
+        votes = [
+            Vote.objects.create(employee=employee, menu=menu, points=1)
+            for employee, menu in zip(Employee.objects.order_by('id'), menus)
+        ]
+        record_votes(votes)
+
+        self.assert_same_rendering(MenuSerializer(Menu.objects.filter(date=today), many=True).data)
+        # Keyed by menu id, with integer histogram keys
+        self.assert_same_rendering(results_payload(list(results_tallies(today)), list(results_votes(today))))
+
+    def test_types(self):
+        self.assert_same_rendering({
+            'created_at': datetime(2024, 5, 1, 12, 30, 15, 123456, tzinfo=dt_timezone.utc),
+            'local': datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone(timedelta(hours=2))),
+            'naive': datetime(2024, 5, 1, 12, 30),
+            'date': date(2024, 5, 1),
+            'price': Decimal('12.50'),
+            'duration': timedelta(minutes=90),
+            'id': uuid.UUID(int=1),
+            'message': gettext_lazy('No votes have been cast for today'),
+            'error': ErrorDetail('Invalid menu', code='invalid'),
+            'items': 'Soup\u2028Salad\u2029',
+            'menus': Menu.objects.values_list('id', flat=True),
+        })
+        self.assertEqual(ORJSONRenderer().render(None), b'')
+
+    def test_indent_falls_back(self):
+        data = {'menu_id': 1, 'points': 3}
+        self.assertEqual(
+            ORJSONRenderer().render(data, 'application/json; indent=4'),
+            JSONRenderer().render(data, 'application/json; indent=4'),
+        )
+
+    def test_parser(self):
+        body = '{"menu_id": 1, "items": "Pho, Bánh mì", "votes": [{"menu_id": 2, "points": 3}]}'.encode()
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO(body)), JSONParser().parse(io.BytesIO(body))
+        )
+        self.assertEqual(
+            ORJSONParser().parse(io.BytesIO('{"items": "Café"}'.encode('latin-1')), parser_context={'encoding': 'latin-1'}),
+            {'items': 'Café'},
+        )
+        for invalid in [b'{"menu_id": ', b'{"points": NaN}']:
+            with self.assertRaisesMessage(ParseError, 'JSON parse error'):
+                ORJSONParser().parse(io.BytesIO(invalid))
+
+    def test_bench_json(self):
+        out = StringIO()
+        call_command('bench_json', '--repeat', '2', stdout=out)
+        self.assertIn('all-votes-results   orjson', out.getvalue())
+
+
+class MessagePackTestCase(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups', stdout=StringIO())
+        call_command('seed', stdout=StringIO())
+
+    def setUp(self):
+        super().setUp()
+        self.api_login('employee1', '123qwe!@#QWE')
+
+    def test_renderer_and_parser(self):
+        data = {'created_at': datetime(2024, 5, 1, 12, 30, tzinfo=dt_timezone.utc), 'price': Decimal('1.5'),
+                'histogram': {1: 0, 2: 1, 3: 0}, 'message': gettext_lazy('Vote cast successfully')}
+        self.assertEqual(msgpack.unpackb(MessagePackRenderer().render(data), strict_map_key=False), {
+            'created_at': '2024-05-01T12:30:00Z', 'price': 1.5, 'histogram': {1: 0, 2: 1, 3: 0},
+            'message': 'Vote cast successfully',
+        })
+        self.assertEqual(MessagePackParser().parse(io.BytesIO(msgpack.packb({'menu_id': 1}))), {'menu_id': 1})
+        for invalid in [b'\x82\xa7menu_id', msgpack.packb({1: 'integer key'})]:
+            with self.assertRaisesMessage(ParseError, 'MessagePack parse error'):
+                MessagePackParser().parse(io.BytesIO(invalid))
+
+    def test_current_day_menu(self):
+        url = reverse('menu-current-day-menu')
+        json_response = self.client.get(url)
+        response = self.client.get(url, headers=MSGPACK_V2)
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), json_response.json())
+        self.assertIn('Accept', response['Vary'])
+        # Each representation has its own validator
+        self.assertEqual(response['ETag'], json_response['ETag'][:-1] + '-msgpack"')
+        response = self.client.get(url, headers={**MSGPACK_V2, 'If-None-Match': response['ETag']})
+        self.assertEqual(response.status_code, 304)
+        response = self.client.get(url, headers={**MSGPACK_V2, 'If-None-Match': json_response['ETag']})
+        self.assertEqual(response.status_code, 200)
+
+    def test_cast_vote_v2(self):
+        menu_ids = list(Menu.objects.filter(date=timezone.now().date()).values_list('id', flat=True)[:3])
+        body = {'top_menus': [{'menu_id': menu_id, 'points': points} for menu_id, points in zip(menu_ids, [3, 2, 1])]}
+        response = self.client.post(reverse('vote-cast-vote'), msgpack.packb(body), content_type='application/msgpack',
+                                    headers=MSGPACK_V2)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(msgpack.unpackb(response.content), {'message': 'Vote cast successfully'})
+        self.assertEqual(Vote.objects.filter(menu_id__in=menu_ids).count(), 3)
+
+        response = self.client.post(reverse('vote-cast-vote'), b'\xc1', content_type='application/msgpack',
+                                    headers=MSGPACK_V2)
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('MessagePack parse error', msgpack.unpackb(response.content)['detail'])
@@ -0,0 +1,121 @@
+import tempfile
+from datetime import timedelta
+from pathlib import Path
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.http import HttpResponse
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from api.db_routers import PrimaryReplicaRouter, primary, reads_from_primary
+from api.middleware import ReplicaRoutingMiddleware
+from api.models import DailyRollup, DailyTally, Menu, Vote
+from api.utils import BaseTestCase
+
+
+def replicate():
+    """Copy the primary's rows to the replica test database, which otherwise lags behind it forever."""
+    with tempfile.TemporaryDirectory() as directory:
+        fixture = str(Path(directory) / 'replica.json')
+        call_command('dumpdata', 'auth.group', 'auth.user', 'api', natural_foreign=True, output=fixture, verbosity=0)
+        call_command('loaddata', fixture, database='replica', verbosity=0)
+
+
+@override_settings(DATABASE_REPLICAS=['replica'], REPLICA_PIN_SECONDS=5)
+class ReplicaRoutingTestCase(BaseTestCase):
+    databases = {'default', 'replica'}
+
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups')
+        call_command('seed')
+        replicate()
+
+    def setUp(self):
+        super().setUp()
+        self.test_password = '123qwe!@#QWE'
+        self.menu = Menu.objects.filter(date=timezone.now().date()).order_by('id').first()
+
+    def test_router(self):
+        router = PrimaryReplicaRouter()
+        # Outside of a request every read sees the primary
+        self.assertEqual(router.db_for_read(Vote), 'default')
+        token = reads_from_primary.set(False)
+        try:
+            self.assertEqual(router.db_for_read(Vote), 'replica')
+            with primary():
+                self.assertEqual(router.db_for_read(Vote), 'default')
+            self.assertEqual(router.db_for_write(Vote), 'default')
+        finally:
+            reads_from_primary.reset(token)
+        with override_settings(DATABASE_REPLICAS=[]):
+            self.assertEqual(router.db_for_read(Vote), 'default')
+
+    def test_reads_follow_own_writes(self):
+        self.api_login('employee1', self.test_password)
+        response = self.client.post(reverse('vote-cast-vote'), {'menu_id': self.menu.id}, format='json')
+        self.assertEqual(response.status_code, 201)
+        self.assertFalse(Vote.objects.using('replica').exists())
+
+        # The voter is pinned to the primary and sees the vote the replica has not received yet
+        response = self.client.get(reverse('vote-my-vote'))
+        self.assertEqual(response.data, [{'menu_id': self.menu.id, 'points': 1}])
+
+        # Everyone else reads the replica
+        self.api_login('employee2', self.test_password)
+        response = self.client.get(reverse('vote-my-vote'))
+        self.assertEqual(response.data, {'message': 'No vote found for today'})
+
+    def test_pin_expires(self):
+        self.api_login('employee1', self.test_password)
+        with override_settings(REPLICA_PIN_SECONDS=0):
+            self.client.post(reverse('vote-cast-vote'), {'menu_id': self.menu.id}, format='json')
+        self.assertTrue(Vote.objects.exists())
+        response = self.client.get(reverse('vote-my-vote'))
+        self.assertEqual(response.data, {'message': 'No vote found for today'})
+
+    def test_failed_write_does_not_pin(self):
+        self.api_login('employee1', self.test_password)
+        response = self.client.post(reverse('vote-cast-vote'), {'menu_id': 0}, format='json')
+        self.assertGreaterEqual(response.status_code, 400)
+        with self.assertNumQueries(0, using='default'):
+            self.client.get(reverse('vote-my-vote'))
+
+    def test_cached_payloads_are_built_from_the_primary(self):
+        Menu.objects.filter(pk=self.menu.pk).update(items='Only on the primary')
+        self.api_login('employee1', self.test_password)
+        response = self.client.get(reverse('menu-current-day-menu'))
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Only on the primary', [menu['items'] for menu in response.data])
+
+    def test_days_closed_from_the_primary(self):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        menu = Menu.objects.create(restaurant=self.menu.restaurant, date=yesterday, items='Soup')
+        DailyTally.objects.create(date=yesterday, menu=menu, points=1, vote_count=1, one_point_votes=1)
+        replicate()
+        # A correction the replica has not received yet
+        DailyTally.objects.filter(menu=menu).update(points=50)
+
+        self.api_login('admin', 'adminpassword')
+        response = self.client.get(reverse('vote-results') + f'?date={yesterday}')
+        self.assertEqual(response.data['results'][0]['points'], 50)
+        self.assertEqual(DailyRollup.objects.get(date=yesterday).points, 50)
+
+    async def test_async_middleware(self):
+        seen = []
+
+        async def view(request):
+            seen.append(reads_from_primary.get())
+            return HttpResponse(status=201 if request.method == 'POST' else 200)
+
+        middleware = ReplicaRoutingMiddleware(view)
+        token = await sync_to_async(self.get_jwt_token)('employee1', self.test_password)
+        factory = AsyncRequestFactory()
+        headers = {'Authorization': f'Bearer {token}'}
+        for request in [factory.get('/', headers=headers), factory.post('/', headers=headers),
+                        factory.get('/', headers=headers)]:
+            await middleware(request)
+        self.assertEqual(seen, [False, True, True])
+        self.assertTrue(reads_from_primary.get())
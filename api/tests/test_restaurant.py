@@ -13,6 +13,7 @@ class RestaurantViewSetTestCase(BaseTestCase):
         call_command('init_groups')
 
     def setUp(self):
+        super().setUp()
         self.test_password = 'password'
         # Create a user and authenticate them
         create_user_with_group(username='testuser', password=self.test_password, group_name=GROUP_NAMES['ADMIN'])
@@ -28,6 +29,16 @@ class RestaurantViewSetTestCase(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(Restaurant.objects.count(), 1)
 
+    def test_list_restaurants_query_budget(self):
+        def add_restaurants():
+            for index in range(3):
+                owner = create_user_with_group(username=f'rest_owner{index + 5}', password=self.test_password, group_name=GROUP_NAMES['RESTAURANT_OWNER'])
+                Restaurant.objects.create(name=f'Restaurant {index}', owner=owner)
+
+        # Auth (user, permissions come from the cache) and the restaurants joined with their owners
+        response = self.assert_query_budget(reverse('restaurant-list'), 2, add_restaurants)
+        self.assertEqual(len(response.data), 4)
+
     def test_create_restaurant(self):
         rest_owner = create_user_with_group(username='rest_owner2', password=self.test_password, group_name=GROUP_NAMES['RESTAURANT_OWNER'])
         url = reverse('restaurant-list')
@@ -0,0 +1,40 @@
+from io import StringIO
+
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Count, Sum
+from django.test import TestCase
+
+from api.models import DailyTally, Employee, Menu, Restaurant, Vote
+from api.tallies import verify_tallies
+
+
+class SeedCommandTestCase(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups', stdout=StringIO())
+
+    def test_seed_defaults(self):
+        call_command('seed', stdout=StringIO())
+        self.assertEqual(Employee.objects.count(), 3)
+        self.assertEqual(Restaurant.objects.count(), 3)
+        self.assertEqual(Menu.objects.count(), 3)
+        self.assertEqual(Vote.objects.count(), 0)
+        self.assertTrue(User.objects.get(username='employee1').check_password('123qwe!@#QWE'))
+
+    def test_seed_load_testing_data(self):
+        out = StringIO()
+        call_command('seed', '--employees', '20', '--restaurants', '5', '--days', '4', '--vote-rate', '1',
+                     '--chunk-size', '7', '--random-seed', '1', stdout=out)
+        self.assertEqual(Employee.objects.count(), 20)
+        self.assertEqual(Restaurant.objects.count(), 5)
+        self.assertEqual(Menu.objects.count(), 20)
+        self.assertTrue(User.objects.get(username='rest_owner5').groups.exists())
+        self.assertIn('rows/s', out.getvalue())
+
+        # Every employee casts one ballot a day: 1 point (v1) or 3, 2 and 1 points (v2)
+        ballots = Vote.objects.values('employee_id', 'date').annotate(points=Sum('points'), votes=Count('id'))
+        self.assertEqual(len(ballots), 80)
+        self.assertTrue(all((ballot['votes'], ballot['points']) in [(1, 1), (3, 6)] for ballot in ballots))
+        self.assertEqual(DailyTally.objects.count(), Vote.objects.values('menu_id').distinct().count())
+        self.assertEqual(verify_tallies(), [])
@@ -0,0 +1,168 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from asgiref.sync import sync_to_async
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import AsyncRequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework import status
+
+from api.models import DailyResultSnapshot, DailyRollup, DailyTally, Employee, Menu, Vote
+from api.tallies import verify_tallies
+from api.utils import BaseTestCase
+from api.views import async_views
+
+# Already past, whatever the time of the test run
+CLOSED = {'DEADLINE': '00:00', 'FREEZE_ON_READ': True}
+V2 = {'Accept': 'application/json; version=v2'}
+
+
+class ResultSnapshotTestCase(BaseTestCase):
+    @classmethod
+    def setUpTestData(cls):
+        call_command('init_groups')
+        call_command('seed')
+
+    def setUp(self):
+        super().setUp()
+        self.test_password = '123qwe!@#QWE'
+        self.today = timezone.now().date()
+        self.menu_ids = list(Menu.objects.filter(date=self.today).order_by('id').values_list('id', flat=True)[:3])
+
+    def cast_votes(self):
+        """Menus 0 and 1 tie with 5 points, menu 2 gets 2."""
+        for username, points in [('employee1', [3, 2, 1]), ('employee2', [2, 3, 1])]:
+            self.api_login(username, self.test_password)
+            top_menus = [{'menu_id': menu_id, 'points': menu_points}
+                         for menu_id, menu_points in zip(self.menu_ids, points)]
+            self.client.post(reverse('vote-cast-vote'), {'top_menus': top_menus}, format='json', headers=V2)
+
+    def test_cast_vote_rejected_after_deadline(self):
+        self.api_login('employee1', self.test_password)
+        with self.settings(VOTING=CLOSED):
+            response = self.client.post(reverse('vote-cast-vote'), {'menu_id': self.menu_ids[0]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'error': 'Voting for today closed at 00:00.'})
+        response = self.client.post(reverse('vote-cast-vote'), {'menu_id': self.menu_ids[0]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+    def test_deadline_checked_in_cast_transaction(self):
+        self.api_login('employee1', self.test_password)
+        # The deadline passes between the view's check and the insert
+        with mock.patch('api.views.vote_views.check_votes_open'), self.settings(VOTING=CLOSED):
+            response = self.client.post(reverse('vote-cast-vote'), {'menu_id': self.menu_ids[0]}, format='json')
+        self.assertEqual(response.data, {'error': 'Voting for today closed at 00:00.'})
+        self.assertFalse(Vote.objects.exists())
+
+    def test_vote_writes_rejected_after_deadline(self):
+        self.cast_votes()
+        vote = Vote.objects.filter(menu_id=self.menu_ids[0]).first()
+        employee3 = Employee.objects.get(user__username='employee3')
+        tallies = list(DailyTally.objects.order_by('menu_id').values_list('menu_id', 'points'))
+        self.api_login('admin', 'adminpassword')
+        closed = {'error': 'Voting for today closed at 00:00.'}
+        with self.settings(VOTING=CLOSED):
+            response = self.client.post(reverse('vote-list'), {
+                'employee': employee3.id, 'menu': self.menu_ids[0], 'points': 1
+            }, format='json')
+            self.assertEqual((response.status_code, response.data), (status.HTTP_400_BAD_REQUEST, closed))
+            response = self.client.patch(reverse('vote-detail', args=[vote.id]), {'points': 2}, format='json')
+            self.assertEqual(response.data, closed)
+            response = self.client.delete(reverse('vote-detail', args=[vote.id]))
+            self.assertEqual(response.data, closed)
+            self.assertEqual(Vote.objects.count(), 6)
+
+            # A deleted employee's votes stay in the closed day's results
+            live = self.client.get(reverse('vote-all-votes-results')).content
+            DailyResultSnapshot.objects.all().delete()
+            with self.captureOnCommitCallbacks(execute=True):
+                self.client.delete(reverse('employee-detail', args=[vote.employee_id]))
+            self.assertEqual(Vote.objects.count(), 3)
+            self.assertEqual(self.client.get(reverse('vote-all-votes-results')).content, live)
+        self.assertEqual(list(DailyTally.objects.order_by('menu_id').values_list('menu_id', 'points')), tallies)
+
+    def test_frozen_past_day_writes_rejected(self):
+        yesterday = self.today - timedelta(days=1)
+        menu = Menu.objects.filter(date=self.today).first()
+        old_menu = Menu.objects.create(restaurant=menu.restaurant, date=yesterday, items='Soup')
+        employee = Employee.objects.get(user__username='employee1')
+        self.api_login('admin', 'adminpassword')
+        response = self.client.post(reverse('vote-list'), {'employee': employee.id, 'menu': old_menu.id, 'points': 1},
+                                    format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+
+        # Without a deadline past days stay open to corrections until frozen
+        call_command('freeze_results', '--date', yesterday.isoformat(), stdout=StringIO())
+        response = self.client.delete(reverse('vote-detail', args=[response.data['id']]))
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data, {'error': f'Voting for {yesterday} is closed, its results are final.'})
+        self.assertEqual(verify_tallies([yesterday]), [])
+
+    def test_results_frozen_on_first_read(self):
+        self.cast_votes()
+        self.api_login('admin', 'adminpassword')
+        msgpack = {'Accept': 'application/msgpack'}
+        live = self.client.get(reverse('vote-all-votes-results'))
+        live_msgpack = self.client.get(reverse('vote-all-votes-results'), headers=msgpack)
+        self.assertNotIn('ETag', live)
+
+        with self.settings(VOTING=CLOSED), self.captureOnCommitCallbacks(execute=True):
+            response = self.client.get(reverse('vote-all-votes-results'))
+        self.assertEqual(response.content, live.content)
+        self.assertEqual(response['Content-Type'], live['Content-Type'])
+        with self.settings(VOTING=CLOSED):
+            self.assertEqual(self.client.get(reverse('vote-all-votes-results'), headers=msgpack).content,
+                             live_msgpack.content)
+        snapshot = DailyResultSnapshot.objects.get(date=self.today)
+        self.assertEqual(response['ETag'], snapshot.etag)
+        self.assertEqual((snapshot.winner_id, snapshot.vote_count), (self.menu_ids[0], 6))
+        self.assertEqual(snapshot.tie_break['tied_menu_ids'], self.menu_ids[:2])
+        self.assertEqual(snapshot.tie_break['decided_by'], 'menu_id')
+        self.assertEqual(snapshot.ranking[1]['histogram'], {1: 0, 2: 1, 3: 1})
+
+        # Later changes to the tallies do not reach the frozen results
+        DailyTally.objects.filter(menu_id=self.menu_ids[1]).update(points=50)
+        with self.settings(VOTING=CLOSED):
+            self.assertEqual(self.client.get(reverse('vote-all-votes-results')).content, live.content)
+            response = self.client.get(reverse('vote-all-votes-results'), headers={'If-None-Match': snapshot.etag})
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        with self.assertRaises(ValueError):
+            snapshot.save()
+
+    def test_freeze_results_command(self):
+        self.cast_votes()
+        with self.assertRaises(CommandError):
+            call_command('freeze_results', stdout=StringIO())
+
+        self.api_login('admin', 'adminpassword')
+        with self.settings(VOTING={**CLOSED, 'FREEZE_ON_READ': False}):
+            # Live until the snapshot exists
+            self.client.get(reverse('vote-all-votes-results'))
+            self.assertFalse(DailyResultSnapshot.objects.exists())
+
+            out = StringIO()
+            with self.captureOnCommitCallbacks(execute=True):
+                call_command('freeze_results', stdout=out)
+            self.assertIn(f'menu {self.menu_ids[0]} won with 5 points (menu_id decided), 6 votes.', out.getvalue())
+            snapshot = DailyResultSnapshot.objects.get(date=self.today)
+            self.assertEqual(self.client.get(reverse('vote-all-votes-results'))['ETag'], snapshot.etag)
+
+            # The voting day is over for the rollups too
+            response = self.client.get(reverse('vote-results'))
+            self.assertTrue(response.data['closed'])
+            self.assertEqual(DailyRollup.objects.filter(date=self.today).count(), 3)
+
+    async def test_async_view_reads_snapshot(self):
+        await sync_to_async(self.cast_votes)()
+        token = await sync_to_async(self.get_jwt_token)('admin', 'adminpassword')
+        await sync_to_async(self.api_login)('admin', 'adminpassword')
+        with override_settings(VOTING=CLOSED):
+            expected = await sync_to_async(self.client.get)(reverse('vote-all-votes-results'))
+            request = AsyncRequestFactory().get(reverse('vote-all-votes-results'),
+                                                headers={'Authorization': f'Bearer {token}'})
+            response = await async_views.all_votes_results(request)
+        self.assertEqual(response.content, expected.content)
+        self.assertEqual(response['ETag'], expected['ETag'])
@@ -1,16 +1,29 @@
+import csv
+import json
+import unittest
 from datetime import timedelta
+from io import StringIO
+from unittest import mock
 
+from asgiref.sync import sync_to_async
 from django.contrib.auth.models import User
 from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import override_settings
 from rest_framework.exceptions import ErrorDetail
 from rest_framework import status
 from django.urls import reverse
 from django.utils import timezone
 
+from api import analytics
 from api.constants import GROUP_NAMES
-from api.models import Menu, Restaurant, Vote, Employee
+from api.models import DailyRollup, DailyTally, Menu, Restaurant, Vote, Employee
+from api.tallies import rebuild_tallies
+from api.vote_storage import convert_to_ballots
 from api.utils import BaseTestCase, create_user_with_group
 
+V2 = {'Accept': 'application/json; version=v2'}
+
 
 class VoteViewSetTestCase(BaseTestCase):
     @classmethod
@@ -19,6 +32,7 @@ class VoteViewSetTestCase(BaseTestCase):
         call_command('seed')
 
     def setUp(self):
+        super().setUp()
         self.admin_username = 'admin'
         self.admin_passord = 'adminpassword'
         self.test_password = '123qwe!@#QWE'
@@ -90,6 +104,22 @@ class VoteViewSetTestCase(BaseTestCase):
         response = self.client.post(url, data, format='json', headers=headers)
         self.assertEqual(response.status_code, status.HTTP_201_CREATED)
 
+    def test_cast_vote_v2_round_trips(self):
+        menu_ids = list(Menu.objects.filter(date=timezone.now().date()).values_list('id', flat=True)[:3])
+        url = reverse('vote-cast-vote')
+        data = {'top_menus': [{'menu_id': menu_id, 'points': points} for menu_id, points in zip(menu_ids, [3, 2, 1])]}
+        headers = {"Accept": "application/json; version=v2"}
+        # The first ballot of the day creates the tallies
+        self.client.post(url, data, format='json', headers=headers)
+
+        self.api_login('employee2', self.test_password)
+        # Auth (user, 2x permissions), employee, menus, insert, tally insert-if-missing and update, and the
+        # savepoint around them
+        with self.assertNumQueries(10):
+            response = self.client.post(url, data, format='json', headers=headers)
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Vote.objects.filter(menu_id__in=menu_ids).count(), 6)
+
     def test_cast_vote_v2_validation_top_menus(self):
         url = reverse('vote-cast-vote')
         data = {
@@ -199,6 +229,13 @@ class VoteViewSetTestCase(BaseTestCase):
         self.assertIn('menu_id', response.data[0])
         self.assertIn('points', response.data[0])
 
+    def test_vote_date_copied_from_menu(self):
+        self.client.post(reverse('vote-cast-vote'), {'menu_id': self.menu.id}, format='json')
+        self.assertEqual(Vote.objects.get(employee=self.employee, menu=self.menu).date, self.menu.date)
+        self.assertEqual(self.vote.date, timezone.now().date() - timedelta(days=1))
+
+        call_command('explain_vote_queries', stdout=StringIO())
+
     def test_my_vote_no_vote_found(self):
         url = reverse('vote-my-vote')
         response = self.client.get(url)
@@ -222,6 +259,59 @@ class VoteViewSetTestCase(BaseTestCase):
         self.assertIn('points', response.data[self.menu.id])
         self.assertIn('votes', response.data[self.menu.id])
 
+    def test_all_votes_results_from_tallies(self):
+        menu1 = Menu.objects.get(restaurant__owner__username='rest_owner1')
+        menu2 = Menu.objects.get(restaurant__owner__username='rest_owner2')
+        menu3 = Menu.objects.get(restaurant__owner__username='rest_owner3')
+        url = reverse('vote-cast-vote')
+        self.client.post(url, {'menu_id': menu1.id}, format='json')
+        self.api_login('employee2', self.test_password)
+        data = {
+            'top_menus': [
+                {'menu_id': menu1.id, 'points': 3},
+                {'menu_id': menu2.id, 'points': 2},
+                {'menu_id': menu3.id, 'points': 1}
+            ]
+        }
+        headers = {"Accept": "application/json; version=v2"}
+        self.client.post(url, data, format='json', headers=headers)
+
+        tally = DailyTally.objects.get(menu=menu1)
+        self.assertEqual((tally.points, tally.vote_count), (4, 2))
+        self.assertEqual(tally.histogram, {1: 1, 2: 0, 3: 1})
+
+        self.api_login(self.admin_username, self.admin_passord)
+        response = self.client.get(reverse('vote-all-votes-results'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(list(response.data), [menu1.id, menu2.id, menu3.id])
+        self.assertEqual(response.data[menu1.id]['points'], 4)
+        self.assertEqual(response.data[menu1.id]['vote_count'], 2)
+        self.assertEqual(len(response.data[menu1.id]['votes']), 2)
+
+    def test_delete_vote_updates_tally(self):
+        url = reverse('vote-cast-vote')
+        self.client.post(url, {'menu_id': self.menu.id}, format='json')
+        vote = Vote.objects.get(employee=self.employee, menu=self.menu)
+
+        self.api_login(self.admin_username, self.admin_passord)
+        self.client.delete(reverse('vote-detail', args=[vote.id]))
+        tally = DailyTally.objects.get(menu=self.menu)
+        self.assertEqual((tally.points, tally.vote_count), (0, 0))
+
+        response = self.client.get(reverse('vote-all-votes-results'))
+        self.assertEqual(response.data, {'message': 'No votes have been cast for today'})
+
+    def test_rebuild_tallies_command(self):
+        Vote.objects.create(employee=self.employee, menu=self.menu, points=2)
+        with self.assertRaises(CommandError):
+            call_command('rebuild_tallies', '--verify')
+
+        call_command('rebuild_tallies')
+        call_command('rebuild_tallies', '--verify')
+        tally = DailyTally.objects.get(menu=self.menu)
+        self.assertEqual(tally.points, 2)
+        self.assertEqual(tally.histogram, {1: 0, 2: 1, 3: 0})
+
     def test_all_votes_results_no_votes_found(self):
         self.api_login(self.admin_username, self.admin_passord)
         url = reverse('vote-all-votes-results')
@@ -236,6 +326,48 @@ class VoteViewSetTestCase(BaseTestCase):
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(len(response.data), 1)
 
+    def test_list_votes_query_budget(self):
+        self.api_login(self.admin_username, self.admin_passord)
+
+        def add_votes():
+            for employee in Employee.objects.exclude(id=self.employee.id):
+                Vote.objects.create(employee=employee, menu=self.menu, points=1)
+
+        # Auth and the votes joined with their employee, menu, restaurant and users
+        response = self.assert_query_budget(reverse('vote-list'), 2, add_votes)
+        self.assertEqual(len(response.data), 3)
+
+    def test_list_votes_cursor_pagination(self):
+        self.api_login(self.admin_username, self.admin_passord)
+        for employee in Employee.objects.exclude(id=self.employee.id):
+            Vote.objects.create(employee=employee, menu=self.menu, points=1)
+        # Rows sharing a timestamp are told apart by their id
+        Vote.objects.exclude(id=self.vote.id).update(created_at=timezone.now())
+        expected = list(Vote.objects.order_by('-created_at', '-id').values_list('id', flat=True))
+
+        vote_ids = []
+        url = reverse('vote-list') + '?page_size=1'
+        while url:
+            with self.assertNumQueries(2):
+                response = self.client.get(url, headers=V2)
+            self.assertEqual(set(response.data), {'next', 'previous', 'results'})
+            self.assertEqual(len(response.data['results']), 1)
+            vote_ids.append(response.data['results'][0]['id'])
+            previous, url = response.data['previous'], response.data['next']
+        # Newest first, every vote exactly once
+        self.assertEqual(vote_ids, expected)
+
+        # And back
+        vote_ids = []
+        while previous:
+            response = self.client.get(previous, headers=V2)
+            vote_ids.insert(0, response.data['results'][0]['id'])
+            previous = response.data['previous']
+        self.assertEqual(vote_ids, expected[:-1])
+
+        # v1 clients get the bare list
+        self.assertEqual(len(self.client.get(reverse('vote-list') + '?page_size=1').data), len(expected))
+
     def test_create_vote(self):
         self.api_login(self.admin_username, self.admin_passord)
         rest_owner = create_user_with_group(username='rest_owner5', password=self.test_password, group_name=GROUP_NAMES['RESTAURANT_OWNER'])
@@ -272,4 +404,173 @@ class VoteViewSetTestCase(BaseTestCase):
         url = reverse('vote-detail', args=[self.vote.id])
         response = self.client.delete(url)
         self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
-        self.assertEqual(Vote.objects.count(), 0)
\ No newline at end of file
+        self.assertEqual(Vote.objects.count(), 0)
+
+    def export_url(self, **params):
+        today = timezone.now().date()
+        params = {'from': today - timedelta(days=1), 'to': today, **params}
+        return reverse('vote-export') + '?' + '&'.join(f'{key}={value}' for key, value in params.items())
+
+    def test_export_votes_csv(self):
+        self.client.post(reverse('vote-cast-vote'), {'menu_id': self.menu.id}, format='json')
+        self.api_login(self.admin_username, self.admin_passord)
+        response = self.client.get(self.export_url())
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        self.assertIn('attachment; filename="votes-', response['Content-Disposition'])
+
+        rows = list(csv.DictReader(StringIO(b''.join(response.streaming_content).decode())))
+        self.assertEqual([row['menu_id'] for row in rows], [str(self.vote.menu_id), str(self.menu.id)])
+        self.assertEqual(rows[1]['username'], 'employee1')
+        self.assertEqual(rows[1]['restaurant'], 'Test Restaurant')
+        self.assertEqual(rows[1]['date'], timezone.now().date().isoformat())
+
+    def test_export_votes_ndjson_and_ballots(self):
+        menu_ids = list(Menu.objects.filter(date=timezone.now().date()).values_list('id', flat=True)[:3])
+        data = {'top_menus': [{'menu_id': menu_id, 'points': points} for menu_id, points in zip(menu_ids, [3, 2, 1])]}
+        headers = {'Accept': 'application/json; version=v2'}
+        self.client.post(reverse('vote-cast-vote'), data, format='json', headers=headers)
+        self.api_login(self.admin_username, self.admin_passord)
+
+        def export():
+            response = self.client.get(self.export_url(output='ndjson'))
+            self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+            lines = b''.join(response.streaming_content).decode().splitlines()
+            # The storages have their own cast times
+            return [{key: value for key, value in json.loads(line).items() if key != 'cast_at'} for line in lines]
+
+        rows = export()
+        self.assertEqual(len(rows), 4)
+        self.assertEqual(rows[1]['points'], 3)
+        convert_to_ballots()
+        with override_settings(VOTE_STORAGE='ballots'):
+            self.assertEqual(export(), rows)
+
+    def test_export_votes_validation(self):
+        self.api_login(self.admin_username, self.admin_passord)
+        for params in [{'output': 'xml'}, {'from': 'yesterday'}, {'from': '2026-02-02', 'to': '2026-02-01'}]:
+            self.assertEqual(self.client.get(self.export_url(**params)).status_code, status.HTTP_400_BAD_REQUEST)
+        self.api_login('employee1', self.test_password)
+        self.assertEqual(self.client.get(self.export_url()).status_code, status.HTTP_403_FORBIDDEN)
+
+    async def test_export_votes_asgi(self):
+        token = await sync_to_async(self.get_jwt_token)(self.admin_username, self.admin_passord)
+        response = await self.async_client.get(self.export_url(), headers={'Authorization': f'Bearer {token}'})
+        self.assertTrue(response.is_async)
+        content = b''.join([chunk async for chunk in response.streaming_content]).decode()
+        self.assertEqual(len(content.splitlines()), 2)
+
+    def test_results_of_day(self):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        rebuild_tallies([yesterday])
+        self.client.post(reverse('vote-cast-vote'), {'menu_id': self.menu.id}, format='json')
+        self.api_login(self.admin_username, self.admin_passord)
+
+        # The first read of a day that is over rolls it up
+        response = self.client.get(reverse('vote-results') + f'?date={yesterday}')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.data['closed'])
+        self.assertEqual(response.data['results'], [{
+            'rank': 1, 'restaurant_id': self.menu.restaurant_id, 'restaurant': 'Test Restaurant',
+            'menu_id': self.vote.menu_id, 'points': 1, 'vote_count': 1, 'histogram': {1: 1, 2: 0, 3: 0},
+        }])
+        self.assertEqual(DailyRollup.objects.filter(date=yesterday).count(), 1)
+        # Later reads are answered from the rollup
+        DailyTally.objects.filter(date=yesterday).update(points=10)
+        self.assertEqual(self.client.get(reverse('vote-results') + f'?date={yesterday}').data, response.data)
+
+        response = self.client.get(reverse('vote-results'))
+        self.assertFalse(response.data['closed'])
+        self.assertEqual(response.data['results'][0]['menu_id'], self.menu.id)
+        self.assertFalse(DailyRollup.objects.filter(date=timezone.now().date()).exists())
+        response = self.client.get(reverse('vote-results') + '?date=2020-01-01')
+        self.assertEqual(response.data, {'message': 'No votes were cast on 2020-01-01'})
+
+    def test_vote_writes_reclose_day(self):
+        yesterday = timezone.now().date() - timedelta(days=1)
+        rebuild_tallies([yesterday])
+        self.api_login(self.admin_username, self.admin_passord)
+        url = reverse('vote-results') + f'?date={yesterday}'
+        self.assertEqual(self.client.get(url).data['results'][0]['points'], 1)
+
+        # The rollups of a closed day follow the admin's corrections
+        self.client.patch(reverse('vote-detail', args=[self.vote.id]), {'points': 3}, format='json')
+        self.assertEqual(self.client.get(url).data['results'][0]['histogram'], {1: 0, 2: 0, 3: 1})
+        response = self.client.delete(reverse('vote-detail', args=[self.vote.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(self.client.get(url).data, {'message': f'No votes were cast on {yesterday}'})
+        self.assertFalse(DailyRollup.objects.filter(date=yesterday).exists())
+
+    def create_history(self):
+        """Tallies of four past days for two restaurants, A winning days 1, 2 and 4, B day 3."""
+        today = timezone.now().date()
+        restaurants = list(Restaurant.objects.order_by('id')[:2])
+        for offset, points in zip(range(4, 0, -1), [(5, 3), (4, 1), (2, 6), (3, 0)]):
+            day = today - timedelta(days=offset)
+            for restaurant, restaurant_points in zip(restaurants, points):
+                if restaurant_points:
+                    menu = Menu.objects.create(restaurant=restaurant, date=day, items='Soup')
+                    DailyTally.objects.create(menu=menu, date=day, points=restaurant_points, vote_count=1)
+        return restaurants
+
+    def test_results_range(self):
+        restaurant_a, restaurant_b = self.create_history()
+        today = timezone.now().date()
+        self.api_login(self.admin_username, self.admin_passord)
+        url = reverse('vote-results-range') + f'?from={today - timedelta(days=4)}&to={today}&window=2'
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['dates']), 4)
+        self.assertEqual([winner['restaurant_id'] for winner in response.data['winners']],
+                         [restaurant_a.id, restaurant_a.id, restaurant_b.id, restaurant_a.id])
+        first, second = response.data['restaurants']
+        self.assertEqual(first['restaurant_id'], restaurant_a.id)
+        self.assertEqual(first['points'], [5, 4, 2, 3])
+        self.assertEqual(first['moving_average'], [5.0, 4.5, 3.0, 2.5])
+        self.assertEqual((first['wins'], first['longest_win_streak'], first['current_win_streak']), (3, 2, 1))
+        self.assertEqual(second['points'], [3, 1, 6, 0])
+        self.assertEqual((second['wins'], second['longest_win_streak'], second['current_win_streak']), (1, 1, 0))
+        # One rollup row per restaurant and voting day
+        self.assertEqual(DailyRollup.objects.count(), 7)
+
+        with mock.patch.object(analytics, 'np', None):
+            self.assertEqual(self.client.get(url).data, response.data)
+
+    @unittest.skipIf(analytics.np is None, 'numpy is not installed')
+    def test_restaurant_series_numpy_matches_fallback(self):
+        today = timezone.now().date()
+        rows = [
+            (today - timedelta(days=day), restaurant_id, None, rank, (day * 7 + restaurant_id * 3) % 11, 1)
+            for day in range(40) for rank, restaurant_id in enumerate([day % 5, (day + 2) % 5, 7], start=1)
+        ]
+        for window in [1, 3, 7, 60]:
+            with mock.patch.object(analytics, 'np', None):
+                expected = analytics.restaurant_series(rows, window)
+            self.assertEqual(analytics.restaurant_series(rows, window), expected)
+
+    def test_results_range_validation(self):
+        self.api_login(self.admin_username, self.admin_passord)
+        for params in ['from=2026-02-02&to=2026-02-01', 'from=2024-01-01&to=2025-01-01', 'window=0', 'to=today']:
+            response = self.client.get(reverse('vote-results-range') + f'?{params}')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('message', self.client.get(reverse('vote-results-range')).data)
+        self.api_login('rest_owner1', self.test_password)
+        self.assertEqual(self.client.get(reverse('vote-results-range')).status_code, status.HTTP_403_FORBIDDEN)
+
+    def test_close_days_command(self):
+        self.create_history()
+        out = StringIO()
+        call_command('close_days', stdout=out)
+        self.assertIn('Rolled up 4 days', out.getvalue())
+        self.assertEqual(DailyRollup.objects.count(), 7)
+        call_command('close_days', stdout=out)
+        self.assertIn('Every day is rolled up.', out.getvalue())
+
+        # Again from the raw votes: the tallies above have none, the setUp vote of yesterday is the only one left
+        yesterday = timezone.now().date() - timedelta(days=1)
+        call_command('close_days', '--date', yesterday.isoformat(), '--rebuild-tallies', stdout=out)
+        self.assertEqual(list(DailyRollup.objects.filter(date=yesterday).values_list('menu_id', 'points')),
+                         [(self.vote.menu_id, 1)])
+        with self.assertRaises(CommandError):
+            call_command('close_days', '--date', timezone.now().date().isoformat(), stdout=out)
@@ -1,9 +1,13 @@
+from django.conf import settings
+from django.urls import path
 from rest_framework.routers import DefaultRouter
 
 from .views.restaurant_views import RestaurantViewSet
 from .views.menu_views import MenuViewSet
 from .views.employee_views import EmployeeViewSet
 from .views.vote_views import VoteViewSet
+from .views import async_views
+from .views.stream_views import results_stream
 
 router = DefaultRouter()
 router.register('restaurants', RestaurantViewSet)
@@ -11,4 +15,16 @@ router.register('menus', MenuViewSet)
 router.register('employees', EmployeeViewSet)
 router.register('votes', VoteViewSet)
 
-urlpatterns = router.urls
\ No newline at end of file
+# Async versions of the read-hot actions, served instead of the DRF ones by the ASGI profile
+async_urlpatterns = [
+    path('menus/current-day-menu/', async_views.current_day_menu),
+    path('votes/my-vote/', async_views.my_vote),
+    path('votes/all-votes-results/', async_views.all_votes_results),
+]
+
+urlpatterns = [
+    # Ahead of the router, which would take results-stream for a vote id
+    path('votes/results-stream/', results_stream, name='vote-results-stream'),
+    *(async_urlpatterns if settings.SERVING_PROFILE == 'asgi' else []),
+    *router.urls,
+]
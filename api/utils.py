@@ -1,4 +1,5 @@
 from django.contrib.auth.models import User, Group
+from django.core.cache import cache
 from django.urls import reverse
 from rest_framework.test import APITestCase
 
@@ -10,6 +11,23 @@ def create_user_with_group(username, password, group_name):
 
 
 class BaseTestCase(APITestCase):
+    def setUp(self):
+        # Cached payloads would outlive the rolled back test data
+        cache.clear()
+
+    def assert_query_budget(self, url, budget, add_rows):
+        """Assert that GET url runs `budget` queries, both before and after add_rows() creates more rows."""
+        # Budgets are for the steady state, with the permissions of the user cached
+        self.client.get(url)
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        add_rows()
+        with self.assertNumQueries(budget):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return response
+
     def get_jwt_token(self, username, password):
         url = reverse('token_obtain_pair')
         response = self.client.post(url, {'username': username, 'password': password}, format='json')
@@ -0,0 +1,136 @@
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions, status
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+
+from ..authentication import ClaimsJWTAuthentication, ClaimsTokenUser
+from ..cache import acached_payload, etag_matches, menus_scope, representation_etag
+from ..models import Menu
+from ..permissions import CanGetAllVotesResults, CanGetCurrentDayMenu, CanGetMyVote
+from ..serializers.menu_serializers import MenuSerializer
+from ..snapshots import afrozen_body
+from ..results import employee_votes_of_day, results_payload, results_tallies, results_votes, vote_rows
+
+
+def negotiate(request) -> Optional[HttpResponse]:
+    """Pick the renderer for the Accept header like DRF does, the browsable API aside, or answer 406."""
+    renderers = [renderer() for renderer in api_settings.DEFAULT_RENDERER_CLASSES if renderer.format != 'api']
+    try:
+        request.accepted_renderer, request.accepted_media_type = DefaultContentNegotiation().select_renderer(
+            Request(request), renderers
+        )
+    except exceptions.NotAcceptable as error:
+        return render(request, {'detail': error.detail}, status.HTTP_406_NOT_ACCEPTABLE)
+    return None
+
+
+def render(request, data, status_code: int = status.HTTP_200_OK, headers: Optional[dict] = None) -> HttpResponse:
+    """The body DRF's Response would render, for views that run outside of DRF."""
+    if data is None:
+        response = HttpResponse(status=status_code, headers=headers)
+        # Like DRF, no content type without a body
+        del response['Content-Type']
+        return response
+    # Until negotiated, and for the event stream, errors are JSON
+    renderer = getattr(request, 'accepted_renderer', None) or api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    content = renderer.render(data, getattr(request, 'accepted_media_type', None))
+    return HttpResponse(content, status=status_code, content_type=renderer.media_type, headers=headers)
+
+
+@sync_to_async
+def authorize(request, permission_class) -> Optional[HttpResponse]:
+    """Authenticate the JWT and check the permission the way the API views do, setting request.user."""
+    authentication = ClaimsJWTAuthentication()
+    try:
+        result = authentication.authenticate(request)
+    except exceptions.AuthenticationFailed as error:
+        result, detail = None, error.detail
+    else:
+        detail = exceptions.NotAuthenticated.default_detail
+    if result is None:
+        response = render(
+            request, detail if isinstance(detail, dict) else {'detail': detail}, status.HTTP_401_UNAUTHORIZED
+        )
+        response['WWW-Authenticate'] = authentication.authenticate_header(request)
+        return response
+
+    request.user = result[0]
+    if not permission_class().has_permission(request, None):
+        return render(request, {'detail': exceptions.PermissionDenied.default_detail}, status.HTTP_403_FORBIDDEN)
+    return None
+
+
+@require_GET
+async def current_day_menu(request):
+    """Async MenuViewSet.current_day_menu for the ASGI serving profile."""
+    error = negotiate(request) or await authorize(request, CanGetCurrentDayMenu)
+    if error is not None:
+        return error
+
+    today = timezone.now().date()
+
+    async def build():
+        menus = [menu async for menu in Menu.objects.filter(date=today).select_related('restaurant__owner')]
+        return MenuSerializer(menus, many=True).data
+
+    payload = await acached_payload(menus_scope(today), build)
+    if not payload.data:
+        return render(request, {'message': 'No menus available for today.'}, status.HTTP_404_NOT_FOUND)
+    etag = representation_etag(payload.etag, request)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept'}
+    if etag_matches(request, etag):
+        return render(request, None, status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return render(request, payload.data, headers=headers)
+
+
+@require_GET
+async def my_vote(request):
+    """Async VoteViewSet.my_vote for the ASGI serving profile."""
+    error = negotiate(request) or await authorize(request, CanGetMyVote)
+    if error is not None:
+        return error
+
+    user = request.user
+    # Stateless tokens name the employee, otherwise join through it
+    if isinstance(user, ClaimsTokenUser):
+        employee_filter = {'employee_id': user.token.get('employee_id')}
+    else:
+        employee_filter = {'employee__user_id': user.id}
+    votes = [vote async for vote in employee_votes_of_day(timezone.now().date(), **employee_filter)]
+
+    results = [{'menu_id': menu_id, 'points': points} for menu_id, _, points in vote_rows(votes)]
+    if results:
+        return render(request, results)
+    return render(request, {'message': 'No vote found for today'})
+
+
+@require_GET
+async def all_votes_results(request):
+    """Async VoteViewSet.all_votes_results for the ASGI serving profile."""
+    error = negotiate(request) or await authorize(request, CanGetAllVotesResults)
+    if error is not None:
+        return error
+
+    today = timezone.now().date()
+    frozen = await afrozen_body(today, request.accepted_renderer, request.accepted_media_type)
+    if frozen is not None:
+        if frozen.empty:
+            return render(request, {'message': 'No votes have been cast for today'})
+        etag = representation_etag(frozen.etag, request)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept'}
+        if etag_matches(request, etag):
+            return render(request, None, status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return HttpResponse(frozen.content, content_type=request.accepted_renderer.media_type, headers=headers)
+
+    tallies = [tally async for tally in results_tallies(today)]
+    if not tallies:
+        return render(request, {'message': 'No votes have been cast for today'})
+
+    votes = [vote async for vote in results_votes(today)]
+    return render(request, results_payload(tallies, vote_rows(votes)))
@@ -1,15 +1,28 @@
 from django.contrib.auth.models import Group
 from django.core.exceptions import ObjectDoesNotExist
+from django.db import transaction
+from django.utils import timezone
 from drf_yasg.utils import swagger_auto_schema
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 
 from ..constants import GROUP_NAMES
 from ..models import Employee
+from ..onboarding import import_employees
+from ..parsers import CSVParser, NDJSONParser
 from ..permissions import CanAddEmployee, CanChangeEmployee, CanViewEmployee, CanDeleteEmployee
 from ..serializers.employee_serializers import EmployeeSerializer, EmployeeUpdateSerializer
+from ..rollups import reclose_days
 from ..serializers.user_serializers import UserSerializer
+from ..snapshots import freeze_day, locked_days
+from ..tallies import retract_votes
+from ..vote_storage import employee_votes
+
+# Hashing takes a few hundred milliseconds per password and CPU, larger files go through `manage.py import_employees`
+MAX_IMPORT_EMPLOYEES = 200
 
 
 class EmployeeViewSet(viewsets.ModelViewSet):
@@ -22,9 +35,15 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             return EmployeeUpdateSerializer
         return super().get_serializer_class()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.select_related('user')
+        return queryset
+
     def get_permissions(self):
         self.permission_classes = [IsAuthenticated]
-        if self.action in ['create']:
+        if self.action in ['create', 'import_employees']:
             self.permission_classes.append(CanAddEmployee)
         elif self.action in ['update', 'partial_update']:
             self.permission_classes.append(CanChangeEmployee)
@@ -34,6 +53,18 @@ class EmployeeViewSet(viewsets.ModelViewSet):
             self.permission_classes.append(CanDeleteEmployee)
         return super().get_permissions()
 
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        # The employee's votes are removed by the cascade, take them out of the tallies first. The closed days keep
+        # their results, today's are frozen before the votes go if its deadline has passed.
+        votes = employee_votes(instance)
+        locked = locked_days({vote.date for vote in votes})
+        if timezone.now().date() in locked:
+            freeze_day(timezone.now().date())
+        retract_votes([vote for vote in votes if vote.date not in locked])
+        instance.delete()
+        reclose_days({vote.date for vote in votes} - locked)
+
     @swagger_auto_schema(operation_description="Create Employee.")
     def create(self, request, *args, **kwargs) -> Response:
         # Step 1: Create the user
@@ -66,3 +97,27 @@ class EmployeeViewSet(viewsets.ModelViewSet):
                 return Response(employee_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         else:
             return Response(user_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @swagger_auto_schema(
+        operation_description="Create many employees at once. The body is a list of employees as JSON or MessagePack "
+                              "(flat, or nested like Create Employee), NDJSON or CSV (a `username,password,email,"
+                              "first_name,last_name,phone,position` header row). Valid rows are created, the "
+                              "others reported."
+    )
+    @action(detail=False, methods=['post'], url_path='import',
+            parser_classes=[*api_settings.DEFAULT_PARSER_CLASSES, NDJSONParser, CSVParser])
+    def import_employees(self, request, *args, **kwargs) -> Response:
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Expected a non-empty list of employees.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > MAX_IMPORT_EMPLOYEES:
+            return Response({'error': f'At most {MAX_IMPORT_EMPLOYEES} employees can be imported at once.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            results = import_employees(rows)
+        except ObjectDoesNotExist:
+            return Response({'error': 'The Employee group does not exist. Please ensure the group is created before assigning users.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        created = sum(result['status'] == 'created' for result in results)
+        return Response({'created': created, 'results': results},
+                        status=status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST)
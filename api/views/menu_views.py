@@ -1,15 +1,23 @@
+from django.db import IntegrityError, transaction
 from django.utils import timezone
+from drf_yasg import openapi
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.settings import api_settings
 from drf_yasg.utils import swagger_auto_schema
 
+from ..cache import bump_version, cached_payload, etag_matches, menus_scope, representation_etag
 from ..models import Menu, Restaurant
+from ..parsers import CSVParser, NDJSONParser
 from ..permissions import CanAddMenu, CanChangeMenu, CanViewMenu, CanDeleteMenu, CanUploadMenu, CanGetCurrentDayMenu
 from ..serializers.menu_serializers import MenuSerializer, MenuCreateSerializer, MenuUpdateSerializer, \
     MenuUploadSerializer
 
+# A year of menus per upload
+MAX_UPLOAD_MENUS = 366
+
 
 class MenuViewSet(viewsets.ModelViewSet):
     queryset = Menu.objects.all()
@@ -21,10 +29,16 @@ class MenuViewSet(viewsets.ModelViewSet):
             return MenuCreateSerializer
         elif self.action in ['update', 'partial_update']:
             return MenuUpdateSerializer
-        if self.action == 'upload_menu':
+        if self.action in ['upload_menu', 'upload_menus']:
             return MenuUploadSerializer
         return super().get_serializer_class()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.select_related('restaurant__owner')
+        return queryset
+
     def get_permissions(self):
         self.permission_classes = [IsAuthenticated]
         if self.action in ['create']:
@@ -35,7 +49,7 @@ class MenuViewSet(viewsets.ModelViewSet):
             self.permission_classes.append(CanViewMenu)
         elif self.action in ['destroy']:
             self.permission_classes.append(CanDeleteMenu)
-        elif self.action in ['upload_menu']:
+        elif self.action in ['upload_menu', 'upload_menus']:
             self.permission_classes.append(CanUploadMenu)
         elif self.action in ['current_day_menu']:
             self.permission_classes.append(CanGetCurrentDayMenu)
@@ -56,26 +70,31 @@ class MenuViewSet(viewsets.ModelViewSet):
         else:
             return Response(menu_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    def owner_restaurant_id(self, request):
+        # Stateless tokens carry the restaurant of the owner
+        return getattr(request.user, 'restaurant_id', None) or (
+            Restaurant.objects.filter(owner_id=request.user.id).values_list('id', flat=True).first()
+        )
+
     @swagger_auto_schema(operation_description="Upload Menu for restaurant each day.")
     @action(detail=False, methods=['post'], url_path='upload-menu')
     def upload_menu(self, request, *args, **kwargs) -> Response:
         date = request.data.get('date', timezone.now().date())
         menu_serializer = MenuUploadSerializer(data=request.data)
         if menu_serializer.is_valid():
-            try:
-                restaurant = Restaurant.objects.get(owner_id=request.user.id)
-            except Restaurant.DoesNotExist:
+            restaurant_id = self.owner_restaurant_id(request)
+            if restaurant_id is None:
                 return Response(
                     {'error': 'User\'s Restaurant does not exist.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
-            if Menu.objects.filter(restaurant_id=restaurant.id, date=date).exists():
+            if Menu.objects.filter(restaurant_id=restaurant_id, date=date).exists():
                 return Response(
                     {'error': 'Menu for this restaurant already exists for the selected day.'},
                     status=status.HTTP_400_BAD_REQUEST
                 )
             else:
-                request.data['restaurant'] = restaurant.id
+                request.data['restaurant'] = restaurant_id
                 menu_upload_serializer = MenuCreateSerializer(data=request.data)
                 if menu_upload_serializer.is_valid():
                     menu_upload_serializer.save()
@@ -85,17 +104,100 @@ class MenuViewSet(viewsets.ModelViewSet):
         else:
             return Response(menu_serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @swagger_auto_schema(
+        operation_description="Upload the menus of several days for the restaurant at once. The body is a list of "
+                              "{date, items} as JSON or MessagePack, NDJSON (one object per line) or CSV (a `date,items` "
+                              "header row). Every menu is created, or none is.",
+        manual_parameters=[openapi.Parameter(
+            'upsert', openapi.IN_QUERY, type=openapi.TYPE_BOOLEAN,
+            description='Replace the items of menus that already exist instead of rejecting them.'
+        )],
+    )
+    @action(detail=False, methods=['post'], url_path='upload-menus',
+            parser_classes=[*api_settings.DEFAULT_PARSER_CLASSES, NDJSONParser, CSVParser])
+    def upload_menus(self, request, *args, **kwargs) -> Response:
+        rows = request.data
+        if not isinstance(rows, list) or not rows:
+            return Response({'error': 'Expected a non-empty list of menus.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(rows) > MAX_UPLOAD_MENUS:
+            return Response({'error': f'At most {MAX_UPLOAD_MENUS} menus can be uploaded at once.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        restaurant_id = self.owner_restaurant_id(request)
+        if restaurant_id is None:
+            return Response({'error': 'User\'s Restaurant does not exist.'}, status=status.HTTP_400_BAD_REQUEST)
+        upsert = request.query_params.get('upsert', '').lower() in ('1', 'true', 'yes')
+
+        # Validate row by row, so each row gets its own result
+        validated, errors = [], []
+        for row in rows:
+            row_serializer = MenuUploadSerializer(data=row)
+            row_serializer.is_valid()
+            validated.append(row_serializer.validated_data if not row_serializer.errors else None)
+            errors.append(row_serializer.errors)
+        today = timezone.now().date()
+        dates = [row.get('date', today) if row is not None else None for row in validated]
+
+        # Every date against the (restaurant, date) constraint in one query
+        existing = dict(
+            Menu.objects.filter(restaurant_id=restaurant_id, date__in={day for day in dates if day is not None})
+            .values_list('date', 'id')
+        )
+        results, seen = [], set()
+        for index, (day, row_errors) in enumerate(zip(dates, errors)):
+            if row_errors:
+                results.append({'row': index, 'status': 'invalid', 'errors': row_errors})
+            elif day in seen:
+                results.append({'row': index, 'date': day, 'status': 'duplicate',
+                                'errors': {'date': ['This date appears more than once in the upload.']}})
+            elif day in existing and not upsert:
+                results.append({'row': index, 'date': day, 'status': 'exists', 'id': existing[day],
+                                'errors': {'date': ['Menu for this restaurant already exists for the selected day.']}})
+            else:
+                results.append({'row': index, 'date': day, 'status': 'updated' if day in existing else 'created'})
+            seen.add(day)
+        if any('errors' in result for result in results):
+            return Response({'error': 'No menus were uploaded, see the rows with errors.', 'results': results},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        menus = [Menu(restaurant_id=restaurant_id, date=day, items=row['items']) for row, day in zip(validated, dates)]
+        try:
+            with transaction.atomic():
+                if upsert:
+                    Menu.objects.bulk_create(menus, update_conflicts=True, unique_fields=['restaurant', 'date'],
+                                             update_fields=['items', 'updated_at'])
+                else:
+                    Menu.objects.bulk_create(menus)
+                # bulk_create sends no post_save, invalidate the cached menus of every day here
+                for day in dates:
+                    bump_version(menus_scope(day))
+        except IntegrityError:
+            # A menu of one of the days was created since the check above
+            return Response(
+                {'error': 'Menu for this restaurant already exists for the selected day.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        for result, menu in zip(results, menus):
+            result['id'] = menu.id
+        return Response({'results': results}, status=status.HTTP_201_CREATED)
+
     @swagger_auto_schema(operation_description="Get the menu for the current day for all restaurants.")
     @action(detail=False, methods=['get'], url_path='current-day-menu')
     def current_day_menu(self, request) -> Response:
         today = timezone.now().date()
-        current_day_menus = Menu.objects.filter(date=today)
+        current_day_menus = Menu.objects.filter(date=today).select_related('restaurant__owner')
+        payload = cached_payload(
+            menus_scope(today),
+            lambda: MenuSerializer(current_day_menus, many=True).data
+        )
 
-        if not current_day_menus.exists():
+        if not payload.data:
             return Response(
                 {'message': 'No menus available for today.'},
                 status=status.HTTP_404_NOT_FOUND
             )
-        else:
-            serializer = MenuSerializer(current_day_menus, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+        # One payload, a JSON and a MessagePack representation of it
+        etag = representation_etag(payload.etag, request)
+        headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept'}
+        if etag_matches(request, etag):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+        return Response(payload.data, status=status.HTTP_200_OK, headers=headers)
@@ -23,6 +23,12 @@ class RestaurantViewSet(viewsets.ModelViewSet):
             return RestaurantUpdateSerializer
         return super().get_serializer_class()
 
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.select_related('owner')
+        return queryset
+
     def get_permissions(self):
         self.permission_classes = [IsAuthenticated]
         if self.action in ['create']:
@@ -0,0 +1,68 @@
+import asyncio
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.http import JsonResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_GET
+
+from ..models import DailyTally
+from ..permissions import CanGetAllVotesResults
+from ..realtime import broadcaster, format_event, realtime_settings
+from .async_views import authorize
+
+
+@sync_to_async
+def results_snapshot(day: date) -> dict:
+    tallies = DailyTally.objects.filter(date=day, vote_count__gt=0).order_by('-points', 'menu_id')
+    return {
+        'date': day.isoformat(),
+        'menus': [
+            {'menu_id': tally.menu_id, 'points': tally.points, 'vote_count': tally.vote_count,
+             'histogram': tally.histogram}
+            for tally in tallies
+        ],
+    }
+
+
+async def results_events(day: date):
+    """A snapshot of the day's tallies, then the deltas of every committed ballot, with heartbeats in between."""
+    heartbeat = realtime_settings()['HEARTBEAT_SECONDS']
+    # Subscribe before reading the snapshot, a ballot committed in between may be counted twice but is never missed
+    subscription = broadcaster.subscribe()
+    try:
+        yield format_event('snapshot', await results_snapshot(day))
+        while True:
+            try:
+                event = await asyncio.wait_for(subscription.get(), heartbeat)
+            except asyncio.TimeoutError:
+                if timezone.now().date() != day:
+                    # A new voting day, the client reconnects for its snapshot
+                    return
+                yield ': heartbeat\n\n'
+                continue
+            if event['type'] == 'resync':
+                yield format_event('snapshot', await results_snapshot(day))
+            elif event['date'] == day.isoformat():
+                yield format_event('delta', event)
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@require_GET
+async def results_stream(request):
+    """Server-Sent Events stream of today's vote results, pushed as ballots commit."""
+    if not isinstance(request, ASGIRequest):
+        # A WSGI worker would be held for the whole life of the stream
+        return JsonResponse({'error': 'The results stream is only served over ASGI.'}, status=501)
+
+    error = await authorize(request, CanGetAllVotesResults)
+    if error is not None:
+        return error
+
+    response = StreamingHttpResponse(results_events(timezone.now().date()), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Keep proxies from buffering the events
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -1,15 +1,81 @@
+from datetime import date, timedelta
+
+from django.core.handlers.asgi import ASGIRequest
+from django.db import transaction
+from django.http import HttpResponse, StreamingHttpResponse
 from django.utils import timezone
 from rest_framework import viewsets, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
+from drf_yasg import openapi
 from drf_yasg.utils import swagger_auto_schema
 
-from ..models import Vote
+from ..analytics import restaurant_series
+from ..cache import etag_matches, representation_etag
+from ..exports import EXPORT_FORMATS, aiterate, export_lines, vote_export_rows
+from ..models import Ballot, Restaurant, Vote
 from ..permissions import CanCastVote, CanGetMyVote, CanGetAllVotesResults, CanAddVote, CanChangeVote, CanViewVote, \
     CanDeleteVote
 from ..serializers.vote_serializers import VoteSerializer, VoteCreateSerializer, VoteUpdateSerializer, \
-    VoteCastSerializer
+    VoteCastSerializer, BallotSerializer, BallotCreateSerializer, BallotUpdateSerializer
+from ..rollups import ROLLUP_ROW_FIELDS, last_closed_day, reclose_days, rollup_rows
+from ..snapshots import check_votes_open, frozen_body
+from ..results import employee_votes_of_day, results_payload, results_tallies, results_votes, vote_rows
+from ..tallies import HISTOGRAM_FIELDS, record_votes, retract_votes
+from ..vote_storage import ballots_enabled
+
+
+MAX_RESULTS_RANGE_DAYS = 366
+DEFAULT_RESULTS_RANGE_DAYS = 30
+
+
+def query_date(request, name, default: date) -> date:
+    """A YYYY-MM-DD query parameter, ValueError if it is not one."""
+    value = request.query_params.get(name)
+    return date.fromisoformat(value) if value else default
+
+
+def day_results_payload(rows, names: dict[int, str]) -> list[dict]:
+    """The ranked restaurants of a day from its rollup_rows()."""
+    results = []
+    for row in rows:
+        rollup = dict(zip(ROLLUP_ROW_FIELDS, row))
+        results.append({
+            'rank': rollup['rank'],
+            'restaurant_id': rollup['restaurant_id'],
+            'restaurant': names.get(rollup['restaurant_id']),
+            'menu_id': rollup['menu_id'],
+            'points': rollup['points'],
+            'vote_count': rollup['vote_count'],
+            'histogram': {points: rollup[field] for points, field in HISTOGRAM_FIELDS.items()},
+        })
+    return results
+
+
+def restaurant_names(rows) -> dict[int, str]:
+    return dict(Restaurant.objects.filter(id__in={row[1] for row in rows}).values_list('id', 'name'))
+
+
+def frozen_results_response(request, frozen) -> HttpResponse:
+    """The all-votes-results of a day past its voting deadline, with the snapshot's ETag."""
+    if frozen.empty:
+        return Response({'message': 'No votes have been cast for today'}, status=200)
+    etag = representation_etag(frozen.etag, request)
+    headers = {'ETag': etag, 'Cache-Control': 'private, no-cache', 'Vary': 'Accept'}
+    if etag_matches(request, etag):
+        return Response(status=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    if frozen.content is None:
+        return Response(frozen.data, status=status.HTTP_200_OK, headers=headers)
+    # Rendered already, the way DRF would
+    renderer = request.accepted_renderer
+    content_type = f'{renderer.media_type}; charset={renderer.charset}' if renderer.charset else renderer.media_type
+    return HttpResponse(frozen.content, content_type=content_type, headers=headers)
+
+
+def stored_votes(instance) -> list[Vote]:
+    """The votes a stored Vote or Ballot stands for in the tallies."""
+    return instance.votes() if isinstance(instance, Ballot) else [instance]
 
 
 class VoteViewSet(viewsets.ModelViewSet):
@@ -18,7 +84,14 @@ class VoteViewSet(viewsets.ModelViewSet):
     permission_classes = [IsAuthenticated]
 
     def get_serializer_class(self):
-        if self.action == 'create':
+        # With ballot storage the Vote rows are no longer the cast votes, the admin endpoints work on the ballots
+        if ballots_enabled() and self.action in ['list', 'retrieve']:
+            return BallotSerializer
+        elif ballots_enabled() and self.action == 'create':
+            return BallotCreateSerializer
+        elif ballots_enabled() and self.action in ['update', 'partial_update']:
+            return BallotUpdateSerializer
+        elif self.action == 'create':
             return VoteCreateSerializer
         elif self.action in ['update', 'partial_update']:
             return VoteUpdateSerializer
@@ -26,13 +99,25 @@ class VoteViewSet(viewsets.ModelViewSet):
             return VoteCastSerializer
         return super().get_serializer_class()
 
+    def get_queryset(self):
+        if ballots_enabled():
+            queryset = Ballot.objects.all()
+            if self.action in ['list', 'retrieve']:
+                queryset = queryset.select_related('employee__user')
+            return queryset
+        queryset = super().get_queryset()
+        if self.action in ['list', 'retrieve']:
+            # VoteSerializer nests the employee's user and the menu's restaurant and owner
+            queryset = queryset.select_related('employee__user', 'menu__restaurant__owner')
+        return queryset
+
     def get_permissions(self):
         self.permission_classes = [IsAuthenticated]
         if self.action in ['create']:
             self.permission_classes.append(CanAddVote)
         elif self.action in ['update', 'partial_update']:
             self.permission_classes.append(CanChangeVote)
-        elif self.action in ['list', 'retrieve']:
+        elif self.action in ['list', 'retrieve', 'export']:
             self.permission_classes.append(CanViewVote)
         elif self.action in ['destroy']:
             self.permission_classes.append(CanDeleteVote)
@@ -40,13 +125,39 @@ class VoteViewSet(viewsets.ModelViewSet):
             self.permission_classes.append(CanCastVote)
         elif self.action in ['my_vote']:
             self.permission_classes.append(CanGetMyVote)
-        elif self.action in ['all_votes_results']:
+        elif self.action in ['all_votes_results', 'results', 'results_range']:
             self.permission_classes.append(CanGetAllVotesResults)
         return super().get_permissions()
 
+    # The admin writes are held to the voting deadline too, the results of a closed day no longer change
+
+    @transaction.atomic
+    def perform_create(self, serializer):
+        instance = serializer.save()
+        check_votes_open(instance.date)
+        record_votes(stored_votes(instance))
+        reclose_days([instance.date])
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        check_votes_open(serializer.instance.date)
+        retract_votes(stored_votes(serializer.instance))
+        instance = serializer.save()
+        record_votes(stored_votes(instance))
+        reclose_days([instance.date])
+
+    @transaction.atomic
+    def perform_destroy(self, instance):
+        check_votes_open(instance.date)
+        retract_votes(stored_votes(instance))
+        instance.delete()
+        reclose_days([instance.date])
+
     @swagger_auto_schema(operation_description="Cast vote to current day's menus.")
     @action(detail=False, methods=['post'], url_path='cast-vote')
     def cast_vote(self, request) -> Response:
+        # Checked again in the transaction that stores the votes
+        check_votes_open(timezone.now().date())
         serializer = VoteCastSerializer(data=request.data, context={'request': request})
 
         if serializer.is_valid():
@@ -63,10 +174,10 @@ class VoteViewSet(viewsets.ModelViewSet):
         today = timezone.now().date()
 
         # Filter votes for the current day
-        votes = Vote.objects.filter(employee=employee, menu__date=today)
+        votes = employee_votes_of_day(today, employee=employee)
 
-        if votes.exists():
-            results = [{'menu_id': vote.menu.id, 'points': vote.points} for vote in votes]
+        results = [{'menu_id': menu_id, 'points': points} for menu_id, _, points in vote_rows(votes)]
+        if results:
             return Response(results, status=200)
         else:
             return Response({'message': 'No vote found for today'}, status=200)
@@ -75,24 +186,126 @@ class VoteViewSet(viewsets.ModelViewSet):
     @action(detail=False, methods=['get'], url_path='all-votes-results')
     def all_votes_results(self, request) -> Response:
         today = timezone.now().date()
-        votes = Vote.objects.filter(menu__date=today)
+        frozen = frozen_body(today, request.accepted_renderer, request.accepted_media_type)
+        if frozen is not None:
+            return frozen_results_response(request, frozen)
+
+        tallies = results_tallies(today)
 
-        if not votes.exists():
+        if not tallies:
             return Response({'message': 'No votes have been cast for today'}, status=200)
 
-        results: dict[int, dict] = {}
-        for vote in votes:
-            menu_id: int = vote.menu.id
-            if menu_id not in results:
-                results[menu_id] = {
-                    'menu_id': menu_id,
-                    'points': 0,
-                    'votes': []
-                }
-            results[menu_id]['points'] += vote.points
-            results[menu_id]['votes'].append({
-                'employee_id': vote.employee.id,
-                'points': vote.points
-            })
-
-        return Response(results, status=200)
+        return Response(results_payload(tallies, vote_rows(results_votes(today))), status=200)
+
+    @swagger_auto_schema(
+        operation_description="Export the votes of a date range as CSV or NDJSON, streamed row by row.",
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE,
+                              description='First day (YYYY-MM-DD). Defaults to today.'),
+            openapi.Parameter('to', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE,
+                              description='Last day (YYYY-MM-DD), inclusive. Defaults to the first day.'),
+            openapi.Parameter('output', openapi.IN_QUERY, type=openapi.TYPE_STRING, enum=list(EXPORT_FORMATS),
+                              description='csv (default) or ndjson.'),
+        ],
+    )
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        output = request.query_params.get('output', 'csv')
+        if output not in EXPORT_FORMATS:
+            return Response({'error': f'output must be one of: {", ".join(EXPORT_FORMATS)}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start = query_date(request, 'from', timezone.now().date())
+            end = query_date(request, 'to', start)
+        except ValueError:
+            return Response({'error': 'from and to must be dates (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        if end < start:
+            return Response({'error': 'to must not be before from.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        lines = export_lines(vote_export_rows(start, end), output)
+        if isinstance(request._request, ASGIRequest):
+            lines = aiterate(lines)
+        response = StreamingHttpResponse(lines, content_type=EXPORT_FORMATS[output])
+        response['Content-Disposition'] = f'attachment; filename="votes-{start}-{end}.{output}"'
+        return response
+
+    @swagger_auto_schema(
+        operation_description="Get the ranked restaurants of a day, from its rollups once the day is over.",
+        manual_parameters=[
+            openapi.Parameter('date', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE,
+                              description='Day (YYYY-MM-DD). Defaults to today.'),
+        ],
+    )
+    @action(detail=False, methods=['get'], url_path='results')
+    def results(self, request) -> Response:
+        try:
+            day = query_date(request, 'date', timezone.now().date())
+        except ValueError:
+            return Response({'error': 'date must be a date (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = rollup_rows(day, day)
+        if not rows:
+            return Response({'message': f'No votes were cast on {day}'}, status=200)
+        return Response({
+            'date': day,
+            'closed': day <= last_closed_day(),
+            'results': day_results_payload(rows, restaurant_names(rows)),
+        }, status=200)
+
+    @swagger_auto_schema(
+        operation_description="Get the daily winners and per-restaurant trends (points, moving average, wins, win "
+                              "streaks) of a date range, from one rollup row per restaurant and day.",
+        manual_parameters=[
+            openapi.Parameter('from', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE,
+                              description=f'First day (YYYY-MM-DD). Defaults to {DEFAULT_RESULTS_RANGE_DAYS} days '
+                                          f'up to the last one.'),
+            openapi.Parameter('to', openapi.IN_QUERY, type=openapi.TYPE_STRING, format=openapi.FORMAT_DATE,
+                              description='Last day (YYYY-MM-DD), inclusive. Defaults to today.'),
+            openapi.Parameter('window', openapi.IN_QUERY, type=openapi.TYPE_INTEGER,
+                              description='Voting days of the moving average, 7 by default.'),
+        ],
+    )
+    @action(detail=False, methods=['get'], url_path='results/range')
+    def results_range(self, request) -> Response:
+        try:
+            end = query_date(request, 'to', timezone.now().date())
+            start = query_date(request, 'from', end - timedelta(days=DEFAULT_RESULTS_RANGE_DAYS - 1))
+        except ValueError:
+            return Response({'error': 'from and to must be dates (YYYY-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        if end < start:
+            return Response({'error': 'to must not be before from.'}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= MAX_RESULTS_RANGE_DAYS:
+            return Response({'error': f'The range can span at most {MAX_RESULTS_RANGE_DAYS} days.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            window = int(request.query_params.get('window', 7))
+        except ValueError:
+            window = 0
+        if not 1 <= window <= MAX_RESULTS_RANGE_DAYS:
+            return Response({'error': f'window must be a number of days from 1 to {MAX_RESULTS_RANGE_DAYS}.'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        rows = rollup_rows(start, end)
+        if not rows:
+            return Response({'message': f'No votes were cast from {start} to {end}'}, status=200)
+
+        names = restaurant_names(rows)
+        series = restaurant_series(rows, window)
+        restaurants = [
+            {'restaurant_id': restaurant_id, 'restaurant': names.get(restaurant_id), **values}
+            for restaurant_id, values in series['restaurants'].items()
+        ]
+        restaurants.sort(key=lambda restaurant: (-restaurant['total_points'], restaurant['restaurant_id']))
+        # rollup_rows() are ordered by date and rank, rank 1 is the day's winner
+        winners = [
+            {'date': day, 'restaurant_id': restaurant_id, 'restaurant': names.get(restaurant_id), 'points': points}
+            for day, restaurant_id, _, rank, points, *_ in rows if rank == 1
+        ]
+        return Response({
+            'from': start,
+            'to': end,
+            'window': window,
+            'dates': series['dates'],
+            'winners': winners,
+            'restaurants': restaurants,
+        }, status=200)
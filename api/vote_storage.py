@@ -0,0 +1,75 @@
+from datetime import date
+from itertools import groupby
+from typing import Iterable, Iterator, Optional
+
+from django.conf import settings
+from django.db import transaction
+
+from .models import Ballot, Employee, Vote
+
+# Ballot slots ranked in the order the menus were cast, one per menu of a v2 ballot
+MAX_BALLOT_MENUS = len(Ballot.SLOT_FIELDS)
+BALLOT_ROW_FIELDS = ['employee_id', 'menu_1', 'points_1', 'menu_2', 'points_2', 'menu_3', 'points_3']
+
+
+def ballots_enabled() -> bool:
+    """Whether cast votes are stored as one Ballot row per employee and day rather than a Vote row per menu."""
+    return getattr(settings, 'VOTE_STORAGE', 'votes') == 'ballots'
+
+
+def spread_ballots(rows: Iterable[tuple]) -> Iterator[tuple[int, int, int]]:
+    """The (menu_id, employee_id, points) rows of BALLOT_ROW_FIELDS rows, as the Vote table would return them."""
+    # Unrolled over the three slots, this runs for every ballot of the day
+    for employee_id, menu_1, points_1, menu_2, points_2, menu_3, points_3 in rows:
+        if menu_1 is not None:
+            yield menu_1, employee_id, points_1
+        if menu_2 is not None:
+            yield menu_2, employee_id, points_2
+        if menu_3 is not None:
+            yield menu_3, employee_id, points_3
+
+
+def employee_votes(employee: Employee) -> list[Vote]:
+    """The stored votes of the employee, e.g. to retract them from the tallies."""
+    if ballots_enabled():
+        return [vote for ballot in Ballot.objects.filter(employee=employee) for vote in ballot.votes()]
+    return list(Vote.objects.filter(employee=employee))
+
+
+def convert_to_ballots(dates: Optional[Iterable[date]] = None, batch_size: int = 1000) -> tuple[int, int]:
+    """
+    Replace the Ballot rows of the dates (all dates if None) with ones built from the Vote table. Returns the ballots
+    created and the votes left out, beyond the first three an employee cast on a day.
+    """
+    votes = Vote.objects.order_by('employee_id', 'date', 'id')
+    ballots = Ballot.objects.all()
+    if dates is not None:
+        dates = list(dates)
+        votes, ballots = votes.filter(date__in=dates), ballots.filter(date__in=dates)
+
+    created, dropped = [], 0
+    rows = votes.values_list('employee_id', 'date', 'menu_id', 'points').iterator(chunk_size=batch_size)
+    for (employee_id, day), group in groupby(rows, key=lambda row: row[:2]):
+        choices = [(menu_id, points) for _, _, menu_id, points in group]
+        dropped += max(len(choices) - MAX_BALLOT_MENUS, 0)
+        created.append(Ballot.from_choices(employee_id, day, choices[:MAX_BALLOT_MENUS]))
+
+    with transaction.atomic():
+        ballots.delete()
+        Ballot.objects.bulk_create(created, batch_size=batch_size)
+    return len(created), dropped
+
+
+def convert_to_votes(dates: Optional[Iterable[date]] = None, batch_size: int = 1000) -> int:
+    """Replace the Vote rows of the dates (all dates if None) with ones built from the Ballot table."""
+    votes = Vote.objects.all()
+    ballots = Ballot.objects.order_by('id')
+    if dates is not None:
+        dates = list(dates)
+        votes, ballots = votes.filter(date__in=dates), ballots.filter(date__in=dates)
+
+    created = [vote for ballot in ballots.iterator(chunk_size=batch_size) for vote in ballot.votes()]
+    with transaction.atomic():
+        votes.delete()
+        Vote.objects.bulk_create(created, batch_size=batch_size)
+    return len(created)
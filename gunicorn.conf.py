@@ -0,0 +1,53 @@
+"""
+Production launcher configuration: gunicorn -c gunicorn.conf.py
+
+Every value can be overridden from the environment (GUNICORN_*). SERVING_PROFILE=asgi runs the ASGI application in
+uvicorn workers instead of the threaded WSGI workers.
+"""
+import multiprocessing
+import os
+
+serving_profile = os.environ.get('SERVING_PROFILE', 'wsgi')
+cpu_count = multiprocessing.cpu_count()
+
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+if serving_profile == 'asgi':
+    wsgi_app = 'restaurant_vote.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # One event loop per core
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpu_count))
+else:
+    wsgi_app = 'restaurant_vote.wsgi:application'
+    worker_class = 'gthread'
+    # Requests wait on the database most of the time, so run more workers than cores and threads in each of them
+    workers = int(os.environ.get('GUNICORN_WORKERS', cpu_count * 2 + 1))
+    threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+# Versions, pins and payloads cached in one worker must reach the others
+if workers > 1 and os.environ.get('CACHE_URL', 'locmemcache://').startswith('locmemcache:'):
+    raise RuntimeError('Several gunicorn workers need a shared cache: set CACHE_URL (e.g. redis://redis:6379/1) or '
+                       'GUNICORN_WORKERS=1.')
+
+# Import Django once in the master, workers fork with the application loaded
+preload_app = True
+
+# Recycle workers to bound slow memory growth, with jitter so they do not all restart together
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 2000))
+max_requests_jitter = int(os.environ.get('GUNICORN_MAX_REQUESTS_JITTER', 200))
+
+# On SIGHUP and when recycling, finish in-flight requests before stopping a worker
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 60))
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 5))
+backlog = int(os.environ.get('GUNICORN_BACKLOG', 2048))
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+
+
+def post_fork(server, worker):
+    # A connection opened while preloading must not be shared between processes
+    from django.db import connections
+
+    connections.close_all()
@@ -28,9 +28,10 @@ environ.Env.read_env(os.path.join(BASE_DIR, '.env'))
 SECRET_KEY = env("SECRET_KEY")
 
 # SECURITY WARNING: don't run with debug turned on in production!
-DEBUG = True
+# Off unless turned on for development: DEBUG also keeps every SQL query of a request in memory
+DEBUG = env.bool('DEBUG', default=False)
 
-ALLOWED_HOSTS: list[str] = []
+ALLOWED_HOSTS: list[str] = env.list('ALLOWED_HOSTS', default=[])
 
 
 # Application definition
@@ -50,6 +51,9 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.PerformanceMiddleware',
+    'api.middleware.CompressionMiddleware',
+    'api.middleware.ReplicaRoutingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -83,17 +87,59 @@ WSGI_APPLICATION = 'restaurant_vote.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.1/ref/settings/#databases
 
+# 'asgi' serves current-day-menu, my-vote and all-votes-results from the async views in api/views/async_views.py,
+# run it with an ASGI server: uvicorn restaurant_vote.asgi:application
+SERVING_PROFILE = env('SERVING_PROFILE', default='wsgi')
+
+# DB_POOL=true uses psycopg 3's connection pool in each worker process, otherwise connections persist for
+# DB_CONN_MAX_AGE seconds. ASGI requests run their queries in short-lived threads, where persistent connections
+# are never reused, so the ASGI profile defaults to the pool.
+DB_POOL = env.bool('DB_POOL', default=SERVING_PROFILE == 'asgi')
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql_psycopg2',
+        'ENGINE': 'django.db.backends.postgresql',
         'NAME': env("DB_NAME"),
         'USER': env("DB_USER"),
         'PASSWORD': env("DB_PASSWORD"),
         'HOST': env("DB_HOST"),
         'PORT': env("DB_PORT"),
+        # The pool manages the lifetime of its connections itself
+        'CONN_MAX_AGE': 0 if DB_POOL else env.int('DB_CONN_MAX_AGE', default=60),
+        # Check a persistent connection before reusing it in a new request
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', default=True),
+        'OPTIONS': {
+            'pool': {
+                'min_size': env.int('DB_POOL_MIN_SIZE', default=2),
+                'max_size': env.int('DB_POOL_MAX_SIZE', default=10),
+                'timeout': env.float('DB_POOL_TIMEOUT', default=10.0),
+            },
+        } if DB_POOL else {},
     }
 }
 
+# Read replica, see api/db_routers.py. Without DB_REPLICA_HOST the alias points at the primary and no reads are routed
+# to it; the tests use it as a second database standing in for a lagging replica.
+DB_REPLICA_HOST = env('DB_REPLICA_HOST', default='')
+DATABASES['replica'] = {
+    **DATABASES['default'],
+    'HOST': DB_REPLICA_HOST or DATABASES['default']['HOST'],
+    'PORT': env('DB_REPLICA_PORT', default=DATABASES['default']['PORT']),
+    'TEST': {'NAME': f'test_{DATABASES["default"]["NAME"]}_replica'},
+}
+DATABASE_REPLICAS = ['replica'] if DB_REPLICA_HOST else []
+DATABASE_ROUTERS = ['api.db_routers.PrimaryReplicaRouter']
+# How long a client's reads stay on the primary after it writes, longer than the replication lag
+REPLICA_PIN_SECONDS = env.int('REPLICA_PIN_SECONDS', default=5)
+
+# Cache
+# https://docs.djangoproject.com/en/5.1/topics/cache/
+# Use a shared cache (e.g. redis:// or pymemcache://) when running several workers
+
+CACHES = {
+    'default': env.cache('CACHE_URL', default='locmemcache://'),
+}
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -129,23 +175,43 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/5.1/howto/static-files/
 
 STATIC_URL = 'static/'
+# collectstatic target, served by the proxy in front of gunicorn when DEBUG is off
+STATIC_ROOT = env('STATIC_ROOT', default=str(BASE_DIR / 'staticfiles'))
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/5.1/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# FAST_JSON=true renders and parses JSON with orjson, see api/renderers.py
+FAST_JSON = env.bool('FAST_JSON', default=False)
+
 REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.ORJSONRenderer' if FAST_JSON else 'rest_framework.renderers.JSONRenderer',
+        # Accept: application/msgpack; version=v2
+        'api.renderers.MessagePackRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.ORJSONParser' if FAST_JSON else 'rest_framework.parsers.JSONParser',
+        'api.parsers.MessagePackParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        'api.authentication.ClaimsJWTAuthentication',
     ),
     'DEFAULT_VERSIONING_CLASS': 'rest_framework.versioning.AcceptHeaderVersioning',
     'DEFAULT_VERSION': 'v1',
     'ALLOWED_VERSIONS': ['v1', 'v2'],
     'VERSION_PARAM': 'version',
+    'DEFAULT_PAGINATION_CLASS': 'api.pagination.CreatedAtCursorPagination',
+    'PAGE_SIZE': 50,
 }
 
 
+
 SIMPLE_JWT = {
     'ACCESS_TOKEN_LIFETIME': timedelta(minutes=30),
     'REFRESH_TOKEN_LIFETIME': timedelta(days=1),
@@ -153,6 +219,64 @@ SIMPLE_JWT = {
     'BLACKLIST_AFTER_ROTATION': True,
     'ALGORITHM': 'HS256',
     'SIGNING_KEY': SECRET_KEY,  # Your Django secret key
+    # Access tokens carry the user's employee, restaurant and permissions, see api/authentication.py
+    'TOKEN_OBTAIN_SERIALIZER': 'api.authentication.ClaimsTokenObtainPairSerializer',
+    'TOKEN_REFRESH_SERIALIZER': 'api.authentication.ClaimsTokenRefreshSerializer',
+}
+
+# Response compression, see api/compression.py. brotli is used when the package is installed, gzip otherwise.
+COMPRESSION = {
+    'MIN_SIZE': env.int('COMPRESSION_MIN_SIZE', default=1024),
+    'GZIP_LEVEL': env.int('COMPRESSION_GZIP_LEVEL', default=6),
+    'BROTLI_QUALITY': env.int('COMPRESSION_BROTLI_QUALITY', default=5),
+}
+
+# Live results stream (votes/results-stream/, served over ASGI), see api/realtime.py. With several worker processes
+# on one host, point REALTIME_SOCKET_DIR at a directory they share so every worker's watchers get every ballot.
+REALTIME = {
+    'HEARTBEAT_SECONDS': env.int('REALTIME_HEARTBEAT_SECONDS', default=15),
+    'BROKER_SOCKET_DIR': env('REALTIME_SOCKET_DIR', default=None),
+}
+
+# Bulk employee imports, see api/onboarding.py. HASH_WORKERS processes hash the passwords, 0 starts one per CPU.
+EMPLOYEE_IMPORT = {
+    'HASH_WORKERS': env.int('EMPLOYEE_IMPORT_HASH_WORKERS', default=0),
+    'CHUNK_SIZE': env.int('EMPLOYEE_IMPORT_CHUNK_SIZE', default=500),
+}
+
+# How cast votes are stored, see api/vote_storage.py: 'votes' (a Vote row per menu) or 'ballots' (a Ballot row per
+# employee and day). Convert the stored votes with `manage.py convert_vote_storage` when switching.
+VOTE_STORAGE = env('VOTE_STORAGE', default='votes')
+
+# Daily voting cutoff, see api/snapshots.py: HH:MM in TIME_ZONE, empty for none. Past it cast-vote is rejected and the
+# day's results are frozen into a DailyResultSnapshot by `manage.py freeze_results`, or by the first read after the
+# cutoff when FREEZE_ON_READ is set (deployments without a job runner).
+VOTING = {
+    'DEADLINE': env('VOTING_DEADLINE', default=''),
+    'FREEZE_ON_READ': env.bool('VOTING_FREEZE_ON_READ', default=True),
+}
+
+# Authorize requests from the access token claims without loading the user from the database
+STATELESS_JWT_AUTH = env.bool('STATELESS_JWT_AUTH', default=False)
+
+# Per-view request metrics served at /metrics, see api/middleware.py
+PERFORMANCE_METRICS = {
+    'ENABLED': env.bool('PERFORMANCE_METRICS_ENABLED', default=True),
+    'SLOW_REQUEST_MS': env.int('SLOW_REQUEST_MS', default=500),
+    'SLOW_REQUEST_MAX_QUERIES': env.int('SLOW_REQUEST_MAX_QUERIES', default=50),
+    'TOKEN': env('METRICS_TOKEN', default=None),
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.performance': {'handlers': ['console'], 'level': 'WARNING'},
+        'api.realtime': {'handlers': ['console'], 'level': 'WARNING'},
+    },
 }
 
 SWAGGER_SETTINGS = {